@@ -0,0 +1,261 @@
+"""Trace replay benchmark for the jitter buffers.
+
+Feeds put_packet()/get_packet() from synthetic or recorded network
+traces, driven by a virtual clock, and prints one JSON object per
+scenario and buffer configuration, for example:
+
+    PYTHONPATH=. python benchmarks/bench_jitter_buffer.py
+
+For each it reports the effective playout latency, the rate of
+concealment (gets that returned None once playout had begun), the
+number of buffer resets and the CPU time spent per packet.
+
+A recorded trace is a CSV file with one line per received packet,
+giving the packet's index at the sender and its arrival time in
+seconds; it can be replayed with --trace.
+
+With --check the script exits with a non-zero status if, in any
+scenario, the adaptive buffer has both a higher mean latency and a
+higher concealment rate than the fixed three-frame buffer.
+
+"""
+import argparse
+import csv
+import heapq
+import json
+import math
+import random
+import sys
+import time
+
+from singtcommon import JitterBuffer, SlotJitterBuffer
+from singtcommon.sequence_numbers import SEQ_NO_ROLLOVER
+
+PACKET_DURATION = 0.02 # seconds
+
+class VirtualClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+def synthetic_trace(packets, seed, base_delay=0.03, jitter=0.005,
+                    jitter_distribution="gauss",
+                    loss_good_to_bad=0.0, loss_bad_to_good=1.0,
+                    reorder=0.0, duplicate=0.0):
+    """Generates a list of (send_index, arrival_time) pairs.
+
+    Loss is bursty, following a two-state Gilbert-Elliott model: every
+    packet sent in the bad state is lost.  jitter is the standard
+    deviation ("gauss") or scale ("pareto") of the additional delay.
+    Reordered packets are held back by a further one to three packet
+    durations.
+
+    """
+    rng = random.Random(seed)
+    trace = []
+    bad = False
+    for index in range(packets):
+        if bad:
+            bad = rng.random() >= loss_bad_to_good
+        else:
+            bad = rng.random() < loss_good_to_bad
+        if bad:
+            continue
+
+        copies = 2 if rng.random() < duplicate else 1
+        for _ in range(copies):
+            if jitter_distribution == "pareto":
+                extra = jitter * (rng.paretovariate(3) - 1)
+            else:
+                extra = abs(rng.gauss(0, jitter))
+            if rng.random() < reorder:
+                extra += rng.randint(1, 3) * PACKET_DURATION
+            arrival = index * PACKET_DURATION + base_delay + extra
+            trace.append((index, arrival))
+
+    trace.sort(key=lambda event: event[1])
+    return trace
+
+def load_trace(path):
+    with open(path, newline="") as f:
+        trace = [(int(row[0]), float(row[1])) for row in csv.reader(f)]
+    trace.sort(key=lambda event: event[1])
+    return trace
+
+SCENARIOS = {
+    "lan": dict(jitter=0.001),
+    "wifi": dict(jitter=0.015, jitter_distribution="pareto"),
+    "bursty_loss": dict(
+        jitter=0.005,
+        loss_good_to_bad=0.01,
+        loss_bad_to_good=0.3
+    ),
+    "reordering": dict(jitter=0.005, reorder=0.05, duplicate=0.01),
+}
+
+CONFIGURATIONS = {
+    "fixed_1": lambda clock: JitterBuffer(buffer_length=1),
+    "fixed_3": lambda clock: JitterBuffer(buffer_length=3),
+    "adaptive": lambda clock: JitterBuffer(
+        buffer_length=3,
+        adaptive=True,
+        packet_duration=PACKET_DURATION*1000,
+        clock=clock
+    ),
+    "slot_3": lambda clock: SlotJitterBuffer(buffer_length=3),
+}
+
+def replay(trace, make_buffer, first_seq_no=0):
+    """Replays a trace into a new buffer and returns the results.
+
+    Gets happen every packet duration, starting when the first packet
+    arrives.  first_seq_no sets the sequence number of the first
+    packet sent, so that sequence number roll-over can be exercised.
+    Returns None if the trace is empty or no packet was played.
+
+    """
+    if len(trace) == 0:
+        return None
+    clock = VirtualClock()
+    buffer = make_buffer(clock)
+
+    start = trace[0][1]
+    last_send = max(index for index, _ in trace)
+    gets = int(math.ceil(
+        (trace[-1][1] - start) / PACKET_DURATION
+    )) + 50
+
+    # Merge arrivals and gets into one time-ordered sequence of
+    # events; at equal times arrivals come first
+    events = [(arrival, 0, index) for index, arrival in trace]
+    events += [(start + i * PACKET_DURATION, 1, None) for i in range(gets)]
+    heapq.heapify(events)
+
+    latencies = []
+    concealed = 0
+    playing = False
+    cpu_time = 0.0
+
+    while len(events) > 0:
+        clock.time, kind, index = heapq.heappop(events)
+        if kind == 0:
+            seq_no = (first_seq_no + index) % SEQ_NO_ROLLOVER
+            before = time.process_time()
+            buffer.put_packet(seq_no, index)
+            cpu_time += time.process_time() - before
+        else:
+            before = time.process_time()
+            packet = buffer.get_packet()
+            cpu_time += time.process_time() - before
+            if packet is None:
+                if playing:
+                    concealed += 1
+            else:
+                playing = True
+                latencies.append(clock.time - packet * PACKET_DURATION)
+            if packet == last_send:
+                break
+
+    if len(latencies) == 0:
+        return None
+    played_gets = len(latencies) + concealed
+    latencies.sort()
+    return {
+        "packets": len(trace),
+        "played": len(latencies),
+        "latency_mean_ms": 1000 * sum(latencies) / len(latencies),
+        "latency_p95_ms": 1000 * latencies[int(0.95 * (len(latencies)-1))],
+        "concealment_rate": concealed / played_gets,
+        "resets": buffer._resets,
+        "cpu_us_per_packet": 1e6 * cpu_time / len(trace),
+    }
+
+def check(records):
+    """Returns the scenarios in which adaptive is worse than fixed_3."""
+    results = {
+        (record["scenario"], record["config"]): record
+        for record in records
+    }
+    failures = []
+    for (scenario, config), adaptive in results.items():
+        fixed = results.get((scenario, "fixed_3"))
+        if config != "adaptive" or fixed is None:
+            continue
+        if (adaptive["latency_mean_ms"] > fixed["latency_mean_ms"]
+            and adaptive["concealment_rate"] > fixed["concealment_rate"]):
+            failures.append((scenario, adaptive, fixed))
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--packets", type=int, default=30000,
+        help="number of packets in each synthetic trace"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=1234,
+        help="seed for the synthetic traces"
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="replay a recorded trace instead of the synthetic ones"
+    )
+    parser.add_argument(
+        "--first-seq-no", type=int, default=SEQ_NO_ROLLOVER - 100,
+        help="sequence number of the first packet; the default "+
+             "exercises roll-over"
+    )
+    parser.add_argument(
+        "--config", action="append", choices=sorted(CONFIGURATIONS),
+        help="buffer configuration to run (default: all)"
+    )
+    parser.add_argument(
+        "--check", action="store_true",
+        help="fail if adaptive is worse than fixed_3 in both latency "+
+             "and concealment"
+    )
+    args = parser.parse_args(argv)
+
+    if args.trace is not None:
+        traces = {args.trace: load_trace(args.trace)}
+    else:
+        traces = {
+            name: synthetic_trace(args.packets, args.seed, **params)
+            for name, params in SCENARIOS.items()
+        }
+
+    records = []
+    for scenario, trace in traces.items():
+        for config in args.config or sorted(CONFIGURATIONS):
+            results = replay(trace, CONFIGURATIONS[config], args.first_seq_no)
+            if results is None:
+                print(
+                    f"Skipping {scenario} with {config}: no packets "+
+                    f"were played",
+                    file=sys.stderr
+                )
+                continue
+            record = {"scenario": scenario, "config": config}
+            record.update(results)
+            print(json.dumps(record), flush=True)
+            records.append(record)
+
+    if args.check:
+        failures = check(records)
+        for scenario, adaptive, fixed in failures:
+            print(
+                f"adaptive is worse than fixed_3 in {scenario}: "+
+                f"{adaptive['latency_mean_ms']:.1f}ms latency and "+
+                f"{adaptive['concealment_rate']:.2%} concealment, "+
+                f"against {fixed['latency_mean_ms']:.1f}ms and "+
+                f"{fixed['concealment_rate']:.2%}",
+                file=sys.stderr
+            )
+        if len(failures) > 0:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Per-tick cost of mixing against the number of participants.
+
+Compares Mixer with the loop it replaces: a RingBuffer and an
+AutomaticGainControl per participant, summed in Python, with each
+participant's N-minus-one mix formed by subtraction.  Prints one JSON
+object per measurement, for example:
+
+    PYTHONPATH=. python benchmarks/bench_mixer.py
+
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy
+
+from singtcommon import Mixer, RingBuffer, AutomaticGainControl
+
+PARTICIPANTS = [2, 8, 32, 128]
+FRAMES = 480 # 10ms at 48kHz
+CHANNELS = 1
+
+def measure(fn, repeat):
+    """Returns the fastest of repeat runs of fn(), in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        duration = time.perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+    return best
+
+def bench_loop(participants, blocks, ticks):
+    rings = [
+        RingBuffer((FRAMES * 4, CHANNELS), dtype=numpy.float32)
+        for _ in range(participants)
+    ]
+    agcs = [AutomaticGainControl() for _ in range(participants)]
+    gains = [1.0] * participants
+    muted = [False] * participants
+    block = numpy.zeros((FRAMES, CHANNELS), dtype=numpy.float32)
+
+    def run():
+        for tick in range(ticks):
+            for ring, data in zip(rings, blocks[tick % len(blocks)]):
+                ring.put(data)
+            total = numpy.zeros((FRAMES, CHANNELS), dtype=numpy.float32)
+            contributions = []
+            for i in range(participants):
+                rings[i].get(block)
+                agcs[i].apply(block)
+                contribution = block * (0 if muted[i] else gains[i])
+                total += contribution
+                contributions.append(contribution)
+            [total - contribution for contribution in contributions]
+
+    return run
+
+def bench_mixer(participants, blocks, ticks):
+    mixer = Mixer(participants, FRAMES * 4, channels=CHANNELS, agc=True)
+
+    def run():
+        for tick in range(ticks):
+            for stream_id, data in enumerate(blocks[tick % len(blocks)]):
+                mixer.put(stream_id, data)
+            mixer.mix(FRAMES)
+
+    return run
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--quick", action="store_true",
+        help="run fewer ticks per measurement"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="number of runs per measurement; the fastest is reported"
+    )
+    args = parser.parse_args(argv)
+
+    ticks = 50 if args.quick else 500
+    rng = numpy.random.default_rng(1)
+    for participants in PARTICIPANTS:
+        blocks = [
+            [
+                rng.uniform(-0.5, 0.5, (FRAMES, CHANNELS)).astype(numpy.float32)
+                for _ in range(participants)
+            ]
+            for _ in range(4)
+        ]
+        for name, bench in (("loop", bench_loop), ("mixer", bench_mixer)):
+            seconds = measure(bench(participants, blocks, ticks), args.repeat)
+            record = {
+                "benchmark": "mix_tick",
+                "method": name,
+                "participants": participants,
+                "frames": FRAMES,
+                "ticks": ticks,
+                "us_per_tick": 1e6 * seconds / ticks,
+            }
+            print(json.dumps(record), flush=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""Throughput benchmarks for TCPPacketizer and UDPPacketizer.
+
+Runs offline against an in-memory transport and prints one JSON
+object per measurement, for example:
+
+    PYTHONPATH=. python benchmarks/bench_packetizers.py > bench_output.txt
+
+A previous run can be given with --compare; the script then exits
+with a non-zero status if any measurement's frames/sec has dropped by
+more than the tolerance.
+
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from singtcommon import (
+    TCPPacketizer, UDPPacketizer, ParityEncoder, ParityDecoder
+)
+from memory_transport import MemoryTransport
+
+TCP_MESSAGE_SIZES = [16, 256, 4096, 60000]
+TCP_CHUNK_SIZES = [512, 4096, 65536]
+UDP_PAYLOAD_SIZES = [20, 160, 960]
+FEC_GROUP_SIZES = [2, 5]
+
+def measure(fn, repeat):
+    """Returns the fastest of repeat runs of fn(), in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        duration = time.perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+    return best
+
+def result(benchmark, frames, num_bytes, seconds, **params):
+    record = {"benchmark": benchmark}
+    record.update(params)
+    record.update({
+        "frames": frames,
+        "bytes": num_bytes,
+        "seconds": seconds,
+        "frames_per_sec": frames / seconds,
+        "bytes_per_sec": num_bytes / seconds,
+    })
+    return record
+
+def messages_for(size, total_bytes):
+    count = max(100, total_bytes // size)
+    rng = random.Random(size)
+    return [
+        rng.getrandbits(size * 8).to_bytes(size, "little")
+        for _ in range(count)
+    ]
+
+def bench_tcp_write_bytes(total_bytes, repeat):
+    for size in TCP_MESSAGE_SIZES:
+        messages = messages_for(size, total_bytes)
+        transport = MemoryTransport()
+
+        def run():
+            transport.clear()
+            packetizer = TCPPacketizer(transport)
+            for msg in messages:
+                packetizer.write_bytes(msg)
+
+        seconds = measure(run, repeat)
+        yield result(
+            "tcp_write_bytes",
+            len(messages),
+            transport.bytes_written,
+            seconds,
+            message_size=size
+        )
+
+def bench_tcp_decode_bytes(total_bytes, repeat):
+    for size in TCP_MESSAGE_SIZES:
+        messages = messages_for(size, total_bytes)
+        transport = MemoryTransport()
+        packetizer = TCPPacketizer(transport)
+        for msg in messages:
+            packetizer.write_bytes(msg)
+        encoded = transport.value()
+
+        for chunk_size in TCP_CHUNK_SIZES:
+            chunks = [
+                encoded[i:i+chunk_size]
+                for i in range(0, len(encoded), chunk_size)
+            ]
+
+            def run():
+                packetizer = TCPPacketizer(None)
+                count = 0
+                for chunk in chunks:
+                    count += len(packetizer.decode_bytes(chunk))
+                assert count == len(messages)
+
+            seconds = measure(run, repeat)
+            yield result(
+                "tcp_decode_bytes",
+                len(messages),
+                len(encoded),
+                seconds,
+                message_size=size,
+                chunk_size=chunk_size
+            )
+
+def bench_udp_write(total_bytes, repeat):
+    for size in UDP_PAYLOAD_SIZES:
+        payloads = messages_for(size, total_bytes)
+        transport = MemoryTransport()
+
+        def run():
+            transport.clear()
+            packetizer = UDPPacketizer(transport, ("127.0.0.1", 12345))
+            for payload in payloads:
+                packetizer.write(payload)
+
+        seconds = measure(run, repeat)
+        yield result(
+            "udp_write",
+            len(payloads),
+            transport.bytes_written,
+            seconds,
+            message_size=size
+        )
+
+def bench_udp_decode(total_bytes, repeat):
+    for size in UDP_PAYLOAD_SIZES:
+        payloads = messages_for(size, total_bytes)
+        transport = MemoryTransport()
+        packetizer = UDPPacketizer(transport, ("127.0.0.1", 12345))
+        for payload in payloads:
+            packetizer.write(payload)
+        packets = transport.writes
+
+        def run():
+            for packet in packets:
+                UDPPacketizer.decode(packet)
+
+        seconds = measure(run, repeat)
+        yield result(
+            "udp_decode",
+            len(packets),
+            transport.bytes_written,
+            seconds,
+            message_size=size
+        )
+
+def bench_udp_write_batch(total_bytes, repeat):
+    for size in UDP_PAYLOAD_SIZES:
+        payloads = messages_for(size, total_bytes)
+        transport = MemoryTransport()
+
+        def run():
+            transport.clear()
+            packetizer = UDPPacketizer(transport, ("127.0.0.1", 12345))
+            packetizer.write_batch(payloads)
+
+        seconds = measure(run, repeat)
+        yield result(
+            "udp_write_batch",
+            len(payloads),
+            transport.bytes_written,
+            seconds,
+            message_size=size
+        )
+
+def bench_udp_decode_batch(total_bytes, repeat):
+    for size in UDP_PAYLOAD_SIZES:
+        payloads = messages_for(size, total_bytes)
+        transport = MemoryTransport()
+        packetizer = UDPPacketizer(transport, ("127.0.0.1", 12345))
+        for payload in payloads:
+            packetizer.write(payload)
+        packets = transport.writes
+
+        def run():
+            UDPPacketizer.decode_batch(packets)
+
+        seconds = measure(run, repeat)
+        yield result(
+            "udp_decode_batch",
+            len(packets),
+            transport.bytes_written,
+            seconds,
+            message_size=size
+        )
+
+def bench_udp_decode_array(total_bytes, repeat):
+    for size in UDP_PAYLOAD_SIZES:
+        payloads = messages_for(size, total_bytes)
+        transport = MemoryTransport()
+        packetizer = UDPPacketizer(transport, ("127.0.0.1", 12345))
+        for payload in payloads:
+            packetizer.write(payload)
+        packets = transport.writes
+
+        def run():
+            UDPPacketizer.decode_array(packets)
+
+        seconds = measure(run, repeat)
+        yield result(
+            "udp_decode_array",
+            len(packets),
+            transport.bytes_written,
+            seconds,
+            message_size=size
+        )
+
+def bench_udp_write_fec(total_bytes, repeat):
+    for size in UDP_PAYLOAD_SIZES:
+        for group_size in FEC_GROUP_SIZES:
+            payloads = messages_for(size, total_bytes)
+            transport = MemoryTransport()
+
+            def run():
+                transport.clear()
+                packetizer = UDPPacketizer(
+                    transport,
+                    ("127.0.0.1", 12345),
+                    fec_group_size=group_size
+                )
+                for payload in payloads:
+                    packetizer.write(payload)
+
+            seconds = measure(run, repeat)
+            yield result(
+                "udp_write_fec",
+                len(payloads),
+                transport.bytes_written,
+                seconds,
+                message_size=size,
+                group_size=group_size
+            )
+
+def bench_fec_recover(total_bytes, repeat):
+    """Puts every packet but the first of each group, then the parity."""
+    for size in UDP_PAYLOAD_SIZES:
+        for group_size in FEC_GROUP_SIZES:
+            payloads = messages_for(size, total_bytes)
+            encoder = ParityEncoder(group_size)
+            events = []
+            for seq_no, payload in enumerate(payloads):
+                if seq_no % group_size != 0:
+                    events.append((False, seq_no, payload))
+                parity = encoder.add(seq_no, payload)
+                if parity is not None:
+                    events.append((True,) + parity)
+
+            def run():
+                decoder = ParityDecoder()
+                for parity, seq_no, data in events:
+                    if parity:
+                        decoder.put_parity(seq_no, data)
+                    else:
+                        decoder.put_packet(seq_no, data)
+
+            seconds = measure(run, repeat)
+            yield result(
+                "fec_recover",
+                len(payloads),
+                sum(len(data) for _, _, data in events),
+                seconds,
+                message_size=size,
+                group_size=group_size
+            )
+
+BENCHMARKS = [
+    bench_tcp_write_bytes,
+    bench_tcp_decode_bytes,
+    bench_udp_write,
+    bench_udp_decode,
+    bench_udp_write_batch,
+    bench_udp_decode_batch,
+    bench_udp_decode_array,
+    bench_udp_write_fec,
+    bench_fec_recover,
+]
+
+def key(record):
+    """Identifies a measurement independently of its results."""
+    return tuple(
+        (name, value) for name, value in sorted(record.items())
+        if name not in ("frames", "bytes", "seconds",
+                        "frames_per_sec", "bytes_per_sec")
+    )
+
+def compare(records, baseline_file, tolerance):
+    """Returns the list of records that regressed against the baseline."""
+    with open(baseline_file) as f:
+        baseline = {}
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                baseline[key(record)] = record
+
+    regressions = []
+    for record in records:
+        previous = baseline.get(key(record))
+        if previous is None:
+            continue
+        if record["frames_per_sec"] < previous["frames_per_sec"] * (1 - tolerance):
+            regressions.append((record, previous))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--quick", action="store_true",
+        help="use less data per measurement"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="number of runs per measurement; the fastest is reported"
+    )
+    parser.add_argument(
+        "--compare", metavar="FILE",
+        help="JSON lines from a previous run to compare against"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2,
+        help="fractional drop in frames/sec reported as a regression"
+    )
+    args = parser.parse_args(argv)
+
+    total_bytes = 256 * 1024 if args.quick else 4 * 1024 * 1024
+
+    records = []
+    for benchmark in BENCHMARKS:
+        for record in benchmark(total_bytes, args.repeat):
+            print(json.dumps(record), flush=True)
+            records.append(record)
+
+    if args.compare is not None:
+        regressions = compare(records, args.compare, args.tolerance)
+        for record, previous in regressions:
+            print(
+                f"Regression in {record['benchmark']} {dict(key(record))}: "+
+                f"{record['frames_per_sec']:.0f} frames/sec, was "+
+                f"{previous['frames_per_sec']:.0f}",
+                file=sys.stderr
+            )
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Benchmarks of converting transfers through RingBuffer.
+
+Compares moving float32 audio through an int16 RingBuffer by
+converting and copying separately, as callers did before put() and
+get() took a scale, against the fused put(array, scale=...) and
+get(out, scale=...).  Prints one JSON object per measurement, for
+example:
+
+    PYTHONPATH=. python benchmarks/bench_ring_buffer.py
+
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy
+
+from singtcommon import RingBuffer
+
+BLOCK_SIZES = [64, 256, 1024]
+CHANNELS = 2
+
+def measure(fn, repeat):
+    """Returns the fastest of repeat runs of fn(), in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        duration = time.perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+    return best
+
+def bench_transfer(block_size, blocks, repeat):
+    ring_buffer = RingBuffer((block_size * 4, CHANNELS), dtype=numpy.int16)
+    rng = numpy.random.default_rng(block_size)
+    block = rng.uniform(-1, 1, (block_size, CHANNELS)).astype(numpy.float32)
+    int_block = numpy.zeros((block_size, CHANNELS), dtype=numpy.int16)
+    out = numpy.zeros((block_size, CHANNELS), dtype=numpy.float32)
+
+    def separate():
+        for _ in range(blocks):
+            converted = numpy.clip(block * 32767, -32768, 32767)
+            ring_buffer.put(converted.astype(numpy.int16))
+            ring_buffer.get(int_block)
+            out[:] = int_block.astype(numpy.float32) / 32768
+
+    def fused():
+        for _ in range(blocks):
+            ring_buffer.put(block, scale=32767)
+            ring_buffer.get(out, scale=1/32768)
+
+    for name, fn in (("separate", separate), ("fused", fused)):
+        seconds = measure(fn, repeat)
+        yield {
+            "benchmark": "ring_buffer_float_transfer",
+            "method": name,
+            "block_size": block_size,
+            "blocks": blocks,
+            "seconds": seconds,
+            "blocks_per_sec": blocks / seconds,
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--quick", action="store_true",
+        help="transfer fewer blocks per measurement"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="number of runs per measurement; the fastest is reported"
+    )
+    args = parser.parse_args(argv)
+
+    blocks = 2000 if args.quick else 20000
+    for block_size in BLOCK_SIZES:
+        for record in bench_transfer(block_size, blocks, args.repeat):
+            print(json.dumps(record), flush=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+class MemoryTransport:
+    """In-memory transport for benchmarks.
+
+    Unlike the tests' MockTransport it doesn't print, and it collects
+    writes in a list rather than concatenating them.  Supports both
+    TCP-style write(data) and UDP-style write(data, address).
+
+    """
+    def __init__(self):
+        self.writes = []
+        self.bytes_written = 0
+
+    def write(self, data, address=None):
+        self.writes.append(data)
+        self.bytes_written += len(data)
+
+    def writeSequence(self, seq):
+        for data in seq:
+            self.write(data)
+
+    def value(self):
+        return b"".join(self.writes)
+
+    def clear(self):
+        self.writes = []
+        self.bytes_written = 0
@@ -2,5 +2,15 @@ from .eventsource import EventSource
 from .jitter_buffer import JitterBuffer
 from .udp_packetizer import UDPPacketizer
 from .automatic_gain_control import AutomaticGainControl
-from .tcp_packetizer import TCPPacketizer
-from .ring_buffer import RingBuffer
+from .tcp_packetizer import TCPPacketizer, Framing
+from .ring_buffer import RingBuffer, BlockingRingBuffer, Overrun, Underrun
+from .mirrored_ring_buffer import MirroredRingBuffer
+from .shared_ring_buffer import SharedRingBuffer
+from .packetized_protocol import PacketizedProtocol
+from .arrival_statistics import ArrivalStatistics
+from .slot_jitter_buffer import SlotJitterBuffer
+from .jitter_buffer_pool import JitterBufferPool
+from .mixer import Mixer
+from .recorder import Recorder
+from .nack import NackGenerator, RetransmitCache, encode_nack, decode_nack
+from .fec import ParityEncoder, ParityDecoder, is_parity
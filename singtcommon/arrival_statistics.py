@@ -0,0 +1,222 @@
+import time
+
+from . import sequence_numbers
+
+# UDPPacketizer timestamps are milliseconds modulo this value
+TIMESTAMP_ROLLOVER = 2**32-1
+
+class ArrivalStatistics:
+    """Receiver-side statistics on packets from a UDPPacketizer.
+
+    Feed it the timestamp and sequence number of each packet, as
+    returned by UDPPacketizer.decode(), along with the packet's
+    arrival time.  It maintains, in constant time and memory per
+    packet:
+
+    * interarrival jitter, as defined in RFC 3550 section 6.4.1;
+
+    * a histogram of the relative one-way delay, i.e. each packet's
+      transit time less the smallest transit time seen, from which
+      percentiles are estimated;
+
+    * the loss and reorder rates, derived from the sequence numbers
+      as in RFC 3550 appendix A.3.  A bitmap of which of the last
+      128 sequence numbers have arrived tells duplicates apart from
+      reordered packets.
+
+    Sender and receiver clocks need not be synchronised, as only
+    differences in transit time are used.
+
+    """
+    def __init__(self, bucket_width=1, max_delay=1000,
+                 seq_no_rollover=sequence_numbers.SEQ_NO_ROLLOVER):
+        """Creates an estimator.
+
+        Delays are recorded in buckets of bucket_width milliseconds;
+        delays more than max_delay milliseconds either side of the
+        first packet's are recorded in the outermost buckets.
+
+        """
+        self._bucket_width = bucket_width
+        self._max_delay = max_delay
+        self._seq_no_rollover = seq_no_rollover
+
+        # Number of sequence numbers, up to and including the
+        # highest, for which arrivals are remembered
+        self._seen_window = 128
+        self._seen_mask = (1 << self._seen_window) - 1
+        self.reset()
+
+    def reset(self):
+        # Interarrival jitter in milliseconds
+        self.jitter = 0.0
+
+        # Transit times in milliseconds; these include the unknown
+        # offset between the sender's and receiver's clocks
+        self._base_transit = None
+        self._last_transit = None
+        self._min_transit = None
+
+        # Timestamps, unwrapped so that they increase without
+        # rolling over
+        self._last_timestamp = None
+        self._extended_timestamp = None
+
+        # Histogram of transit times relative to the first packet's
+        self._offset_buckets = self._max_delay // self._bucket_width
+        self._histogram = [0] * (2 * self._offset_buckets + 1)
+
+        # Sequence numbers, unwrapped
+        self._base_seq_no = None
+        self._highest_seq_no = None
+
+        # Bit n is set if the packet n before the highest has arrived
+        self._seen = 0
+
+        self.received = 0
+        self.reordered = 0
+        self.duplicates = 0
+
+    def update(self, timestamp, seq_no, arrival_time=None):
+        """Records the arrival of a packet.
+
+        timestamp and seq_no are as returned by
+        UDPPacketizer.decode().  arrival_time is in seconds, from
+        time.monotonic() by default.
+
+        """
+        if arrival_time is None:
+            arrival_time = time.monotonic()
+        arrival_ms = arrival_time * 1000
+
+        # Sequence numbers, loss and reordering
+        if self._highest_seq_no is None:
+            self._base_seq_no = seq_no
+            self._highest_seq_no = seq_no
+            self._seen = 1
+        else:
+            delta = sequence_numbers.distance(
+                seq_no,
+                self._highest_seq_no % self._seq_no_rollover,
+                self._seq_no_rollover
+            )
+            if delta > 0:
+                self._highest_seq_no += delta
+                if delta < self._seen_window:
+                    self._seen = ((self._seen << delta) | 1) & self._seen_mask
+                else:
+                    self._seen = 1
+            elif -delta < self._seen_window:
+                bit = 1 << -delta
+                if self._seen & bit:
+                    self.duplicates += 1
+                    return
+                self._seen |= bit
+                self.reordered += 1
+            else:
+                # Too old to know whether it's a duplicate
+                self.reordered += 1
+        self.received += 1
+
+        # Unwrap the timestamp
+        if self._last_timestamp is None:
+            self._extended_timestamp = timestamp
+        else:
+            self._extended_timestamp += sequence_numbers.distance(
+                timestamp,
+                self._last_timestamp,
+                TIMESTAMP_ROLLOVER
+            )
+        self._last_timestamp = timestamp
+
+        transit = arrival_ms - self._extended_timestamp
+
+        # Interarrival jitter
+        if self._last_transit is None:
+            self._base_transit = transit
+            self._min_transit = transit
+        else:
+            d = abs(transit - self._last_transit)
+            self.jitter += (d - self.jitter) / 16
+            if transit < self._min_transit:
+                self._min_transit = transit
+        self._last_transit = transit
+
+        # Delay histogram
+        index = (
+            int((transit - self._base_transit) // self._bucket_width)
+            + self._offset_buckets
+        )
+        if index < 0:
+            index = 0
+        elif index >= len(self._histogram):
+            index = len(self._histogram) - 1
+        self._histogram[index] += 1
+
+    @property
+    def expected(self):
+        """Number of packets expected, based on sequence numbers."""
+        if self._highest_seq_no is None:
+            return 0
+        return self._highest_seq_no - self._base_seq_no + 1
+
+    @property
+    def lost(self):
+        """Number of packets lost.
+
+        Negative if duplicates arrived too long after the original to
+        be recognised.
+
+        """
+        return self.expected - self.received
+
+    @property
+    def loss_rate(self):
+        expected = self.expected
+        if expected == 0:
+            return 0.0
+        return max(self.lost, 0) / expected
+
+    @property
+    def reorder_rate(self):
+        if self.received == 0:
+            return 0.0
+        return self.reordered / self.received
+
+    def delay_percentile(self, percentile):
+        """Estimates a percentile of the relative one-way delay.
+
+        Returns milliseconds of delay above the smallest transit time
+        seen, or None if no packets have been received.  Accurate to
+        the bucket width.
+
+        """
+        if self.received == 0:
+            return None
+        target = self.received * percentile / 100
+        count = 0
+        for index, bucket in enumerate(self._histogram):
+            count += bucket
+            if count >= target and bucket > 0:
+                break
+        transit = (
+            (index - self._offset_buckets) * self._bucket_width
+            + self._base_transit
+        )
+        return max(transit - self._min_transit, 0)
+
+    def snapshot(self):
+        """Returns the current statistics as a dictionary."""
+        return {
+            "jitter": self.jitter,
+            "delay_p50": self.delay_percentile(50),
+            "delay_p95": self.delay_percentile(95),
+            "delay_p99": self.delay_percentile(99),
+            "received": self.received,
+            "expected": self.expected,
+            "lost": self.lost,
+            "loss_rate": self.loss_rate,
+            "reordered": self.reordered,
+            "reorder_rate": self.reorder_rate,
+            "duplicates": self.duplicates,
+        }
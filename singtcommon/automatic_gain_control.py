@@ -1,13 +1,53 @@
 import numpy
 import math
 
+def next_gain(gain, peak, mu, target, max_gain, loud_peak):
+    """Returns the gain to apply after a block with the given peak.
+
+    peak is the block's peak once gain has been applied.  gain and
+    peak may be scalars, or arrays of one gain and peak per stream
+    (as in Mixer), which are updated elementwise.
+
+    """
+    # Move the gain towards bringing the peak to the target, unless
+    # a very loud noise cuts it in half immediately
+    updated = gain + mu * (target - peak)
+    if numpy.ndim(updated) == 0:
+        # Without numpy functions, which would allocate arrays
+        if peak > loud_peak:
+            return gain / 2
+        if math.isnan(updated):
+            return 1
+        return min(max(updated, 0), max_gain)
+    updated[numpy.isnan(updated)] = 1
+    numpy.clip(updated, 0, max_gain, out=updated)
+    return numpy.where(peak > loud_peak, gain / 2, updated)
+
 class AutomaticGainControl:
-    def __init__(self, max_gain=30):
+    # Rate at which the gain moves towards bringing each block's peak
+    # to target, and the peak above which the gain is halved at once
+    mu = 0.1
+    target = 0.5
+    loud_peak = 0.95
+
+    def __init__(self, max_gain=30, allocation_free=False):
+        """Creates an automatic gain control.
+
+        If allocation_free is True, apply() allocates no arrays once
+        it has seen a block of a given shape and type, which suits
+        real-time audio callbacks.  It then finds the peak from the
+        unscaled sample and applies the gain ramp in place, from a
+        ramp cached for the block shape.
+
+        """
         self.gain = 1
-        self.mu = 0.1
-        self.target = 0.5
         self.max_gain = max_gain
 
+        self._allocation_free = allocation_free
+        # Maps block shapes to a ramp from zero to one and a buffer
+        # for the gain ramp
+        self._ramps = {}
+
     def apply(self, sample):
         """Applies automatic gain to the given sample.
 
@@ -17,30 +57,32 @@ class AutomaticGainControl:
         # Store previous gain
         old_gain = self.gain
 
-        # Apply previous gain to form temp array
-        temp = sample * self.gain
-
-        # Measure max of scaled input
-        max_in_sample = numpy.max(abs(temp))
-
-        # Calculate difference compared to desired gain
-        error = self.target - max_in_sample
-
-        # Check if there's been a very loud noise.
-        if max_in_sample > 0.95:
-            # A very loud noise has been detected, cut the gain in
-            # half immediately
-            self.gain /= 2
+        if self._allocation_free:
+            # The gain is never negative, so the peak of the scaled
+            # sample is the peak of the sample times the gain
+            max_in_sample = numpy.maximum(
+                sample.max(),
+                -sample.min()
+            ) * self.gain
         else:
-            # A very loud noise hasn't been detected, so just
-            # calculate the new gain normally.
-            self.gain += self.mu * error
-            if math.isnan(self.gain):
-                self.gain = 1
-            if self.gain > self.max_gain:
-                self.gain = self.max_gain
-            if self.gain < 0:
-                self.gain = 0
+            # Apply previous gain to form temp array
+            temp = sample * self.gain
+
+            # Measure max of scaled input
+            max_in_sample = numpy.max(abs(temp))
+
+        self.gain = next_gain(
+            self.gain,
+            max_in_sample,
+            self.mu,
+            self.target,
+            self.max_gain,
+            self.loud_peak
+        )
+
+        if self._allocation_free:
+            self._apply_ramp(sample, old_gain)
+            return
 
         # Create a linear scaling from the old value to the new one
         channels = sample.shape[1]
@@ -53,6 +95,24 @@ class AutomaticGainControl:
         # Apply multiplier to input
         sample *= multiplier
 
+    def _apply_ramp(self, sample, old_gain):
+        """Scales sample in place from old_gain to the current gain."""
+        entry = self._ramps.get(sample.shape)
+        if entry is None or entry[0].dtype != sample.dtype:
+            # Full-sized, as broadcasting a column across the channels
+            # makes numpy allocate buffers
+            ramp = numpy.empty_like(sample)
+            ramp[:] = numpy.linspace(0, 1, len(sample))[:, None]
+            entry = (ramp, numpy.empty_like(sample))
+            self._ramps[sample.shape] = entry
+        ramp, multiplier = entry
+        # Scalars of the sample's type, as mixing types would also
+        # make numpy allocate buffers
+        scalar = sample.dtype.type
+        numpy.multiply(ramp, scalar(self.gain - old_gain), out=multiplier)
+        numpy.add(multiplier, scalar(old_gain), out=multiplier)
+        numpy.multiply(sample, multiplier, out=sample)
+
 
 if __name__ == "__main__":
     try:
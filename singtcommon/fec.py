@@ -0,0 +1,174 @@
+"""XOR parity forward error correction (FEC).
+
+A UDPPacketizer with a fec_group_size of K follows every K data
+packets with a parity packet, from which any one missing packet of
+the group can be reconstructed.  This costs one extra packet per K
+data packets, but no round trip.
+
+Groups start at multiples of K and are cut short at sequence number
+roll-over, so a group never spans it.  A parity packet is flagged by
+a negative sequence number in its header: -1 - the sequence number
+of the first packet in its group (see is_parity()).  Its payload is
+the number of packets in the group and the XOR of their lengths,
+followed by the XOR of their payloads, each zero-padded to the
+length of the longest.
+
+"""
+import collections
+import struct
+
+import numpy
+
+from . import sequence_numbers
+
+_parity_header = struct.Struct(">BH")
+
+def is_parity(seq_no):
+    """Returns True if a decoded sequence number flags a parity packet."""
+    return seq_no < 0
+
+def _xor_payloads(payloads, length):
+    """Returns the XOR of payloads zero-padded to length, as bytes."""
+    padded = numpy.zeros((len(payloads), length), dtype=numpy.uint8)
+    for row, payload in zip(padded, payloads):
+        row[:len(payload)] = numpy.frombuffer(payload, dtype=numpy.uint8)
+    return numpy.bitwise_xor.reduce(padded, axis=0).tobytes()
+
+
+class ParityEncoder:
+    """Builds the parity packets for a stream of data packets."""
+    def __init__(self, group_size,
+                 seq_no_rollover=sequence_numbers.SEQ_NO_ROLLOVER):
+        if not 2 <= group_size <= 255:
+            raise Exception(
+                f"FEC group size ({group_size}) must be between 2 "+
+                f"and 255"
+            )
+        self._group_size = group_size
+        self._seq_no_rollover = seq_no_rollover
+        self._payloads = []
+        self._first_seq_no = None
+
+    def add(self, seq_no, data):
+        """Adds a data packet.
+
+        Returns a tuple (seq_no, parity) giving the header sequence
+        number and payload of a parity packet if the packet completes
+        a group, otherwise None.
+
+        """
+        if len(self._payloads) == 0:
+            self._first_seq_no = seq_no
+        self._payloads.append(data)
+
+        if (seq_no % self._group_size != self._group_size - 1
+            and seq_no != self._seq_no_rollover - 1):
+            return None
+
+        payloads = self._payloads
+        self._payloads = []
+        length_xor = 0
+        length = 0
+        for payload in payloads:
+            length_xor ^= len(payload)
+            if len(payload) > length:
+                length = len(payload)
+        parity = (
+            _parity_header.pack(len(payloads), length_xor)
+            + _xor_payloads(payloads, length)
+        )
+        return (-1 - self._first_seq_no, parity)
+
+
+class ParityDecoder:
+    """Reconstructs missing data packets from parity packets.
+
+    Keeps the most recent history data packets, and the parity of up
+    to max_groups groups that cannot yet be recovered.  Both
+    put_packet() and put_parity() return a list of (seq_no, data)
+    pairs for the packets they allow to be reconstructed.
+
+    """
+    def __init__(self, history=256, max_groups=16,
+                 seq_no_rollover=sequence_numbers.SEQ_NO_ROLLOVER):
+        self._history = history
+        self._max_groups = max_groups
+        self._seq_no_rollover = seq_no_rollover
+
+        # Recent data packets, oldest first
+        self._packets = collections.OrderedDict()
+
+        # Maps the first sequence number of each group to (number of
+        # packets, XOR of lengths, XOR of payloads), oldest first
+        self._groups = collections.OrderedDict()
+
+        self.recovered_packets = 0
+
+    def put_packet(self, seq_no, data):
+        packets = self._packets
+        if seq_no in packets:
+            return []
+        packets[seq_no] = data
+        if len(packets) > self._history:
+            packets.popitem(last=False)
+
+        for first_seq_no, (count, _, _) in self._groups.items():
+            distance = sequence_numbers.distance(
+                seq_no,
+                first_seq_no,
+                self._seq_no_rollover
+            )
+            if 0 <= distance < count:
+                return self._recover(first_seq_no)
+        return []
+
+    def put_parity(self, seq_no, parity):
+        """Adds a parity packet, given the sequence number in its header."""
+        if len(parity) < _parity_header.size:
+            raise Exception(
+                f"Parity packet too short ({len(parity)} bytes)"
+            )
+        first_seq_no = -1 - seq_no
+        if first_seq_no in self._groups:
+            return []
+        count, length_xor = _parity_header.unpack_from(parity)
+        self._groups[first_seq_no] = (
+            count,
+            length_xor,
+            parity[_parity_header.size:]
+        )
+        if len(self._groups) > self._max_groups:
+            self._groups.popitem(last=False)
+        return self._recover(first_seq_no)
+
+    def _recover(self, first_seq_no):
+        count, length_xor, payload_xor = self._groups[first_seq_no]
+        seq_nos = [
+            sequence_numbers.add(first_seq_no, i, self._seq_no_rollover)
+            for i in range(count)
+        ]
+        missing = [seq_no for seq_no in seq_nos if seq_no not in self._packets]
+        if len(missing) > 1:
+            return []
+
+        # Either every packet is here or the one missing can be
+        # rebuilt; the group is done with either way
+        del self._groups[first_seq_no]
+        if len(missing) == 0:
+            return []
+
+        payloads = [payload_xor]
+        for seq_no in seq_nos:
+            data = self._packets.get(seq_no)
+            if data is not None:
+                length_xor ^= len(data)
+                payloads.append(data)
+        if length_xor > len(payload_xor):
+            # The parity packet is inconsistent with the data packets
+            return []
+        data = _xor_payloads(payloads, len(payload_xor))[:length_xor]
+
+        seq_no = missing[0]
+        self._packets[seq_no] = data
+        self.recovered_packets += 1
+        return [(seq_no, data)]
@@ -1,18 +1,104 @@
 import collections
+import math
 import threading
+import time
+
+from . import sequence_numbers
+from .fec import ParityDecoder, is_parity
+from .metrics import Histogram, publish_snapshot
 
 # TODO: Given the Global interpreter lock (GIL), I'm not at all sure
 # the reentrant lock is necessary.
 
 class JitterBuffer:
-    def __init__(self, buffer_length=3):
+    def __init__(self, buffer_length=3, adaptive=False,
+                 min_buffer_length=1, max_buffer_length=10,
+                 packet_duration=20, clock=time.monotonic,
+                 metrics=False, fec=False,
+                 seq_no_rollover=sequence_numbers.SEQ_NO_ROLLOVER):
+        """Creates a jitter buffer.
+
+        By default the buffer starts with buffer_length frames of
+        latency and keeps that depth.
+
+        If adaptive is True, buffer_length is only the starting depth.
+        The target depth is then derived from the measured arrival
+        jitter of packets and from the recent history of packets that
+        arrived too late to be played, bounded by min_buffer_length
+        and max_buffer_length.  The buffer only shrinks where doing
+        so discards no audio, or just after a frame was concealed.
+        packet_duration is the duration of each packet in
+        milliseconds, and clock returns the current time in seconds.
+
+        Counters of events are always kept.  If metrics is True,
+        histograms of the buffer's length at each get and of the
+        distance of out-of-order packets are also kept.  See
+        snapshot().
+
+        If fec is True, parity packets from a UDPPacketizer with a
+        fec_group_size can be given to put_parity(), and any single
+        packet missing from a group is reconstructed and put into the
+        buffer.  Packets must then be the bytes-like data from
+        UDPPacketizer.decode().
+
+        seq_no_rollover is the value at which sequence numbers roll
+        back to zero; it must match the sender's (see UDPPacketizer).
+
+        """
         self._buffer_lock = threading.RLock()
 
         with self._buffer_lock:
             self._buffer_length = buffer_length
+
+            # Adaptive depth
+            self._adaptive = adaptive
+            self._min_buffer_length = min_buffer_length
+            self._max_buffer_length = max_buffer_length
+            self._packet_duration = packet_duration
+            self._clock = clock
+
+            # Target depth is this multiple of the jitter (converted
+            # to packets) plus the underrun margin
+            self._jitter_multiplier = 3
+
+            # The buffer grows by at most one frame per
+            # _grow_interval gets, and shrinks by at most one frame
+            # per _shrink_interval gets
+            self._grow_interval = 10
+            self._shrink_interval = 50
+
+            # The underrun margin grows by one frame for each packet
+            # that arrives too late to be played, and decays by one
+            # frame after this many gets without a late packet.
+            # Packets that never arrive don't count: a deeper buffer
+            # wouldn't have helped
+            self._margin_decay_gets = 50
+
+            self._jitter = 0.0
+            self._last_arrival = None
+            self._last_arrival_seq_no = None
+            self._underrun_margin = 0
+            self._gets_since_underrun = 0
+            self._gets_since_adapt = 0
+            self._average_depth = float(buffer_length)
+            self._started_once = False
+            # True if the last get concealed a missing frame
+            self._concealed = False
+
+            # Histograms are only kept if metrics are enabled
+            self._metrics = metrics
+            self._histogram_buckets = 32
+
+            if fec:
+                self._parity_decoder = ParityDecoder(
+                    seq_no_rollover=seq_no_rollover
+                )
+            else:
+                self._parity_decoder = None
             
-            # The value at which sequence numbers roll back to zero
-            self._seq_no_rollover = 2**16
+            # The value at which sequence numbers roll back to zero;
+            # this must match the sender's (see UDPPacketizer)
+            self._seq_no_rollover = seq_no_rollover
 
             # Number of missed packets in a row to trigger buffer
             # reset
@@ -21,9 +107,6 @@ class JitterBuffer:
             self._reset_buffer()
             self._reset_stats()
 
-    def __del__(self):
-        self._print_stats()
-
     def __len__(self):
         with self._buffer_lock:
             return (
@@ -32,87 +115,206 @@ class JitterBuffer:
             )
             
     def put_packet(self, seq_no, packet):
+        # Parity packets, with their negative sequence numbers, may
+        # come through here straight from UDPPacketizer.decode()
+        if is_parity(seq_no):
+            self.put_parity(seq_no, packet)
+            return
+
         with self._buffer_lock:
-            if seq_no >= self._seq_no_rollover:
-                raise Exception(
-                    f"Unexpectedly large sequence number ({seq_no}), "+
-                    f"roll-over expected at {self._seq_no_rollover}"
+            self._put_packets += 1
+            if self._adaptive:
+                self._update_jitter(seq_no)
+            self._put_packet(seq_no, packet)
+            if self._parity_decoder is not None:
+                self._put_recovered(
+                    self._parity_decoder.put_packet(seq_no, packet)
                 )
 
-            # Update statistics
-            self._put_packets += 1
-            if len(self) > self._max_length:
-                self._max_length = len(self)
-            #print(f"jitter buffer recv'd packet number {seq_no} (buffer contains {self._get_buffer_size()} items)")
+    def put_parity(self, seq_no, parity):
+        """Puts a parity packet (see fec.py) into the buffer.
+
+        seq_no is the negative sequence number from the parity
+        packet's header.  A packet reconstructed too late for
+        playout is discarded, as any late packet is.
 
-            self._started = True
+        """
+        if self._parity_decoder is None:
+            raise Exception(
+                "Parity packets require a JitterBuffer with fec=True"
+            )
+        with self._buffer_lock:
+            self._put_recovered(
+                self._parity_decoder.put_parity(seq_no, parity)
+            )
+
+    def _put_recovered(self, recovered):
+        # Reconstructed packets are counted apart from those received,
+        # and only if they arrive in time to be played
+        for seq_no, packet in recovered:
+            if self._put_packet(seq_no, packet):
+                self._recovered_packets += 1
+
+    def _put_packet(self, seq_no, packet):
+        """Puts a packet into the buffer; the lock must be held.
+
+        Returns False if the packet was discarded as late or as a
+        duplicate.
+
+        """
+        if seq_no >= self._seq_no_rollover:
+            raise Exception(
+                f"Unexpectedly large sequence number ({seq_no}), "+
+                f"roll-over expected at {self._seq_no_rollover}"
+            )
+
+        # Update statistics
+        length = len(self._buffer) + len(self._out_of_order_packets)
+        if length > self._max_length:
+            self._max_length = length
+
+        self._started = True
+        self._started_once = True
+
+        # If we don't know the expected sequence number, then just
+        # use whatever we've received
+        if self._expected_seq_no is None:
+            self._expected_seq_no = seq_no
+
+        # If this sequence number is the expected one then just
+        # append it to the buffer
+        if self._expected_seq_no == seq_no:
+            self._buffer.append(packet)
+            self._expected_seq_no += 1
+            self._expected_seq_no %= self._seq_no_rollover
+
+            # Check the out-of-order dictionary, maybe the next
+            # packet is already waiting
+            self._check_out_of_order_packets()
             
-            # If we don't know the expected sequence number, then just
-            # use whatever we've received
-            if self._expected_seq_no is None:
-                self._expected_seq_no = seq_no
-
-            # If this sequence number is the expected one then just
-            # append it to the buffer
-            if self._expected_seq_no == seq_no:
-                self._buffer.append(packet)
-                self._expected_seq_no += 1
-                self._expected_seq_no %= self._seq_no_rollover
+        else:
+            # We have an out-of-order packet.  Check if it's
+            # before or after the expected sequence number
+            distance = sequence_numbers.distance(
+                seq_no,
+                self._expected_seq_no,
+                self._seq_no_rollover
+            )
+            if self._metrics:
+                self._reorder_distances.observe(abs(distance))
 
-                # Check the out-of-order dictionary, maybe the next
-                # packet is already waiting
-                self._check_out_of_order_packets()
-                
+            # Check if the frame is too late
+            if distance >= 0:
+                # Add it to the dictionary
+                if seq_no in self._out_of_order_packets:
+                    self._duplicate_packets += 1
+                    return False
+                self._out_of_order_count += 1
+                self._out_of_order_packets[seq_no] = packet
             else:
-                # We have an out-of-order packet.  Check if it's
-                # before or after the expected sequence number
-                distance = self._calc_distance(
-                    seq_no,
-                    self._expected_seq_no
-                )
-                print("distance:",distance)
-
-                # Check if the frame is too late
-                if distance >= 0:
-                    # Add it to the dictionary
-                    print("Frame is ahead of what we were expecting; storing")
-                    self._out_of_order_packets[seq_no] = packet
+                # Discard it; if it's among the packets in the
+                # buffer then it's a duplicate
+                if -distance <= len(self._buffer) - self._padding:
+                    self._duplicate_packets += 1
                 else:
-                    print("Frame is behind what we were expecting; discarding")
-                    return
+                    self._late_packets += 1
+                    if self._adaptive:
+                        self._underrun_margin = min(
+                            self._underrun_margin + 1,
+                            self._max_buffer_length
+                        )
+                        self._gets_since_underrun = 0
+                return False
 
-        
+        return True
+    
     def get_packet(self):
         with self._buffer_lock:
-            #print(f"getting packet from jitter buffer (which contains {self._get_buffer_size()} items)")
             # Update statistics
             self._got_packets += 1
-            self._total_length_at_get += len(self)
+            length = len(self._buffer) + len(self._out_of_order_packets)
+            self._total_length_at_get += length
+            if self._metrics:
+                self._lengths_at_get.observe(length)
 
             if not self._started:
-                #print("We haven't received our first packet; ignoring get request")
                 return None
             
-            # If the buffer is empty, give up on the currently
-            # expected sequence number and return None
+            if self._adaptive:
+                self._adapt()
+
             if len(self._buffer) == 0:
-                print(f"jitter buffer is giving up on the expected packet number {self._expected_seq_no} (total of {self._missed_packets} packets missed)")
+                # In adaptive mode, if the buffer is shallower than
+                # its target, wait one more frame for the expected
+                # packet, which grows the buffer by one frame
+                if self._adaptive and self._grow():
+                    return None
+
+                # Otherwise give up on the currently expected sequence
+                # number and return None
                 self._missed_packets += 1
                 self._missed_sequential_packets += 1
                 self._expected_seq_no += 1
                 self._expected_seq_no %= self._seq_no_rollover
                 self._check_out_of_order_packets()
-                if self._missed_sequential_packets >= self._max_missed_sequential_packets:
-                    print("Too many missed sequential packets; resetting jitter buffer")
-                    self._reset_buffer()
-                return None
+                # In adaptive mode, if the buffer is deeper than its
+                # target and the next packet is here, play it now
+                # rather than concealing the missing one, which
+                # shrinks the buffer by one frame without a gap of its
+                # own
+                if (self._adaptive and len(self._buffer) > 0
+                    and self._too_deep()):
+                    self._shrink()
+                else:
+                    self._concealed = True
+                    if self._missed_sequential_packets >= self._max_missed_sequential_packets:
+                        self._resets += 1
+                        self._reset_buffer()
+                    return None
 
             # Otherwise, return the first item
             self._missed_sequential_packets = 0
+            self._concealed = False
             packet = self._buffer.popleft()
+            if self._padding > 0:
+                self._padding -= 1
             return packet
 
 
+    def missing_packets(self):
+        """Returns the packets missing from the sequence received.
+
+        Returns a list of (seq_no, packets_until_playout) pairs, in
+        the order the packets would be played, for the gaps between
+        the packets already buffered and the newest out-of-order
+        packet.  packets_until_playout is the number of gets before
+        the packet is due; see NackGenerator.
+
+        """
+        with self._buffer_lock:
+            if (self._expected_seq_no is None
+                or len(self._out_of_order_packets) == 0):
+                return []
+
+            newest = max(
+                sequence_numbers.distance(
+                    seq_no,
+                    self._expected_seq_no,
+                    self._seq_no_rollover
+                )
+                for seq_no in self._out_of_order_packets
+            )
+            missing = []
+            for distance in range(newest):
+                seq_no = sequence_numbers.add(
+                    self._expected_seq_no,
+                    distance,
+                    self._seq_no_rollover
+                )
+                if seq_no not in self._out_of_order_packets:
+                    missing.append((seq_no, len(self._buffer) + distance))
+            return missing
+
     def _reset_buffer(self):
         """Resets the buffer.
 
@@ -130,56 +332,181 @@ class JitterBuffer:
             self._started = False
 
             # Fill the buffer with None's up to the given buffer
-            # length
-            for _ in range(self._buffer_length):
+            # length, or the target length in adaptive mode
+            if self._adaptive and self._started_once:
+                buffer_length = self.target_length
+            else:
+                buffer_length = self._buffer_length
+            for _ in range(buffer_length):
                 self._buffer.append(None)
 
+            # Number of None's at the start of the buffer
+            self._padding = buffer_length
+
             self._missed_sequential_packets = 0
 
+    @property
+    def jitter(self):
+        """Measured arrival jitter in milliseconds (adaptive mode only)."""
+        return self._jitter
+
+    @property
+    def target_length(self):
+        """Target depth of the buffer in adaptive mode, in frames."""
+        jitter_length = math.ceil(
+            self._jitter_multiplier * self._jitter / self._packet_duration
+        )
+        target = (
+            max(jitter_length, self._min_buffer_length)
+            + self._underrun_margin
+        )
+        return min(target, self._max_buffer_length)
+
+    def _update_jitter(self, seq_no):
+        """Updates the arrival jitter estimate.
+
+        Uses the RFC 3550 estimator, taking each packet's send time
+        to be its sequence number multiplied by the packet duration.
+
+        """
+        now = self._clock() * 1000
+        if self._last_arrival is not None:
+            distance = sequence_numbers.distance(
+                seq_no,
+                self._last_arrival_seq_no,
+                self._seq_no_rollover
+            )
+            d = (now - self._last_arrival) - distance * self._packet_duration
+            self._jitter += (abs(d) - self._jitter) / 16
+        self._last_arrival = now
+        self._last_arrival_seq_no = seq_no
+
+    def _adapt(self):
+        """Moves the depth of the buffer down towards the target depth.
+
+        Shrinks the buffer by discarding the frame at its head, but
+        only if that is one of the None's placed at the start of the
+        buffer on reset, or if the previous frame was concealed, so
+        that the gap joins the one already heard.
+
+        """
+        depth = len(self._buffer)
+        self._average_depth += (depth - self._average_depth) / 32
+
+        self._gets_since_underrun += 1
+        if (self._gets_since_underrun >= self._margin_decay_gets
+            and self._underrun_margin > 0):
+            self._underrun_margin -= 1
+            self._gets_since_underrun = 0
+
+        self._gets_since_adapt += 1
+        if self._padding > 0 and depth > self.target_length + 1:
+            # Discarding padding loses nothing, so needn't wait
+            self._buffer.popleft()
+            self._shrink()
+        elif self._concealed and depth > 1 and self._too_deep():
+            self._buffer.popleft()
+            self._shrink()
+
+    def _too_deep(self):
+        return (
+            self._gets_since_adapt >= self._shrink_interval
+            and self._average_depth > self.target_length + 1.5
+        )
+
+    def _shrink(self):
+        self._gets_since_adapt = 0
+        self._average_depth -= 1
+        if self._padding > 0:
+            self._padding -= 1
+        self._discarded_frames += 1
+
+    def _grow(self):
+        """Returns True if the buffer should grow by one frame.
+
+        Called when the buffer has run dry, so that the frame of
+        latency is added where a frame must be concealed anyway.
+
+        """
+        if (self._gets_since_adapt >= self._grow_interval
+            and self._average_depth < self.target_length - 1):
+            self._gets_since_adapt = 0
+            self._average_depth += 1
+            self._grown_frames += 1
+            return True
+        return False
+
     def _reset_stats(self):
         self._put_packets = 0
         self._got_packets = 0
         self._missed_packets = 0
         self._max_length = 0
         self._total_length_at_get = 0
+        self._grown_frames = 0
+        self._discarded_frames = 0
+        self._late_packets = 0
+        self._duplicate_packets = 0
+        self._out_of_order_count = 0
+        self._resets = 0
+        self._recovered_packets = 0
+        if self._metrics:
+            self._lengths_at_get = Histogram(self._histogram_buckets)
+            self._reorder_distances = Histogram(self._histogram_buckets)
 
-    def _print_stats(self):
-        print("JitterBuffer statistics:")
-        print("put packets:", self._put_packets)
-        print("got packets:", self._got_packets)
-        print("missed packets:", self._missed_packets)
-        print("max length:", self._max_length)
-        if self._got_packets > 0:
-            print("average length at get:", round(self._total_length_at_get/self._got_packets, 1))
-        
-            
-    def _check_out_of_order_packets(self):
-        with self._buffer_lock:
-            while self._expected_seq_no in self._out_of_order_packets:
-                oo_packet = self._out_of_order_packets[self._expected_seq_no]
-                self._buffer.append(oo_packet)
-                del self._out_of_order_packets[self._expected_seq_no]
-                self._expected_seq_no += 1
-                self._expected_seq_no %= self._seq_no_rollover
-                
-        
+    def snapshot(self):
+        """Returns the buffer's statistics.
 
-    # Calculates most likely distance between two sequence numbers
-    # given that they may have rolledover.
-    def _calc_distance(self, new, current):
-        adjusted_new = new + self._seq_no_rollover
-        adjusted_current = current + self._seq_no_rollover
+        The result is a dictionary with the keys "counters", "gauges"
+        and "histograms"; histograms are only included if metrics are
+        enabled.
 
-        distance = new - current
-
-        def assess(n,c):
-            if abs(n-c) < abs(distance):
-                return n-c
+        """
+        with self._buffer_lock:
+            if self._got_packets > 0:
+                average_length_at_get = (
+                    self._total_length_at_get / self._got_packets
+                )
             else:
-                return distance
+                average_length_at_get = None
+            snapshot = {
+                "counters": {
+                    "put_packets": self._put_packets,
+                    "got_packets": self._got_packets,
+                    "missed_packets": self._missed_packets,
+                    "late_packets": self._late_packets,
+                    "duplicate_packets": self._duplicate_packets,
+                    "out_of_order_packets": self._out_of_order_count,
+                    "resets": self._resets,
+                    "grown_frames": self._grown_frames,
+                    "discarded_frames": self._discarded_frames,
+                    "recovered_packets": self._recovered_packets,
+                },
+                "gauges": {
+                    "length": len(self._buffer) + len(self._out_of_order_packets),
+                    "max_length": self._max_length,
+                    "average_length_at_get": average_length_at_get,
+                },
+                "histograms": {},
+            }
+            if self._adaptive:
+                snapshot["gauges"]["jitter"] = self._jitter
+                snapshot["gauges"]["target_length"] = self.target_length
+            if self._metrics:
+                snapshot["histograms"] = {
+                    "length_at_get": self._lengths_at_get.snapshot(),
+                    "reorder_distance": self._reorder_distances.snapshot(),
+                }
+            return snapshot
 
-        distance = assess(adjusted_new, current)
-        distance = assess(adjusted_new, adjusted_current)
-        distance = assess(new, adjusted_current)
+    def publish(self, event_source, event="jitter_buffer"):
+        """Publishes a snapshot to the subscribers of an EventSource."""
+        publish_snapshot(event_source, event, self.snapshot())
 
-        return distance
+    def _check_out_of_order_packets(self):
+        # The lock must be held
+        while self._expected_seq_no in self._out_of_order_packets:
+            oo_packet = self._out_of_order_packets[self._expected_seq_no]
+            self._buffer.append(oo_packet)
+            del self._out_of_order_packets[self._expected_seq_no]
+            self._expected_seq_no += 1
+            self._expected_seq_no %= self._seq_no_rollover
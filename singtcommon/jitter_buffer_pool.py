@@ -0,0 +1,204 @@
+import threading
+
+import numpy
+
+from . import sequence_numbers
+from .fec import is_parity
+
+class JitterBufferPool:
+    """Jitter buffers for many streams, played out together.
+
+    Holds one jitter buffer per stream in shared NumPy arrays.
+    Packets must be arrays of packet_shape (for example, decoded
+    audio of shape (frames, channels)).  get_all() plays out one
+    packet from every stream with a fixed number of NumPy operations,
+    however many streams there are.
+
+    Each stream behaves as a SlotJitterBuffer would: it starts with
+    buffer_length frames of silence, discards packets that arrive too
+    late, and resets after too many packets in a row have been
+    missed.  seq_no_rollover is the value at which sequence numbers
+    roll back to zero; it must match the senders' (see
+    UDPPacketizer).
+
+    """
+    def __init__(self, streams, packet_shape, dtype=numpy.float32,
+                 buffer_length=3, capacity=64,
+                 seq_no_rollover=sequence_numbers.SEQ_NO_ROLLOVER):
+        self._lock = threading.Lock()
+        self._streams = streams
+        self._buffer_length = buffer_length
+        self._capacity = capacity
+
+        self._seq_no_rollover = seq_no_rollover
+
+        # Number of missed packets in a row to trigger buffer reset
+        self._max_missed_sequential_packets = 3
+
+        packet_shape = tuple(packet_shape)
+        self._packets = numpy.zeros(
+            (streams, capacity) + packet_shape,
+            dtype=dtype
+        )
+        self._present = numpy.zeros((streams, capacity), dtype=bool)
+        self._stream_indices = numpy.arange(streams)
+
+        # Per-stream state; see SlotJitterBuffer
+        self._read = numpy.zeros(streams, dtype=numpy.int64)
+        self._count = numpy.zeros(streams, dtype=numpy.int64)
+        self._padding = numpy.zeros(streams, dtype=numpy.int64)
+        self._started = numpy.zeros(streams, dtype=bool)
+        self._missed_sequential_packets = numpy.zeros(
+            streams,
+            dtype=numpy.int64
+        )
+
+        # Per-stream statistics
+        self._put_packets = numpy.zeros(streams, dtype=numpy.int64)
+        self._got_packets = numpy.zeros(streams, dtype=numpy.int64)
+        self._missed_packets = numpy.zeros(streams, dtype=numpy.int64)
+        self._late_packets = numpy.zeros(streams, dtype=numpy.int64)
+        self._overflowed_packets = numpy.zeros(streams, dtype=numpy.int64)
+        self._max_length = numpy.zeros(streams, dtype=numpy.int64)
+        self._total_length_at_get = numpy.zeros(streams, dtype=numpy.int64)
+
+        self._reset_streams(numpy.ones(streams, dtype=bool))
+
+    def __len__(self):
+        """Returns the number of streams."""
+        return self._streams
+
+    def length(self, stream_id):
+        """Returns the number of frames held for the given stream."""
+        return int(self._padding[stream_id] + self._count[stream_id])
+
+    def put(self, stream_id, seq_no, packet):
+        if is_parity(seq_no):
+            raise Exception(
+                f"Parity packet ({seq_no}) given to a JitterBufferPool, "+
+                f"which doesn't support FEC"
+            )
+        if seq_no >= self._seq_no_rollover:
+            raise Exception(
+                f"Unexpectedly large sequence number ({seq_no}), "+
+                f"roll-over expected at {self._seq_no_rollover}"
+            )
+
+        with self._lock:
+            # Update statistics
+            self._put_packets[stream_id] += 1
+            length = self._padding[stream_id] + self._count[stream_id]
+            if length > self._max_length[stream_id]:
+                self._max_length[stream_id] = length
+
+            # If we don't know which packet to play next, then just
+            # use whatever we've received
+            if not self._started[stream_id]:
+                self._started[stream_id] = True
+                self._read[stream_id] = seq_no
+
+            read = int(self._read[stream_id])
+            distance = sequence_numbers.distance(
+                seq_no,
+                read % self._seq_no_rollover,
+                self._seq_no_rollover
+            )
+
+            # Discard packets that are too late, or too far ahead to
+            # store
+            if distance < 0:
+                self._late_packets[stream_id] += 1
+                return
+            if distance >= self._capacity:
+                self._overflowed_packets[stream_id] += 1
+                return
+
+            index = (read + distance) % self._capacity
+            if self._present[stream_id, index]:
+                # Duplicate
+                return
+            self._packets[stream_id, index] = packet
+            self._present[stream_id, index] = True
+            self._count[stream_id] += 1
+
+    def get_all(self):
+        """Plays out one packet from every stream.
+
+        Returns a tuple (packets, missing).  packets is an array with
+        one packet per stream, stacked along the first axis; missing
+        is a boolean array that is True for streams that had no
+        packet to play, whose entries in packets are zero.
+
+        """
+        with self._lock:
+            # Update statistics
+            self._got_packets += 1
+            self._total_length_at_get += self._padding + self._count
+
+            slots = self._read % self._capacity
+            padded = self._started & (self._padding > 0)
+            playing = self._started & ~padded
+            have = playing & self._present[self._stream_indices, slots]
+            missed = playing & ~have
+
+            packets = self._packets[self._stream_indices, slots]
+            missing = ~have
+            packets[missing] = 0
+
+            # Remove the packets played
+            self._present[self._stream_indices[have], slots[have]] = False
+            self._count -= have
+            self._read += playing
+            self._padding -= padded
+
+            # Give up on packets that haven't arrived
+            self._missed_sequential_packets[have | padded] = 0
+            self._missed_sequential_packets += missed
+            self._missed_packets += missed
+            reset = (
+                self._missed_sequential_packets
+                >= self._max_missed_sequential_packets
+            )
+            if numpy.any(reset):
+                self._reset_streams(reset)
+
+            return packets, missing
+
+    def reset_stream(self, stream_id):
+        """Resets a stream and its statistics, e.g. for a new participant."""
+        with self._lock:
+            streams = numpy.zeros(self._streams, dtype=bool)
+            streams[stream_id] = True
+            self._reset_streams(streams)
+            for stats in (self._put_packets, self._got_packets,
+                          self._missed_packets, self._late_packets,
+                          self._overflowed_packets, self._max_length,
+                          self._total_length_at_get):
+                stats[stream_id] = 0
+
+    def statistics(self, stream_id):
+        """Returns a dictionary of statistics for the given stream."""
+        got_packets = int(self._got_packets[stream_id])
+        if got_packets > 0:
+            average_length_at_get = (
+                int(self._total_length_at_get[stream_id]) / got_packets
+            )
+        else:
+            average_length_at_get = None
+        return {
+            "put_packets": int(self._put_packets[stream_id]),
+            "got_packets": got_packets,
+            "missed_packets": int(self._missed_packets[stream_id]),
+            "late_packets": int(self._late_packets[stream_id]),
+            "overflowed_packets": int(self._overflowed_packets[stream_id]),
+            "max_length": int(self._max_length[stream_id]),
+            "average_length_at_get": average_length_at_get,
+        }
+
+    def _reset_streams(self, streams):
+        """Resets the buffers of the streams selected by a boolean mask."""
+        self._present[streams] = False
+        self._count[streams] = 0
+        self._started[streams] = False
+        self._padding[streams] = self._buffer_length
+        self._missed_sequential_packets[streams] = 0
@@ -0,0 +1,121 @@
+import json
+
+from twisted.web import resource
+
+class Histogram:
+    """Histogram of small non-negative integers.
+
+    Bucket i counts observations equal to i, except the last bucket,
+    which counts all observations of at least buckets-1.
+
+    """
+    def __init__(self, buckets):
+        self.counts = [0] * buckets
+        self.sum = 0
+        self._last = buckets - 1
+
+    def observe(self, value):
+        self.sum += value
+        if value > self._last:
+            value = self._last
+        self.counts[value] += 1
+
+    def snapshot(self):
+        return {"counts": list(self.counts), "sum": self.sum}
+
+
+def publish_snapshot(event_source, event, snapshot):
+    """Publishes a snapshot to all subscribers of an EventSource as JSON."""
+    event_source.publish_to_all(event, json.dumps(snapshot))
+
+
+def _escape_label_value(value):
+    """Escapes a label value as the Prometheus text format requires."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+def prometheus_text(name, snapshots):
+    """Formats snapshots in the Prometheus text exposition format.
+
+    snapshots maps a label value (for example, a participant's name)
+    to a snapshot; each is exported with the label
+    instance="<label value>", escaped as the format requires.  A
+    snapshot is a dictionary with the keys "counters", "gauges" and
+    "histograms", each mapping metric names to values.  Gauges whose
+    value is None are skipped.
+
+    """
+    def metrics(kind):
+        collected = {}
+        for label, snapshot in snapshots.items():
+            label = _escape_label_value(label)
+            for key, value in snapshot.get(kind, {}).items():
+                collected.setdefault(key, []).append((label, value))
+        return sorted(collected.items())
+
+    lines = []
+    for key, values in metrics("counters"):
+        metric = f"{name}_{key}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for label, value in values:
+            lines.append(f'{metric}{{instance="{label}"}} {value}')
+
+    for key, values in metrics("gauges"):
+        metric = f"{name}_{key}"
+        lines.append(f"# TYPE {metric} gauge")
+        for label, value in values:
+            if value is not None:
+                lines.append(f'{metric}{{instance="{label}"}} {value}')
+
+    for key, values in metrics("histograms"):
+        metric = f"{name}_{key}"
+        lines.append(f"# TYPE {metric} histogram")
+        for label, value in values:
+            cumulative = 0
+            counts = value["counts"]
+            for bucket, count in enumerate(counts[:-1]):
+                cumulative += count
+                lines.append(
+                    f'{metric}_bucket{{instance="{label}",le="{bucket}"}} '+
+                    f'{cumulative}'
+                )
+            cumulative += counts[-1]
+            lines.append(
+                f'{metric}_bucket{{instance="{label}",le="+Inf"}} '+
+                f'{cumulative}'
+            )
+            lines.append(f'{metric}_sum{{instance="{label}"}} {value["sum"]}')
+            lines.append(f'{metric}_count{{instance="{label}"}} {cumulative}')
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsResource(resource.Resource):
+    """Serves snapshots in the Prometheus text exposition format.
+
+    sources is a function returning a dictionary that maps label
+    values to objects with a snapshot() method, such as
+    JitterBuffers.
+
+    """
+    isLeaf = True
+
+    def __init__(self, name, sources):
+        super().__init__()
+        self._name = name
+        self._sources = sources
+
+    def render_GET(self, request):
+        request.setHeader(
+            "Content-Type",
+            "text/plain; version=0.0.4; charset=utf-8"
+        )
+        snapshots = {
+            label: source.snapshot()
+            for label, source in self._sources().items()
+        }
+        return prometheus_text(self._name, snapshots).encode("utf-8")
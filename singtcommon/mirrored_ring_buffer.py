@@ -0,0 +1,179 @@
+import ctypes
+import math
+import mmap
+import os
+import weakref
+
+import numpy
+
+# Linux values, which mmap doesn't export
+_PROT_NONE = 0
+_MAP_FIXED = 0x10
+_MAP_FAILED = ctypes.c_void_p(-1).value
+
+def _libc():
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.mmap.restype = ctypes.c_void_p
+    libc.mmap.argtypes = [
+        ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int,
+        ctypes.c_int, ctypes.c_int, ctypes.c_long
+    ]
+    libc.munmap.restype = ctypes.c_int
+    libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    return libc
+
+def _map_mirrored(size):
+    """Maps size bytes of shared memory twice, back to back.
+
+    Returns the address of the first mapping; the second follows
+    immediately after it.  size must be a multiple of the page size.
+
+    """
+    libc = _libc()
+    fd = os.memfd_create("singtcommon-ring-buffer", os.MFD_CLOEXEC)
+    try:
+        os.ftruncate(fd, size)
+
+        # Reserve twice the address space, then map the memory into
+        # each half
+        address = libc.mmap(
+            None, 2*size, _PROT_NONE,
+            mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS, -1, 0
+        )
+        if address == _MAP_FAILED:
+            raise OSError(ctypes.get_errno(), "mmap failed")
+        for offset in (0, size):
+            mapped = libc.mmap(
+                address + offset, size,
+                mmap.PROT_READ | mmap.PROT_WRITE,
+                mmap.MAP_SHARED | _MAP_FIXED, fd, 0
+            )
+            if mapped != address + offset:
+                errno = ctypes.get_errno()
+                libc.munmap(address, 2*size)
+                raise OSError(errno, "mmap failed")
+    finally:
+        # The mappings keep the memory alive
+        os.close(fd)
+    return address
+
+def _unmap(address, size):
+    _libc().munmap(address, size)
+
+
+class MirroredRingBuffer:
+    """Ring buffer whose contents are always contiguous (Linux only).
+
+    Has the same put(), get() and len() as RingBuffer.  The storage is
+    mapped twice into consecutive virtual memory, so the item after
+    the last in the buffer is the first again.  Any run of up to
+    capacity items is therefore one contiguous array: put() and get()
+    are single copies, and peek() and reserve() always return a
+    single view.
+
+    The number of items held is rounded up so that the storage is a
+    whole number of pages; see capacity.
+
+    """
+    def __init__(self, shape, dtype=numpy.int16):
+        if not hasattr(os, "memfd_create"):
+            raise Exception(
+                "MirroredRingBuffer requires Linux (os.memfd_create)"
+            )
+        dtype = numpy.dtype(dtype)
+        shape = list(shape)
+        item_shape = tuple(shape[1:])
+        item_size = dtype.itemsize * math.prod(item_shape)
+
+        # Round the capacity up to a whole number of pages
+        items_per_page = mmap.PAGESIZE // math.gcd(mmap.PAGESIZE, item_size)
+        capacity = max(shape[0], 1)
+        capacity = -(-capacity // items_per_page) * items_per_page
+        size = capacity * item_size
+
+        address = _map_mirrored(size)
+        memory = (ctypes.c_char * (2*size)).from_address(address)
+        # Unmap once neither the buffer nor any view of it is in use
+        weakref.finalize(memory, _unmap, address, 2*size)
+
+        self._capacity = capacity
+        self._buffer = numpy.frombuffer(memory, dtype=dtype).reshape(
+            (2*capacity,) + item_shape
+        )
+
+        # Number of items ever put and got; they increase without
+        # wrapping, so that the buffer can be completely filled
+        self._producer_index = 0
+        self._consumer_index = 0
+
+    @property
+    def capacity(self):
+        """Number of items the buffer can hold."""
+        return self._capacity
+
+    def __len__(self):
+        return self._producer_index - self._consumer_index
+
+    def put(self, array):
+        # Check we have matching dtypes
+        if self._buffer.dtype != array.dtype:
+            raise Exception(
+                f"Buffer type ({self._buffer.dtype}) and "+
+                f"array type ({array.dtype}) do not match"
+            )
+        self.reserve(len(array))[0][:] = array
+        self._producer_index += len(array)
+
+    def get(self, out):
+        out[:] = self.peek(len(out))[0]
+        self._consumer_index += len(out)
+
+    def peek(self, n):
+        """Returns a one-element tuple holding a view of the next n items.
+
+        See RingBuffer.peek(); the items never wrap.
+
+        """
+        data_available = len(self)
+        if n > data_available:
+            raise Exception(
+                f"Buffer underrun: insufficient data available "+
+                f"({data_available}) for the size of the request "+
+                f"({n})."
+            )
+        index = self._consumer_index % self._capacity
+        return (self._buffer[index:index+n],)
+
+    def advance(self, n):
+        data_available = len(self)
+        if n > data_available:
+            raise Exception(
+                f"Buffer underrun: insufficient data available "+
+                f"({data_available}) to advance by {n}."
+            )
+        self._consumer_index += n
+
+    def reserve(self, n):
+        """Returns a one-element tuple holding a view of space for n items.
+
+        See RingBuffer.reserve(); the space never wraps.
+
+        """
+        space_remaining = self._capacity - len(self)
+        if n > space_remaining:
+            raise Exception(
+                f"Buffer overrun: Length of array ({n}) "+
+                f"too great for space remaining in buffer "+
+                f"({space_remaining})"
+            )
+        index = self._producer_index % self._capacity
+        return (self._buffer[index:index+n],)
+
+    def commit(self, n):
+        space_remaining = self._capacity - len(self)
+        if n > space_remaining:
+            raise Exception(
+                f"Buffer overrun: Commit ({n}) too great for space "+
+                f"remaining in buffer ({space_remaining})"
+            )
+        self._producer_index += n
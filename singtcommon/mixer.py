@@ -0,0 +1,192 @@
+import numpy
+
+from .automatic_gain_control import AutomaticGainControl, next_gain
+
+class Mixer:
+    """Mixes many streams of audio, e.g. one per singer on a server.
+
+    Each stream has its own ring of capacity frames, all held in one
+    array of shape (streams, capacity, channels).  Every tick, mix()
+    takes the next block of frames from every stream, applies each
+    stream's automatic gain control (optionally), gain and mute, and
+    sums them.  Alongside the total mix it produces one N-minus-one
+    mix per stream, which leaves that stream out, so that no singer
+    hears themselves.  A tick takes a fixed number of NumPy
+    operations, however many streams there are.
+
+    """
+    def __init__(self, streams, capacity, channels=1,
+                 dtype=numpy.float32, agc=False, max_gain=30):
+        """Creates a mixer.
+
+        If agc is True, each stream's level is adjusted as
+        AutomaticGainControl.apply() would, with gains of at most
+        max_gain.
+
+        """
+        self._streams = streams
+        self._capacity = capacity
+        self._channels = channels
+        self._dtype = numpy.dtype(dtype)
+
+        self._buffer = numpy.zeros(
+            (streams, capacity, channels),
+            dtype=dtype
+        )
+        # The rings as one array of frames, for gathering blocks
+        self._frames = self._buffer.reshape((streams * capacity, channels))
+        self._offsets = numpy.arange(streams)[:, None] * capacity
+
+        # Number of frames ever put into and taken from each stream
+        self._write = numpy.zeros(streams, dtype=numpy.int64)
+        self._read = numpy.zeros(streams, dtype=numpy.int64)
+
+        # Per-stream gain and mute, which may be changed at any time
+        self.gains = numpy.ones(streams, dtype=dtype)
+        self.muted = numpy.zeros(streams, dtype=bool)
+
+        # Automatic gain control state; see AutomaticGainControl
+        self._agc = agc
+        self._agc_gains = numpy.ones(streams, dtype=dtype)
+        self._agc_mu = AutomaticGainControl.mu
+        self._agc_target = AutomaticGainControl.target
+        self._agc_loud_peak = AutomaticGainControl.loud_peak
+        self._max_gain = max_gain
+
+        # Per-stream counts of puts that didn't fit and ticks that
+        # found too few frames
+        self.overruns = numpy.zeros(streams, dtype=numpy.int64)
+        self.underruns = numpy.zeros(streams, dtype=numpy.int64)
+
+        # Working arrays for the most recent block size
+        self._block_frames = None
+
+    def __len__(self):
+        """Returns the number of streams."""
+        return self._streams
+
+    def length(self, stream_id):
+        """Returns the number of frames held for the given stream."""
+        return int(self._write[stream_id] - self._read[stream_id])
+
+    def put(self, stream_id, array):
+        """Adds frames of shape (frames, channels) to a stream.
+
+        Returns the number of frames stored; frames that don't fit
+        are dropped and counted in overruns.
+
+        """
+        write = int(self._write[stream_id])
+        space_remaining = self._capacity - (write - int(self._read[stream_id]))
+        n = len(array)
+        if n > space_remaining:
+            self.overruns[stream_id] += 1
+            n = space_remaining
+            array = array[:n]
+
+        ring = self._buffer[stream_id]
+        start = write % self._capacity
+        end = start + n
+        if end <= self._capacity:
+            ring[start:end] = array
+        else:
+            split = self._capacity - start
+            ring[start:] = array[:split]
+            ring[:end - self._capacity] = array[split:]
+        self._write[stream_id] = write + n
+        return n
+
+    def reset_stream(self, stream_id):
+        """Discards a stream's frames and state, e.g. for a new singer."""
+        self._read[stream_id] = self._write[stream_id]
+        self._agc_gains[stream_id] = 1
+        self.overruns[stream_id] = 0
+        self.underruns[stream_id] = 0
+
+    def mix(self, frames):
+        """Mixes the next frames frames of every stream.
+
+        Returns a tuple (total, minus_one).  total, of shape (frames,
+        channels), is the sum of every stream; minus_one, of shape
+        (streams, frames, channels), holds for each stream the sum of
+        every other stream.  Streams with fewer than frames frames
+        available are padded with silence and counted in underruns.
+
+        The arrays returned are reused by the next call to mix().
+
+        """
+        if frames > self._capacity:
+            raise Exception(
+                f"Cannot mix {frames} frames from rings of capacity "+
+                f"{self._capacity}"
+            )
+        if self._block_frames != frames:
+            self._allocate(frames)
+        block = self._block
+        contribution = self._contribution
+
+        # Gather the next block of every stream
+        available = self._write - self._read
+        taken = numpy.minimum(available, frames)
+        # Modulo on the (streams, frames) indices is slow, so only the
+        # start of each block is wrapped; the indices past the end of
+        # a ring are then brought back to its start
+        indices = self._indices
+        starts = self._read % self._capacity
+        numpy.add(self._positions, starts[:, None], out=indices)
+        numpy.subtract(
+            indices,
+            self._capacity,
+            out=indices,
+            where=indices >= self._capacity
+        )
+        indices += self._offsets
+        numpy.take(self._frames, indices, axis=0, out=block)
+        short = available < frames
+        if numpy.any(short):
+            self.underruns += short
+            block *= (self._positions < taken[:, None])[:, :, None]
+        self._read += taken
+
+        # Per-stream gain, ramped from the previous automatic gain to
+        # the new one across the block
+        gains = self.gains * ~self.muted
+        if self._agc:
+            old_gains = self._agc_gains.copy()
+            self._update_agc_gains(block)
+            ramps = (
+                self._ramp[None, :] * (self._agc_gains - old_gains)[:, None]
+            )
+            ramps += old_gains[:, None]
+            ramps *= gains[:, None]
+            numpy.multiply(block, ramps[:, :, None], out=contribution)
+        else:
+            numpy.multiply(block, gains[:, None, None], out=contribution)
+
+        numpy.sum(contribution, axis=0, out=self._total)
+        numpy.subtract(self._total[None], contribution, out=self._minus_one)
+        return self._total, self._minus_one
+
+    def _update_agc_gains(self, block):
+        """Updates the automatic gains as AutomaticGainControl.apply()."""
+        gains = self._agc_gains
+        peaks = numpy.abs(block).max(axis=(1, 2)) * gains
+        gains[:] = next_gain(
+            gains,
+            peaks,
+            self._agc_mu,
+            self._agc_target,
+            self._max_gain,
+            self._agc_loud_peak
+        )
+
+    def _allocate(self, frames):
+        shape = (self._streams, frames, self._channels)
+        self._block = numpy.zeros(shape, dtype=self._dtype)
+        self._contribution = numpy.zeros(shape, dtype=self._dtype)
+        self._minus_one = numpy.zeros(shape, dtype=self._dtype)
+        self._total = numpy.zeros((frames, self._channels), dtype=self._dtype)
+        self._positions = numpy.arange(frames)[None, :]
+        self._indices = numpy.zeros((self._streams, frames), dtype=numpy.int64)
+        self._ramp = numpy.linspace(0, 1, frames, dtype=self._dtype)
+        self._block_frames = frames
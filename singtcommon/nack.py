@@ -0,0 +1,179 @@
+"""Negative acknowledgements (NACKs) for selective retransmission.
+
+The receiver asks its JitterBuffer which packets are missing
+(JitterBuffer.missing_packets()), and a NackGenerator picks those
+that a retransmission could still deliver before they are due to be
+played.  The resulting sequence numbers are sent to the sender as a
+compact report (encode_nack()).  The sender keeps recently sent
+packets in a RetransmitCache, given to its UDPPacketizer, and resends
+the requested ones with UDPPacketizer.retransmit().
+
+"""
+import collections
+import struct
+import time
+
+from . import sequence_numbers
+
+# Each entry in a NACK report is a sequence number followed by a
+# bitmask of the sixteen sequence numbers after it, as in the RTCP
+# generic NACK (RFC 4585 section 6.2.1)
+_nack_entry = struct.Struct(">HH")
+_nack_mask_bits = 16
+
+def encode_nack(seq_nos, rollover=sequence_numbers.SEQ_NO_ROLLOVER):
+    """Encodes sequence numbers as a NACK report.
+
+    seq_nos should be in increasing order (allowing for roll-over),
+    as returned by NackGenerator.update(); runs of nearby sequence
+    numbers then share a four-byte entry.
+
+    """
+    entries = []
+    first = None
+    mask = 0
+    for seq_no in seq_nos:
+        if first is not None:
+            distance = sequence_numbers.distance(seq_no, first, rollover)
+            if 0 < distance <= _nack_mask_bits:
+                mask |= 1 << (distance - 1)
+                continue
+            entries.append(_nack_entry.pack(first, mask))
+        first = seq_no
+        mask = 0
+    if first is not None:
+        entries.append(_nack_entry.pack(first, mask))
+    return b"".join(entries)
+
+def decode_nack(report, rollover=sequence_numbers.SEQ_NO_ROLLOVER):
+    """Decodes a NACK report into a list of sequence numbers."""
+    if len(report) % _nack_entry.size != 0:
+        raise Exception(
+            f"NACK report length ({len(report)} bytes) is not a "+
+            f"multiple of {_nack_entry.size}"
+        )
+    seq_nos = []
+    for first, mask in _nack_entry.iter_unpack(report):
+        seq_nos.append(first)
+        for bit in range(_nack_mask_bits):
+            if mask & (1 << bit):
+                seq_nos.append(
+                    sequence_numbers.add(first, bit + 1, rollover)
+                )
+    return seq_nos
+
+
+class NackGenerator:
+    """Decides which missing packets to request from the sender.
+
+    A packet is only requested if a retransmission could arrive
+    before it is due to be played, i.e. if the time until its playout
+    exceeds the round-trip time.  A packet that is still missing is
+    requested again after retry_interval milliseconds (by default the
+    round-trip time), up to max_requests times.
+
+    """
+    def __init__(self, packet_duration=20, round_trip_time=50,
+                 retry_interval=None, max_requests=3,
+                 clock=time.monotonic):
+        """Creates a NACK generator.
+
+        packet_duration and round_trip_time are in milliseconds, and
+        clock returns the current time in seconds.
+
+        """
+        self._packet_duration = packet_duration
+        self.round_trip_time = round_trip_time
+        self._retry_interval = retry_interval
+        self._max_requests = max_requests
+        self._clock = clock
+
+        # Maps sequence numbers to (time of last request in
+        # milliseconds, number of requests)
+        self._requests = {}
+
+        self.requested_packets = 0
+
+    def update(self, missing):
+        """Returns the sequence numbers to request now.
+
+        missing is a list of (seq_no, packets_until_playout) pairs,
+        as returned by JitterBuffer.missing_packets().
+
+        """
+        now = self._clock() * 1000
+        retry_interval = self._retry_interval
+        if retry_interval is None:
+            retry_interval = self.round_trip_time
+
+        requests = {}
+        nack = []
+        for seq_no, packets_until_playout in missing:
+            previous = self._requests.get(seq_no)
+            if previous is not None:
+                requests[seq_no] = previous
+                last_request, count = previous
+                if (count >= self._max_requests
+                    or now - last_request < retry_interval):
+                    continue
+            else:
+                count = 0
+
+            time_until_playout = packets_until_playout * self._packet_duration
+            if time_until_playout <= self.round_trip_time:
+                continue
+
+            requests[seq_no] = (now, count + 1)
+            nack.append(seq_no)
+
+        # Forget packets that have since arrived or been given up on
+        self._requests = requests
+        self.requested_packets += len(nack)
+        return nack
+
+
+class RetransmitCache:
+    """Recently sent packets, kept for retransmission.
+
+    Holds the packets sent in the last duration seconds, up to the
+    number of packets of packet_duration milliseconds that fit in
+    that time.  Packets are keyed by sequence number, so a packet is
+    replaced when its sequence number is reused.
+
+    """
+    def __init__(self, duration=1.0, packet_duration=20,
+                 clock=time.monotonic):
+        self._duration = duration
+        self._max_packets = max(int(duration * 1000 / packet_duration), 1)
+        self._clock = clock
+
+        # Maps sequence numbers to (send time, data), oldest first
+        self._packets = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._packets)
+
+    def put(self, seq_no, data):
+        now = self._clock()
+        packets = self._packets
+        if seq_no in packets:
+            del packets[seq_no]
+        packets[seq_no] = (now, data)
+        self._evict(now)
+
+    def get(self, seq_no):
+        """Returns the data sent with seq_no, or None if not held."""
+        self._evict(self._clock())
+        entry = self._packets.get(seq_no)
+        if entry is None:
+            return None
+        return entry[1]
+
+    def _evict(self, now):
+        packets = self._packets
+        oldest = now - self._duration
+        while len(packets) > 0:
+            seq_no, (sent, _) = next(iter(packets.items()))
+            if sent >= oldest and len(packets) <= self._max_packets:
+                break
+            del packets[seq_no]
@@ -0,0 +1,207 @@
+import collections
+
+from twisted.internet import interfaces
+from twisted.internet import protocol
+from twisted.logger import Logger
+from zope.interface import implementer
+
+from .tcp_packetizer import TCPPacketizer
+
+# Start a logger with a namespace for a particular subsystem of our application.
+log = Logger("packetized_protocol")
+
+class _OutboundQueue:
+    """Transport given to the protocol's packetizer.
+
+    Hands everything the packetizer writes to the protocol, which
+    decides whether it can go straight to the real transport or must
+    be queued.
+
+    """
+    def __init__(self, protocol):
+        self._protocol = protocol
+
+    def write(self, data):
+        self._protocol._send([data])
+
+    def writeSequence(self, seq):
+        self._protocol._send(seq)
+
+
+@implementer(interfaces.IPushProducer)
+class PacketizedProtocol(protocol.Protocol):
+    """Twisted protocol that sends and receives packetized messages.
+
+    Received messages are passed to frameReceived(), which calls the
+    handler given to the constructor.  Subclasses may instead
+    override frameReceived().
+
+    The protocol registers itself as a streaming producer with its
+    transport.  While the transport's buffer is full, outbound
+    messages are queued.  Once the queue holds more than
+    high_watermark bytes the protocol stops reading from the peer and
+    calls sendingPaused(); once it drains below low_watermark bytes
+    reading resumes and sendingResumed() is called.  If the queue
+    exceeds max_queued_bytes the connection is aborted, so a stalled
+    peer can't make the queue grow without bound; by default the
+    maximum is four times the high watermark.
+
+    Any further keyword arguments are passed to the TCPPacketizer.
+
+    """
+    def __init__(self, handler=None,
+                 high_watermark=1024*1024,
+                 low_watermark=256*1024,
+                 max_queued_bytes=None,
+                 **packetizer_kwargs):
+        if low_watermark > high_watermark:
+            raise Exception(
+                f"Low watermark ({low_watermark}) must not exceed "+
+                f"high watermark ({high_watermark})"
+            )
+        if max_queued_bytes is None:
+            max_queued_bytes = 4 * high_watermark
+        if max_queued_bytes < high_watermark:
+            raise Exception(
+                f"Maximum queued bytes ({max_queued_bytes}) must not be "+
+                f"less than the high watermark ({high_watermark})"
+            )
+        self._handler = handler
+        self._high_watermark = high_watermark
+        self._low_watermark = low_watermark
+        self._max_queued_bytes = max_queued_bytes
+
+        self.packetizer = TCPPacketizer(
+            _OutboundQueue(self),
+            **packetizer_kwargs
+        )
+
+        # Data waiting for the transport to accept it
+        self._queue = collections.deque()
+        self._queued_bytes = 0
+
+        # True while the transport has asked us to stop writing
+        self._paused = False
+
+        # True while we have stopped reading from the peer because the
+        # queue is above the high watermark
+        self._throttled = False
+
+        self._stopped = False
+
+    @property
+    def queued_bytes(self):
+        """Number of outbound bytes waiting for the transport."""
+        return self._queued_bytes
+
+    @property
+    def writable(self):
+        """False while the outbound queue is above the high watermark."""
+        return not self._throttled
+
+    def connectionMade(self):
+        self.transport.registerProducer(self, True)
+
+    def connectionLost(self, reason=protocol.connectionDone):
+        self._stopped = True
+        self._queue.clear()
+        self._queued_bytes = 0
+
+    def dataReceived(self, data):
+        for frame in self.packetizer.decode_bytes(data):
+            self.frameReceived(frame)
+
+    def frameReceived(self, frame):
+        """Called with each received message.
+
+        The message is bytes-like: with Framing.UINT32 or
+        Framing.VARINT, messages of at least the packetizer's
+        large_message_threshold bytes arrive as memoryviews rather
+        than bytes, so call bytes() on one that must be hashed or
+        kept.
+
+        """
+        if self._handler is not None:
+            self._handler(frame)
+
+    def send(self, msg):
+        """Sends a string."""
+        self.packetizer.write(msg)
+
+    def send_bytes(self, msg_bytes):
+        """Sends bytes."""
+        self.packetizer.write_bytes(msg_bytes)
+
+    def send_many(self, msgs):
+        """Sends a sequence of strings."""
+        self.packetizer.write_many(msgs)
+
+    def send_many_bytes(self, msgs):
+        """Sends a sequence of bytes."""
+        self.packetizer.write_many_bytes(msgs)
+
+    def sendingPaused(self):
+        """Called when the outbound queue rises above the high watermark.
+
+        Override to stop generating messages for this peer.
+
+        """
+
+    def sendingResumed(self):
+        """Called when the outbound queue drains below the low watermark."""
+
+    # IPushProducer, called by the transport
+
+    def pauseProducing(self):
+        self._paused = True
+
+    def resumeProducing(self):
+        self._paused = False
+        self._drain()
+
+    def stopProducing(self):
+        self._paused = True
+        self._stopped = True
+        self._queue.clear()
+        self._queued_bytes = 0
+
+    def _send(self, chunks):
+        if self._stopped:
+            return
+
+        # Write directly if nothing is waiting ahead of this data
+        if not self._paused and len(self._queue) == 0:
+            self.transport.writeSequence(chunks)
+            return
+
+        for chunk in chunks:
+            self._queue.append(chunk)
+            self._queued_bytes += len(chunk)
+
+        if self._queued_bytes > self._max_queued_bytes:
+            log.warn(
+                "Outbound queue ({queued} bytes) exceeds maximum; "
+                "aborting connection",
+                queued=self._queued_bytes
+            )
+            self.stopProducing()
+            self.transport.abortConnection()
+            return
+
+        if not self._throttled and self._queued_bytes > self._high_watermark:
+            self._throttled = True
+            self.transport.pauseProducing()
+            self.sendingPaused()
+
+    def _drain(self):
+        # Write one chunk at a time as the transport may ask us to
+        # pause again part way through
+        while len(self._queue) > 0 and not self._paused:
+            chunk = self._queue.popleft()
+            self._queued_bytes -= len(chunk)
+            self.transport.write(chunk)
+
+        if self._throttled and self._queued_bytes <= self._low_watermark:
+            self._throttled = False
+            self.transport.resumeProducing()
+            self.sendingResumed()
@@ -0,0 +1,206 @@
+import struct
+import threading
+
+import numpy
+
+# RIFF/WAVE header with a 16-byte fmt chunk, followed by the data
+# chunk's header
+_wav_header = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+# WAVE format tags
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+
+class Recorder:
+    """Records audio to a file through a memory map.
+
+    Blocks of shape (frames, channels) are appended with write(),
+    each with a single slice copy into a numpy.memmap of the file.
+    Only a window of chunk_seconds of audio is mapped at a time, and
+    the file is extended a window at a time, so memory use doesn't
+    grow with the length of the recording.
+
+    A background thread flushes the mapped audio to the file every
+    flush_interval seconds and updates the header, so the file can be
+    read while recording is still in progress.  The flush happens
+    outside the lock write() takes, and windows that write() has
+    moved past are flushed by the thread rather than by write(), so
+    writing isn't held up by the disk.  close() writes the final
+    header and trims the file to the audio written.
+
+    With file_format="wav" the file is a WAV file: integer types are
+    written as PCM and floating point types as IEEE float.  WAV's
+    8-bit PCM is unsigned and its wider PCM is signed, so the integer
+    types accepted are uint8 and signed types of 16 bits or more.  WAV sizes
+    are 32-bit, so a header for more than 4GB of audio records the
+    largest size it can.  With file_format="raw" there is no header.
+
+    """
+    def __init__(self, path, channels, samplerate=48000,
+                 dtype=numpy.int16, file_format="wav", chunk_seconds=60,
+                 flush_interval=1.0):
+        if file_format not in ("wav", "raw"):
+            raise Exception(
+                f"Unknown file format '{file_format}'; expected 'wav' "+
+                f"or 'raw'"
+            )
+        self._path = path
+        self._channels = channels
+        self._samplerate = samplerate
+        self._dtype = numpy.dtype(dtype)
+        if (file_format == "wav" and self._dtype.kind in "iu"
+            and (self._dtype.itemsize == 1) != (self._dtype.kind == "u")):
+            raise Exception(
+                f"WAV files can't hold {self._dtype} audio; 8-bit "+
+                f"audio must be uint8 and wider audio signed"
+            )
+        self._file_format = file_format
+        self._chunk_frames = max(int(chunk_seconds * samplerate), 1)
+        self._frame_size = self._dtype.itemsize * channels
+
+        if file_format == "wav":
+            self._header_size = _wav_header.size
+        else:
+            self._header_size = 0
+
+        # _lock guards the map and the file, and is taken by
+        # write(); _flush_lock keeps flushes, and close(), in order
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._frames_written = 0
+        self._closed = False
+
+        self._file = open(path, "w+b")
+        self._map = None
+        # Maps of windows that write() has finished with, waiting to
+        # be flushed
+        self._retired_maps = []
+        self._write_header(0)
+        self._map_chunk(0)
+
+        self._stop = threading.Event()
+        self._flush_interval = flush_interval
+        self._flush_thread = threading.Thread(
+            target=self._flush_periodically,
+            name="Recorder flush",
+            daemon=True
+        )
+        self._flush_thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def frames_written(self):
+        return self._frames_written
+
+    def write(self, block):
+        """Appends a block of shape (frames, channels)."""
+        if block.dtype != self._dtype:
+            raise Exception(
+                f"Recorder type ({self._dtype}) and block type "+
+                f"({block.dtype}) do not match"
+            )
+        with self._lock:
+            if self._closed:
+                raise Exception("Recorder is closed")
+            written = 0
+            while written < len(block):
+                position = self._frames_written - self._chunk_start
+                if position == self._chunk_frames:
+                    self._map_chunk(self._frames_written)
+                    position = 0
+                n = min(len(block) - written, self._chunk_frames - position)
+                self._map[position:position+n] = block[written:written+n]
+                written += n
+                self._frames_written += n
+
+    def flush(self):
+        """Flushes the audio written so far and updates the header."""
+        with self._flush_lock:
+            with self._lock:
+                if self._closed:
+                    return
+                current_map = self._map
+                retired_maps = self._retired_maps
+                self._retired_maps = []
+                frames_written = self._frames_written
+
+            # Flush without holding _lock, so that write() can carry
+            # on; everything up to frames_written is in these maps
+            for retired_map in retired_maps:
+                retired_map.flush()
+            current_map.flush()
+
+            with self._lock:
+                self._write_header(frames_written)
+
+    def close(self):
+        """Stops recording, finalising the header and file size."""
+        self._stop.set()
+        if threading.current_thread() is not self._flush_thread:
+            self._flush_thread.join()
+        with self._flush_lock, self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for retired_map in self._retired_maps:
+                retired_map.flush()
+            self._retired_maps = []
+            self._map.flush()
+            self._map = None
+            self._file.truncate(
+                self._header_size + self._frames_written * self._frame_size
+            )
+            self._write_header(self._frames_written)
+            self._file.close()
+
+    def _map_chunk(self, start):
+        """Maps the chunk of the file starting at frame start.
+
+        The previous chunk's map is left for flush() to flush.
+
+        """
+        if self._map is not None:
+            self._retired_maps.append(self._map)
+        self._file.truncate(
+            self._header_size
+            + (start + self._chunk_frames) * self._frame_size
+        )
+        self._map = numpy.memmap(
+            self._file,
+            dtype=self._dtype,
+            mode="r+",
+            offset=self._header_size + start * self._frame_size,
+            shape=(self._chunk_frames, self._channels)
+        )
+        self._chunk_start = start
+
+    def _write_header(self, frames_written):
+        if self._file_format != "wav":
+            return
+        data_size = min(
+            frames_written * self._frame_size,
+            2**32 - 1 - 36
+        )
+        if numpy.issubdtype(self._dtype, numpy.floating):
+            format_tag = _WAVE_FORMAT_IEEE_FLOAT
+        else:
+            format_tag = _WAVE_FORMAT_PCM
+        header = _wav_header.pack(
+            b"RIFF", 36 + data_size, b"WAVE",
+            b"fmt ", 16, format_tag, self._channels, self._samplerate,
+            self._samplerate * self._frame_size, self._frame_size,
+            self._dtype.itemsize * 8,
+            b"data", data_size
+        )
+        self._file.seek(0)
+        self._file.write(header)
+        self._file.flush()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self._flush_interval):
+            self.flush()
@@ -1,7 +1,39 @@
+from enum import Enum
+import threading
+import time
+
 import numpy
 
+class Overrun(Enum):
+    """What put_partial() does with items that don't fit.
+
+    DROP_NEWEST discards the items that don't fit.  DROP_OLDEST
+    discards the oldest items in the buffer to make room, which suits
+    live monitoring, where only the most recent audio matters.
+
+    """
+    DROP_NEWEST = 10
+    DROP_OLDEST = 20
+
+class Underrun(Enum):
+    """What get_partial() does with the part of out it can't fill.
+
+    LEAVE leaves it untouched, and ZERO_FILL fills it with zeros
+    (silence).
+
+    """
+    LEAVE = 10
+    ZERO_FILL = 20
+
 class RingBuffer:
-    def __init__(self, shape, dtype=numpy.int16):
+    def __init__(self, shape, dtype=numpy.int16, overrun=Overrun.DROP_NEWEST,
+                 underrun=Underrun.LEAVE):
+        """Creates a ring buffer holding shape[0] items.
+
+        overrun and underrun select the policies of put_partial() and
+        get_partial(); put() and get() always raise instead.
+
+        """
         # Add an extra element in the first dimension.  This allows
         # the ring buffer to hold the number of items specified (as
         # the ring buffer can only hold length-1 items).
@@ -11,6 +43,27 @@ class RingBuffer:
         self._producer_index = 0
         self._consumer_index = 0
 
+        self._overrun = overrun
+        self._underrun = underrun
+
+        # Range of the buffer's type, to which scaled items are
+        # clipped, and scratch space for scaling them
+        if numpy.issubdtype(self._buffer.dtype, numpy.integer):
+            info = numpy.iinfo(self._buffer.dtype)
+            self._limits = (info.min, info.max)
+        else:
+            self._limits = None
+        self._scratch = None
+
+        # Number of calls to put_partial() and get_partial() that
+        # couldn't transfer every item
+        self.overruns = 0
+        self.underruns = 0
+
+        # Number of calls to put_partial() and get_partial() rejected
+        # because of the type of the array given (see _types_match())
+        self.type_mismatches = 0
+
     def __len__(self):
         if self._producer_index >= self._consumer_index:
             return self._producer_index - self._consumer_index
@@ -20,9 +73,20 @@ class RingBuffer:
                 + self._producer_index
             )
 
-    def put(self, array):
+    def put(self, array, scale=None):
+        """Copies the items of array into the buffer.
+
+        If scale is given, array's items (which must be floating
+        point) are multiplied by it as they are copied.  For an
+        integer buffer they are also rounded and clipped to the
+        integer type's range, so that, for example, float32 audio in
+        [-1, 1] can be put into an int16 buffer with a scale of
+        32767.  This uses a scratch array that is kept between calls
+        rather than allocating one per call.
+
+        """
         # Check we have matching dtypes
-        if self._buffer.dtype != array.dtype:
+        if not self._types_match(array, scale):
             raise Exception(
                 f"Buffer type ({self._buffer.dtype}) and "+
                 f"array type ({array.dtype}) do not match"
@@ -46,9 +110,13 @@ class RingBuffer:
         # start.
         if self._producer_index+len(array) <= len(self._buffer):
             # There's no wrap around, we can just do a straight copy
-            self._buffer[
-                self._producer_index:self._producer_index+len(array)
-            ] = array[:]
+            self._store(
+                self._buffer[
+                    self._producer_index:self._producer_index+len(array)
+                ],
+                array,
+                scale
+            )
             
             # Update the producer index
             self._producer_index += len(array)
@@ -61,19 +129,37 @@ class RingBuffer:
 
             # First copy to the end of the buffer
             remaining_buffer = len(self._buffer) - self._producer_index
-            self._buffer[
-                self._producer_index:
-            ] = array[:remaining_buffer]
+            self._store(
+                self._buffer[self._producer_index:],
+                array[:remaining_buffer],
+                scale
+            )
             
             # Then copy to the start of the buffer
-            self._buffer[
-                :len(array)-remaining_buffer
-            ] = array[remaining_buffer:]
+            self._store(
+                self._buffer[:len(array)-remaining_buffer],
+                array[remaining_buffer:],
+                scale
+            )
 
             # Update the producer index
             self._producer_index = len(array)-remaining_buffer
         
-    def get(self, out):
+    def get(self, out, scale=None):
+        """Copies the oldest len(out) items out of the buffer.
+
+        If scale is given, the items are multiplied by it as they are
+        copied into out, in out's type; for example, an int16 buffer
+        can be read into float32 audio in [-1, 1] with a scale of
+        1/32768.  out must then be floating point.
+
+        """
+        if scale is not None and not self._types_match(out, scale):
+            raise Exception(
+                f"Buffer type ({self._buffer.dtype}) and "+
+                f"array type ({out.dtype}) do not match"
+            )
+
         # Get amount of data in buffer
         data_available = len(self)
         
@@ -93,9 +179,13 @@ class RingBuffer:
         if self._consumer_index+len(out) <= len(self._buffer):
             # Copy the data into the output array directly; there's no
             # wrap-around to worry about.
-            out[:] = self._buffer[
-                self._consumer_index:self._consumer_index+len(out)
-            ]
+            self._load(
+                out,
+                self._buffer[
+                    self._consumer_index:self._consumer_index+len(out)
+                ],
+                scale
+            )
 
             # Update the consumer index
             self._consumer_index += len(out)
@@ -104,14 +194,313 @@ class RingBuffer:
             # We have to deal with a wrap-around.
             # First copy up to the end of the buffer
             remaining_buffer = len(self._buffer) - self._consumer_index
-            out[:remaining_buffer] = self._buffer[
-                self._consumer_index:
-            ]
+            self._load(
+                out[:remaining_buffer],
+                self._buffer[self._consumer_index:],
+                scale
+            )
 
             # Then copy from the start
-            out[remaining_buffer:] = self._buffer[
-                :len(out) - remaining_buffer
-            ]
+            self._load(
+                out[remaining_buffer:],
+                self._buffer[:len(out) - remaining_buffer],
+                scale
+            )
 
             # Update the consumer index
             self._consumer_index = len(out) - remaining_buffer
+
+    def put_partial(self, array, scale=None):
+        """Puts as many items as the overrun policy allows, never raising.
+
+        Returns the number of items from array now in the buffer.  If
+        they don't all fit, the overrun is counted in overruns.  With
+        Overrun.DROP_OLDEST, only the last shape[0] items of an array
+        longer than the buffer are kept.  scale is as for put().
+
+        If array's type is one put() would reject, nothing is put: the
+        call is counted in type_mismatches and 0 is returned.
+
+        """
+        if not self._types_match(array, scale):
+            self.type_mismatches += 1
+            return 0
+
+        capacity = len(self._buffer) - 1
+        space_remaining = capacity - len(self)
+        n = len(array)
+        if n > space_remaining:
+            self.overruns += 1
+            if self._overrun is Overrun.DROP_OLDEST:
+                if n > capacity:
+                    array = array[n - capacity:]
+                    n = capacity
+                # Discard the oldest items to make room
+                self._consumer_index = (
+                    (self._consumer_index + n - space_remaining)
+                    % len(self._buffer)
+                )
+            else:
+                n = space_remaining
+                array = array[:n]
+
+        start = 0
+        for view in self._views(self._producer_index, n):
+            self._store(view, array[start:start+len(view)], scale)
+            start += len(view)
+        self._producer_index = (self._producer_index + n) % len(self._buffer)
+        return n
+
+    def get_partial(self, out, scale=None):
+        """Gets as many items as are available, never raising.
+
+        Returns the number of items copied into the start of out.  If
+        out couldn't be filled, the underrun is counted in underruns
+        and the rest of out is handled as the underrun policy says.
+        scale is as for get().
+
+        If scale is given and out isn't floating point, nothing is
+        copied: the call is counted in type_mismatches and 0 is
+        returned, with out left untouched.
+
+        """
+        if scale is not None and not self._types_match(out, scale):
+            self.type_mismatches += 1
+            return 0
+
+        n = min(len(out), len(self))
+        if n < len(out):
+            self.underruns += 1
+            if self._underrun is Underrun.ZERO_FILL:
+                out[n:] = 0
+
+        start = 0
+        for view in self._views(self._consumer_index, n):
+            self._load(out[start:start+len(view)], view, scale)
+            start += len(view)
+        self._consumer_index = (self._consumer_index + n) % len(self._buffer)
+        return n
+
+    def peek(self, n):
+        """Returns views of the next n items, without removing them.
+
+        Returns a tuple of one array, or of two if the items wrap
+        around the end of the buffer; the second then continues the
+        first.  The views may be read and modified in place until
+        the items are removed with advance().
+
+        """
+        data_available = len(self)
+        if n > data_available:
+            raise Exception(
+                f"Buffer underrun: insufficient data available "+
+                f"({data_available}) for the size of the request "+
+                f"({n})."
+            )
+        return self._views(self._consumer_index, n)
+
+    def advance(self, n):
+        """Removes the next n items, typically after peek(n)."""
+        data_available = len(self)
+        if n > data_available:
+            raise Exception(
+                f"Buffer underrun: insufficient data available "+
+                f"({data_available}) to advance by {n}."
+            )
+        self._consumer_index = (self._consumer_index + n) % len(self._buffer)
+
+    def reserve(self, n):
+        """Returns views of space for the next n items to be put.
+
+        Returns a tuple of one or two arrays, as peek() does.  Items
+        written into the views are added to the buffer by commit().
+
+        """
+        space_remaining = len(self._buffer) - len(self) - 1
+        if n > space_remaining:
+            raise Exception(
+                f"Buffer overrun: Length of reservation ({n}) "+
+                f"too great for space remaining in buffer "+
+                f"({space_remaining})"
+            )
+        return self._views(self._producer_index, n)
+
+    def commit(self, n):
+        """Adds the next n items, written into views from reserve(n)."""
+        space_remaining = len(self._buffer) - len(self) - 1
+        if n > space_remaining:
+            raise Exception(
+                f"Buffer overrun: Commit ({n}) too great for space "+
+                f"remaining in buffer ({space_remaining})"
+            )
+        self._producer_index = (self._producer_index + n) % len(self._buffer)
+
+    def _types_match(self, array, scale):
+        """Returns True if array's type suits a transfer with scale.
+
+        Without a scale, array must be of the buffer's type; with one,
+        it must be floating point.
+
+        """
+        if scale is None:
+            return array.dtype == self._buffer.dtype
+        return array.dtype.kind == "f"
+
+    def _store(self, destination, source, scale):
+        """Copies source into destination, scaling it if scale is given."""
+        if scale is None:
+            destination[:] = source
+            return
+        if self._limits is None:
+            numpy.multiply(source, scale, out=destination, casting="unsafe")
+            return
+
+        # Scale, round and clip in the scratch array, then convert in
+        # the copy into the buffer
+        size = source.size
+        scratch = self._scratch
+        if (scratch is None or len(scratch) < size
+            or scratch.dtype != source.dtype):
+            scratch = numpy.empty(size, dtype=source.dtype)
+            self._scratch = scratch
+            # Bounds as arrays of the scratch's type, which numpy
+            # compares against faster than Python numbers
+            self._scratch_limits = tuple(
+                numpy.array(limit, dtype=source.dtype)
+                for limit in self._limits
+            )
+        scratch = scratch[:size].reshape(source.shape)
+        low, high = self._scratch_limits
+        numpy.multiply(source, scale, out=scratch)
+        numpy.rint(scratch, out=scratch)
+        numpy.minimum(scratch, high, out=scratch)
+        numpy.maximum(scratch, low, out=scratch)
+        numpy.copyto(destination, scratch, casting="unsafe")
+
+    def _load(self, destination, source, scale):
+        """Copies source into destination, scaling it if scale is given."""
+        if scale is None:
+            destination[:] = source
+        else:
+            # A scale of destination's type keeps the multiplication
+            # in that type
+            numpy.multiply(
+                source,
+                destination.dtype.type(scale),
+                out=destination
+            )
+
+    def _views(self, index, n):
+        """Returns views of n items starting at index, split at the end."""
+        index %= len(self._buffer)
+        if index + n <= len(self._buffer):
+            return (self._buffer[index:index+n],)
+        remaining_buffer = len(self._buffer) - index
+        return (
+            self._buffer[index:],
+            self._buffer[:n - remaining_buffer]
+        )
+
+
+class BlockingRingBuffer(RingBuffer):
+    """RingBuffer whose put() and get() wait for space or data.
+
+    Safe for one producer thread and one consumer thread without
+    further locking, as each index is only changed by one side (but
+    see Overrun.DROP_OLDEST, which changes both).  put() waits until
+    there is space for the whole array and get() until there is
+    enough data to fill out, raising TimeoutError if timeout seconds
+    pass first; a timeout of None waits indefinitely.
+
+    The lock is only taken to wait, and by the other side only when
+    it sees that someone is waiting, so transfers that don't need to
+    wait cost no more than RingBuffer's.
+
+    """
+    def __init__(self, shape, dtype=numpy.int16, **kwargs):
+        super().__init__(shape, dtype, **kwargs)
+        lock = threading.Lock()
+        self._data_available = threading.Condition(lock)
+        self._space_available = threading.Condition(lock)
+        self._consumer_waiting = False
+        self._producer_waiting = False
+
+    def put(self, array, scale=None, timeout=None):
+        if len(self._buffer) - len(self) - 1 < len(array):
+            self._wait(
+                self._space_available,
+                "_producer_waiting",
+                lambda: len(self._buffer) - len(self) - 1 >= len(array),
+                len(array),
+                timeout
+            )
+        super().put(array, scale)
+        self._notify_consumer()
+
+    def get(self, out, scale=None, timeout=None):
+        if len(self) < len(out):
+            self._wait(
+                self._data_available,
+                "_consumer_waiting",
+                lambda: len(self) >= len(out),
+                len(out),
+                timeout
+            )
+        super().get(out, scale)
+        self._notify_producer()
+
+    def put_partial(self, array, scale=None):
+        n = super().put_partial(array, scale)
+        self._notify_consumer()
+        return n
+
+    def get_partial(self, out, scale=None):
+        n = super().get_partial(out, scale)
+        self._notify_producer()
+        return n
+
+    def commit(self, n):
+        super().commit(n)
+        self._notify_consumer()
+
+    def advance(self, n):
+        super().advance(n)
+        self._notify_producer()
+
+    def _wait(self, condition, waiting, ready, n, timeout):
+        # Requests that could never be met raise as RingBuffer's do,
+        # rather than waiting
+        if n > len(self._buffer) - 1:
+            return
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        with condition:
+            # Announce the wait before checking again, so that the
+            # other side either sees the flag or has already made the
+            # change we're waiting for
+            setattr(self, waiting, True)
+            try:
+                while not ready():
+                    if timeout is None:
+                        condition.wait()
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not condition.wait(remaining):
+                            if ready():
+                                break
+                            raise TimeoutError(
+                                f"Timed out after {timeout} seconds "+
+                                f"waiting to transfer {n} items"
+                            )
+            finally:
+                setattr(self, waiting, False)
+
+    def _notify_consumer(self):
+        if self._consumer_waiting:
+            with self._data_available:
+                self._data_available.notify()
+
+    def _notify_producer(self):
+        if self._producer_waiting:
+            with self._space_available:
+                self._space_available.notify()
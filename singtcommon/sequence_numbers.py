@@ -0,0 +1,53 @@
+"""Arithmetic on sequence numbers that roll over to zero.
+
+Sequence numbers run from zero to rollover-1 inclusive.  Comparisons
+follow RFC 1982 serial number arithmetic: a sequence number is newer
+than another if it is less than half the sequence space ahead of it.
+The functions accept any rollover value, not just powers of two.
+
+"""
+import numpy
+
+# Sequence numbers written by UDPPacketizer are packed as a signed
+# short, so they roll over at 2**15.  JitterBuffer must use the same
+# value or every roll-over looks like a huge gap.
+SEQ_NO_ROLLOVER = 2**15
+
+def distance(new, current, rollover=SEQ_NO_ROLLOVER):
+    """Returns the most likely signed distance from current to new.
+
+    The result lies in [-rollover//2, rollover - rollover//2); it is
+    positive if new is ahead of current.
+
+    """
+    half = rollover // 2
+    return (new - current + half) % rollover - half
+
+def is_newer(new, current, rollover=SEQ_NO_ROLLOVER):
+    """Returns True if new is ahead of current."""
+    return distance(new, current, rollover) > 0
+
+def add(seq_no, n, rollover=SEQ_NO_ROLLOVER):
+    """Returns the sequence number n after seq_no."""
+    return (seq_no + n) % rollover
+
+def distances(new, current, rollover=SEQ_NO_ROLLOVER):
+    """Vectorized distance() for arrays of sequence numbers.
+
+    Calculated in 64-bit integers so that arrays of narrow types (such
+    as the ">i2" sequence numbers from UDPPacketizer.decode_array())
+    don't overflow.
+
+    """
+    new = numpy.asarray(new, dtype=numpy.int64)
+    current = numpy.asarray(current, dtype=numpy.int64)
+    half = rollover // 2
+    result = new - current
+    result += half
+    result %= rollover
+    result -= half
+    return result
+
+def are_newer(new, current, rollover=SEQ_NO_ROLLOVER):
+    """Vectorized is_newer() for arrays of sequence numbers."""
+    return distances(new, current, rollover) > 0
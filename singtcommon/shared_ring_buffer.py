@@ -0,0 +1,205 @@
+import math
+import os
+
+import numpy
+
+# The header holds the producer and consumer indices, each on its own
+# cache line, followed by the capacity and item size for checking
+# when attaching, and the creating process's resource tracker (see
+# _tracker_id())
+_PRODUCER_OFFSET = 0
+_CONSUMER_OFFSET = 64
+_LAYOUT_OFFSET = 128
+_HEADER_SIZE = 192
+
+class SharedRingBuffer:
+    """Ring buffer in shared memory, for use between two processes.
+
+    The items and the producer and consumer indices are all held in
+    a multiprocessing.shared_memory block, which another process can
+    attach to by name (see attach()).  One process may put while the
+    other gets, without locks: each index is written by only one side,
+    and only after the items it covers have been copied.
+
+    Has the same put(), get() and len() as RingBuffer, but holds
+    exactly shape[0] items.  The block is removed by unlink(), which
+    the creating process should call once both sides have finished.
+
+    """
+    def __init__(self, shape, dtype=numpy.int16, name=None, _create=True):
+        try:
+            from multiprocessing import shared_memory
+        except ImportError:
+            raise Exception(
+                "SharedRingBuffer requires Python 3.8 or later "+
+                "(multiprocessing.shared_memory)"
+            )
+        dtype = numpy.dtype(dtype)
+        shape = tuple(shape)
+        capacity = shape[0]
+        item_size = dtype.itemsize * math.prod(shape[1:])
+        size = _HEADER_SIZE + capacity * item_size
+
+        if _create:
+            self._shared_memory = shared_memory.SharedMemory(
+                name=name,
+                create=True,
+                size=size
+            )
+            tracked = False
+        else:
+            self._shared_memory, tracked = _attach_shared_memory(name)
+
+        buf = self._shared_memory.buf
+        self._producer = numpy.ndarray(
+            1, dtype=numpy.uint64, buffer=buf, offset=_PRODUCER_OFFSET
+        )
+        self._consumer = numpy.ndarray(
+            1, dtype=numpy.uint64, buffer=buf, offset=_CONSUMER_OFFSET
+        )
+        layout = numpy.ndarray(
+            3, dtype=numpy.uint64, buffer=buf, offset=_LAYOUT_OFFSET
+        )
+        if _create:
+            self._producer[0] = 0
+            self._consumer[0] = 0
+            layout[:] = (capacity, item_size, _tracker_id())
+        else:
+            # A process with a resource tracker of its own would
+            # unlink the block when it exits
+            if tracked and int(layout[2]) != _tracker_id():
+                _untrack(self._shared_memory)
+            if tuple(layout[:2]) != (capacity, item_size):
+                actual = tuple(int(value) for value in layout[:2])
+                self.close()
+                raise Exception(
+                    f"Shared ring buffer '{name}' has capacity and item "+
+                    f"size {actual}, not {(capacity, item_size)}"
+                )
+
+        self._capacity = capacity
+        self._buffer = numpy.ndarray(
+            shape, dtype=dtype, buffer=buf, offset=_HEADER_SIZE
+        )
+
+    @classmethod
+    def attach(cls, name, shape, dtype=numpy.int16):
+        """Attaches to a buffer created in another process.
+
+        shape and dtype must match those the buffer was created
+        with.
+
+        """
+        return cls(shape, dtype, name=name, _create=False)
+
+    @property
+    def name(self):
+        """Name by which other processes can attach to the buffer."""
+        return self._shared_memory.name
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        return int(self._producer[0]) - int(self._consumer[0])
+
+    def put(self, array):
+        # Check we have matching dtypes
+        if self._buffer.dtype != array.dtype:
+            raise Exception(
+                f"Buffer type ({self._buffer.dtype}) and "+
+                f"array type ({array.dtype}) do not match"
+            )
+
+        # Only the producer writes the producer index, so it can't
+        # change under us; the consumer index may only increase
+        producer_index = int(self._producer[0])
+        space_remaining = (
+            self._capacity - (producer_index - int(self._consumer[0]))
+        )
+        if len(array) > space_remaining:
+            raise Exception(
+                f"Buffer overrun: Length of array ({len(array)}) "+
+                f"too great for space remaining in buffer "+
+                f"({space_remaining})"
+            )
+
+        start = producer_index % self._capacity
+        end = start + len(array)
+        if end <= self._capacity:
+            self._buffer[start:end] = array
+        else:
+            split = self._capacity - start
+            self._buffer[start:] = array[:split]
+            self._buffer[:end - self._capacity] = array[split:]
+
+        # Publish the items only once they have been copied
+        self._producer[0] = producer_index + len(array)
+
+    def get(self, out):
+        consumer_index = int(self._consumer[0])
+        data_available = int(self._producer[0]) - consumer_index
+        if len(out) > data_available:
+            raise Exception(
+                f"Buffer underrun: insufficient data available "+
+                f"({data_available}) for the size of the request "+
+                f"({len(out)})."
+            )
+
+        start = consumer_index % self._capacity
+        end = start + len(out)
+        if end <= self._capacity:
+            out[:] = self._buffer[start:end]
+        else:
+            split = self._capacity - start
+            out[:split] = self._buffer[start:]
+            out[split:] = self._buffer[:end - self._capacity]
+
+        # Release the space only once the items have been copied
+        self._consumer[0] = consumer_index + len(out)
+
+    def close(self):
+        """Detaches this process from the buffer."""
+        # Views into the block must be released before it's closed
+        self._producer = None
+        self._consumer = None
+        self._buffer = None
+        self._shared_memory.close()
+
+    def unlink(self):
+        """Removes the buffer; call once, from the creating process."""
+        self._shared_memory.unlink()
+
+
+def _attach_shared_memory(name):
+    """Attaches to a block by name.
+
+    Returns the block and whether it was registered with this
+    process's resource tracker, which unlinks registered blocks when
+    the processes using it have exited.
+
+    """
+    from multiprocessing import shared_memory
+    try:
+        # Python 3.13 and later can be told not to register the block
+        return shared_memory.SharedMemory(name=name, track=False), False
+    except TypeError:
+        return shared_memory.SharedMemory(name=name), os.name == "posix"
+
+def _tracker_id():
+    """Identifies this process's resource tracker, or returns zero.
+
+    Processes started by multiprocessing share their parent's tracker;
+    others start their own.  On POSIX the tracker is identified by the
+    inode of the pipe used to talk to it.
+
+    """
+    if os.name != "posix":
+        return 0
+    from multiprocessing import resource_tracker
+    return os.fstat(resource_tracker.getfd()).st_ino
+
+def _untrack(block):
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(block._name, "shared_memory")
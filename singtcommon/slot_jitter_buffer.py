@@ -0,0 +1,160 @@
+import threading
+
+from . import sequence_numbers
+from .fec import is_parity
+
+class SlotJitterBuffer:
+    """Jitter buffer backed by a preallocated array of slots.
+
+    Behaves as JitterBuffer (with a fixed buffer_length) does from
+    the point of view of put_packet(), get_packet() and len(), but
+    stores each packet in the slot given by its sequence number
+    modulo capacity.  Putting and getting a packet are O(1), and
+    neither allocates nor prints.
+
+    Packets more than capacity packets ahead of the next packet to be
+    played are discarded, so capacity should comfortably exceed the
+    buffer length plus the expected reordering.
+
+    seq_no_rollover is the value at which sequence numbers roll back
+    to zero; it must match the sender's (see UDPPacketizer).
+
+    """
+    def __init__(self, buffer_length=3, capacity=256,
+                 seq_no_rollover=sequence_numbers.SEQ_NO_ROLLOVER):
+        self._lock = threading.Lock()
+        self._buffer_length = buffer_length
+        self._capacity = capacity
+
+        self._seq_no_rollover = seq_no_rollover
+
+        # Number of missed packets in a row to trigger buffer reset
+        self._max_missed_sequential_packets = 3
+
+        # Packets, and whether each slot holds a packet
+        self._slots = [None] * capacity
+        self._present = bytearray(capacity)
+
+        self._reset_buffer()
+        self._reset_stats()
+
+    def __len__(self):
+        return self._padding + self._count
+
+    def put_packet(self, seq_no, packet):
+        if is_parity(seq_no):
+            raise Exception(
+                f"Parity packet ({seq_no}) given to a SlotJitterBuffer, "+
+                f"which doesn't support FEC"
+            )
+        if seq_no >= self._seq_no_rollover:
+            raise Exception(
+                f"Unexpectedly large sequence number ({seq_no}), "+
+                f"roll-over expected at {self._seq_no_rollover}"
+            )
+
+        with self._lock:
+            # Update statistics
+            self._put_packets += 1
+            length = self._padding + self._count
+            if length > self._max_length:
+                self._max_length = length
+
+            self._started = True
+
+            # If we don't know which packet to play next, then just
+            # use whatever we've received
+            if self._read is None:
+                self._read = seq_no
+
+            distance = sequence_numbers.distance(
+                seq_no,
+                self._read % self._seq_no_rollover,
+                self._seq_no_rollover
+            )
+
+            # Discard packets that are too late, or too far ahead to
+            # store
+            if distance < 0:
+                self._late_packets += 1
+                return
+            if distance >= self._capacity:
+                self._overflowed_packets += 1
+                return
+
+            index = (self._read + distance) % self._capacity
+            if self._present[index]:
+                # Duplicate
+                return
+            self._slots[index] = packet
+            self._present[index] = 1
+            self._count += 1
+
+    def get_packet(self):
+        with self._lock:
+            # Update statistics
+            self._got_packets += 1
+            self._total_length_at_get += self._padding + self._count
+
+            if not self._started:
+                return None
+
+            # Play out the None's added on reset first
+            if self._padding > 0:
+                self._padding -= 1
+                self._missed_sequential_packets = 0
+                return None
+
+            index = self._read % self._capacity
+            self._read += 1
+
+            if self._present[index]:
+                self._missed_sequential_packets = 0
+                packet = self._slots[index]
+                self._slots[index] = None
+                self._present[index] = 0
+                self._count -= 1
+                return packet
+
+            # The packet hasn't arrived; give up on it
+            self._missed_packets += 1
+            self._missed_sequential_packets += 1
+            if self._missed_sequential_packets >= self._max_missed_sequential_packets:
+                self._resets += 1
+                self._reset_buffer()
+            return None
+
+    def _reset_buffer(self):
+        """Resets the buffer.
+
+        Called as part of the constructor, but also called if too many
+        packets have been missed.
+
+        """
+        for index in range(self._capacity):
+            self._slots[index] = None
+            self._present[index] = 0
+        self._count = 0
+
+        # Sequence number of the next packet to be played, without
+        # roll-over
+        self._read = None
+
+        # Only after the first packet has been 'put' do we allow
+        # gets
+        self._started = False
+
+        # Number of None's to play before the first packet
+        self._padding = self._buffer_length
+
+        self._missed_sequential_packets = 0
+
+    def _reset_stats(self):
+        self._put_packets = 0
+        self._got_packets = 0
+        self._missed_packets = 0
+        self._late_packets = 0
+        self._overflowed_packets = 0
+        self._resets = 0
+        self._max_length = 0
+        self._total_length_at_get = 0
@@ -6,14 +6,114 @@ class _State(Enum):
     STARTING = 10
     CONTINUING = 20
 
+class Framing(Enum):
+    """Length prefix placed before each message.
+
+    SHORT is the original format: a native-endian unsigned short,
+    limiting messages to 65535 bytes.  UINT32 is a big-endian unsigned
+    32-bit integer and VARINT is an unsigned LEB128 varint.
+
+    """
+    SHORT = 10
+    UINT32 = 20
+    VARINT = 30
+
+_headers = {
+    Framing.SHORT: struct.Struct("H"),
+    Framing.UINT32: struct.Struct(">I"),
+    Framing.VARINT: None,
+}
+
+def _encode_varint(value):
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+def _decode_varint(source, offset, end):
+    """Returns (value, offset after varint), or None if incomplete."""
+    value = 0
+    shift = 0
+    while offset < end:
+        byte = source[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+        if shift > 63:
+            raise Exception("Malformed varint length prefix")
+    return None
+
 class TCPPacketizer:
-    def __init__(self, transport):
+    # Consumed bytes at the start of the receive buffer are only
+    # discarded once there are at least this many of them, so that
+    # compaction happens occasionally rather than after every message.
+    _compaction_threshold = 64 * 1024
+    
+    def __init__(self, transport, coalesce=False, reactor=None,
+                 framing=Framing.SHORT, max_length=None,
+                 large_message_threshold=64*1024):
+        """Packetizes messages over the given transport.
+
+        If coalesce is True, messages written during one iteration of
+        the reactor are gathered and written to the transport with a
+        single call to writeSequence() on the next iteration.
+
+        framing selects the length prefix; both ends of the
+        connection must use the same framing.  max_length limits the
+        size of messages that may be sent or received; it defaults to
+        65535 bytes for SHORT framing and 16 MiB otherwise.
+
+        Received messages of at least large_message_threshold bytes
+        are assembled directly into their own buffer and are returned
+        as memoryviews rather than bytes.
+
+        """
         self._transport = transport
+
+        # Framing
+        self._framing = framing
+        self._header = _headers[framing]
+        if max_length is None:
+            if framing == Framing.SHORT:
+                max_length = 2**16 - 1
+            else:
+                max_length = 2**24
+        self._max_length = max_length
+        self._large_message_threshold = large_message_threshold
+
+        # Coalescing of writes
+        self._coalesce = coalesce
+        if coalesce and reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._pending = []
+        self._pending_frames = 0
+        self._pending_bytes = 0
+        self._flush_call = None
+
+        # Statistics on writes to the transport
+        self.flush_count = 0
+        self.frames_flushed = 0
+        self.bytes_flushed = 0
+        self.last_flush_frames = 0
+        self.last_flush_bytes = 0
         
-        self._buffer = b""
+        # Received data that has not yet been handed out as a packet.
+        # Only the bytes from _offset onwards are still required.
+        self._buffer = bytearray()
+        self._offset = 0
         self._state = _State.STARTING
         self._length = None
 
+        # Large message currently being received, and how many of
+        # its bytes have arrived
+        self._large = None
+        self._large_received = 0
+
         
     def write(self, msg):
         """Writes a string over TCP."""
@@ -23,60 +123,217 @@ class TCPPacketizer:
     
     def write_bytes(self, msg_bytes):
         """Writes bytes over TCP."""
-        len_as_short = struct.pack("H", len(msg_bytes))
-        encoded_msg = len_as_short + msg_bytes
+        prefix = self._encode_length(len(msg_bytes))
+        if self._coalesce:
+            self._queue([prefix, msg_bytes], 1)
+            return
+        encoded_msg = prefix + msg_bytes
+        self._record_flush(1, len(encoded_msg))
         return self._transport.write(encoded_msg)
+
+
+    def write_many(self, msgs):
+        """Writes a sequence of strings over TCP."""
+        return self.write_many_bytes(msg.encode("utf-8") for msg in msgs)
+
+
+    def write_many_bytes(self, msgs):
+        """Writes a sequence of bytes over TCP.
+
+        The messages are framed exactly as if they had been written
+        individually, but are passed to the transport with a single
+        call to writeSequence().
+
+        """
+        frames = []
+        for msg_bytes in msgs:
+            frames.append(self._encode_length(len(msg_bytes)))
+            frames.append(msg_bytes)
+        if len(frames) == 0:
+            return
+
+        if self._coalesce:
+            self._queue(frames, len(frames)//2)
+            return
+        self._record_flush(
+            len(frames)//2,
+            sum(len(frame) for frame in frames)
+        )
+        return self._transport.writeSequence(frames)
+
+
+    def flush(self):
+        """Writes any coalesced messages to the transport immediately."""
+        if self._flush_call is not None:
+            if self._flush_call.active():
+                self._flush_call.cancel()
+            self._flush_call = None
+
+        if len(self._pending) == 0:
+            return
+
+        pending = self._pending
+        self._record_flush(self._pending_frames, self._pending_bytes)
+        self._pending = []
+        self._pending_frames = 0
+        self._pending_bytes = 0
+        self._transport.writeSequence(pending)
+
+
+    def _queue(self, frames, frame_count):
+        """Queues frames until the next iteration of the reactor."""
+        self._pending += frames
+        self._pending_frames += frame_count
+        self._pending_bytes += sum(len(frame) for frame in frames)
+        if self._flush_call is None:
+            self._flush_call = self._reactor.callLater(0, self.flush)
+
+
+    def _record_flush(self, frames, num_bytes):
+        self.flush_count += 1
+        self.frames_flushed += frames
+        self.bytes_flushed += num_bytes
+        self.last_flush_frames = frames
+        self.last_flush_bytes = num_bytes
     
         
     def decode(self, data):
         """Decodes packets as strings."""
         packets = self.decode_bytes(data)
-        packets_as_str = [packet.decode("utf-8") for packet in packets]
+        packets_as_str = [str(packet, "utf-8") for packet in packets]
         return packets_as_str
 
     
     def decode_bytes(self, data):
-        """Decodes packet as bytes."""
-        #print("Received data:", data)
+        """Decodes packets as bytes.
+
+        Runs in time linear in the amount of data received: each
+        message is copied out exactly once and the remaining data is
+        never re-sliced.  Data may be split at any point, including
+        within the length prefix.
+
+        Large messages (see the constructor) are returned as
+        memoryviews of their own buffers.
 
-        # Combine current data with buffer
-        data = self._buffer + data
+        """
+        # If nothing is buffered, work directly from the received
+        # data; otherwise append it to the buffer.
+        if len(self._buffer) - self._offset == 0:
+            self._buffer.clear()
+            self._offset = 0
+            source = data
+        else:
+            self._buffer += data
+            source = self._buffer
 
         packets = []
-        while len(data) > 0:
-            #print("Considering data:", data)
-            
-            if self._state == _State.STARTING:
-                # Read the first two bytes as a short integer
-                self._length = struct.unpack("H",data[0:2])[0]
-                #print("length:",self._length)
+        offset = self._offset
+        length = self._length
+        state = self._state
+        end = len(source)
 
-                # Remove the short from the data
-                data = data[2:]
+        view = memoryview(source)
+        try:
+            while True:
+                if state == _State.STARTING:
+                    # Do we have the complete length prefix?
+                    prefix = self._decode_length(source, offset, end)
+                    if prefix is None:
+                        break
+                    length, offset = prefix
+                    if length > self._max_length:
+                        raise Exception(
+                            f"Message length ({length}) exceeds maximum "+
+                            f"({self._max_length})"
+                        )
 
-                # Move to CONTINUING
-                self._state = _State.CONTINUING
+                    # Move to CONTINUING
+                    state = _State.CONTINUING
 
-            if self._state == _State.CONTINUING:
-                # Do we have all the required characters in the current data?
-                if len(data) >= self._length:
-                    # Separate the current message
-                    msg = data[:self._length]
+                    if length >= self._large_message_threshold:
+                        self._large = bytearray(length)
+                        self._large_received = 0
 
-                    # Process the message
-                    packets.append(msg)
+                if self._large is not None:
+                    # Copy as much of the large message as we have
+                    # directly into its own buffer
+                    count = min(end - offset, length - self._large_received)
+                    self._large[
+                        self._large_received:self._large_received+count
+                    ] = view[offset:offset+count]
+                    self._large_received += count
+                    offset += count
+                    if self._large_received < length:
+                        break
 
-                    # Remove the current message from any remaining data
-                    data = data[self._length:]
+                    packets.append(memoryview(self._large))
+                    self._large = None
 
                     # Move back to STARTING
-                    self._state = _State.STARTING
-                else:
-                    # We do not have sufficient characters.  Store them in
-                    # the buffer till next time we receive data.
-                    #print("We do not have sufficient characters; waiting")
-                    #print("len(data):", len(data))
-                    self._buffer = data
-                    data = ""
+                    state = _State.STARTING
+                    continue
+
+                # Do we have all the required bytes for the message?
+                if end - offset < length:
+                    break
+
+                # Copy out the message; the remaining data stays where
+                # it is
+                packets.append(bytes(view[offset:offset+length]))
+                offset += length
+
+                # Move back to STARTING
+                state = _State.STARTING
+
+            # Store any incomplete data till next time we receive
+            # data.
+            if source is data:
+                if offset < end:
+                    self._buffer += view[offset:]
+                offset = 0
+        finally:
+            view.release()
+
+        self._state = state
+        self._length = length
+        self._offset = offset
+        self._compact()
 
         return packets
+
+
+    def _encode_length(self, length):
+        if length > self._max_length:
+            raise Exception(
+                f"Message length ({length}) exceeds maximum "+
+                f"({self._max_length})"
+            )
+        if self._header is None:
+            return _encode_varint(length)
+        return self._header.pack(length)
+
+
+    def _decode_length(self, source, offset, end):
+        """Returns (length, offset after prefix), or None if incomplete."""
+        if self._header is None:
+            return _decode_varint(source, offset, end)
+        if end - offset < self._header.size:
+            return None
+        length = self._header.unpack_from(source, offset)[0]
+        return length, offset + self._header.size
+
+
+    def _compact(self):
+        """Discards consumed bytes from the start of the receive buffer.
+
+        Only copies the remaining data if the consumed bytes make up
+        the majority of a sufficiently large buffer.
+
+        """
+        if self._offset == len(self._buffer):
+            self._buffer.clear()
+            self._offset = 0
+        elif (self._offset >= self._compaction_threshold
+              and self._offset * 2 >= len(self._buffer)):
+            del self._buffer[:self._offset]
+            self._offset = 0
@@ -1,35 +1,222 @@
+import numpy
 import struct
 import time
 
+from .fec import ParityEncoder
+from .sequence_numbers import SEQ_NO_ROLLOVER
+
 class UDPPacketizer:
-    def __init__(self, transport, address):
+    # Timestamp (in milliseconds) and sequence number placed before
+    # the data of every packet
+    _header = struct.Struct(">Ih")
+
+    def __init__(self, transport, address, retransmit_cache=None,
+                 fec_group_size=None, seq_no_rollover=SEQ_NO_ROLLOVER):
+        """Creates a packetizer.
+
+        If a RetransmitCache is given, every packet written is kept in
+        it so that it can be resent with retransmit().
+
+        If fec_group_size is given, a parity packet is sent after
+        every fec_group_size data packets, allowing the receiver to
+        reconstruct any one lost packet of the group (see fec.py).
+        The overhead is one packet in fec_group_size.
+
+        Sequence numbers run from zero to seq_no_rollover-1.  As they
+        are sent as a signed short, seq_no_rollover may not exceed
+        SEQ_NO_ROLLOVER, and the receiver must use the same value.
+
+        """
+        if not 0 < seq_no_rollover <= SEQ_NO_ROLLOVER:
+            raise Exception(
+                f"Sequence number roll-over ({seq_no_rollover}) must be "+
+                f"between 1 and {SEQ_NO_ROLLOVER}"
+            )
         self._transport = transport
         self._address = address
+        self._retransmit_cache = retransmit_cache
         self._seq_no = 0
-        self._seq_no_max = 2**15 # = 32,768 
+        self._seq_no_max = seq_no_rollover
         # sequence numbers will be from zero to seq_no_max-1,
         # inclusive
 
+        if fec_group_size is None:
+            self._parity_encoder = None
+        else:
+            self._parity_encoder = ParityEncoder(
+                fec_group_size,
+                self._seq_no_max
+            )
+
     def write(self, data):
-        # Insert timestamp and sequence number header before data
         current_time = int(time.monotonic()*1000) % (2**32-1)
-        header = struct.pack(">Ih", current_time, self._seq_no)
+        self._write(data, current_time)
+
+    def _write(self, data, current_time):
+        # Insert timestamp and sequence number header before data
+        header = self._header.pack(current_time, self._seq_no)
 
         self._transport.write(header+data, self._address)
-        
+        if self._retransmit_cache is not None:
+            self._retransmit_cache.put(self._seq_no, data)
+        if self._parity_encoder is not None:
+            parity = self._parity_encoder.add(self._seq_no, data)
+            if parity is not None:
+                self._write_parity(current_time, parity)
+
         self._seq_no += 1
         self._seq_no %= self._seq_no_max
 
     def write_with_seq_no(self, data, seq_no):
         # Insert timestamp and sequence number header before data
         current_time = int(time.monotonic()*1000) % (2**32-1)
-        header = struct.pack(">Ih", current_time, seq_no)
+        header = self._header.pack(current_time, seq_no)
 
         self._transport.write(header+data, self._address)
 
+    def retransmit(self, seq_nos):
+        """Resends the packets with the given sequence numbers.
+
+        Packets no longer held in the retransmit cache are skipped.
+        Returns the number of packets resent.
+
+        """
+        if self._retransmit_cache is None:
+            raise Exception(
+                "Retransmission requires a RetransmitCache"
+            )
+        resent = 0
+        for seq_no in seq_nos:
+            data = self._retransmit_cache.get(seq_no)
+            if data is not None:
+                self.write_with_seq_no(data, seq_no)
+                resent += 1
+        return resent
+
+    def write_batch(self, packets):
+        """Writes a batch of packets to the packetizer's address.
+
+        packets is a sequence of data.  Each packet gets the next
+        sequence number and all share one timestamp.  To send the
+        same data to many peers, give each peer its own packetizer and
+        use write_to_all().
+
+        """
+        current_time = int(time.monotonic()*1000) % (2**32-1)
+        seq_no = self._seq_no
+        seq_no_max = self._seq_no_max
+        pack = self._header.pack
+        write = self._transport.write
+        address = self._address
+        cache = self._retransmit_cache
+        encoder = self._parity_encoder
+
+        for data in packets:
+            write(pack(current_time, seq_no)+data, address)
+            if cache is not None:
+                cache.put(seq_no, data)
+            if encoder is not None:
+                parity = encoder.add(seq_no, data)
+                if parity is not None:
+                    self._write_parity(current_time, parity)
+            seq_no += 1
+            if seq_no == seq_no_max:
+                seq_no = 0
+
+        self._seq_no = seq_no
+
+    @staticmethod
+    def write_to_all(packetizers, data):
+        """Writes the same data through each of several packetizers.
+
+        Intended for forwarding one frame to many peers, each with
+        their own packetizer: every peer receives a contiguous run of
+        sequence numbers, with its own parity packets and retransmit
+        cache.  All the packets share one timestamp.
+
+        """
+        current_time = int(time.monotonic()*1000) % (2**32-1)
+        for packetizer in packetizers:
+            packetizer._write(data, current_time)
+
+    def _write_parity(self, current_time, parity):
+        seq_no, data = parity
+        header = self._header.pack(current_time, seq_no)
+        self._transport.write(header+data, self._address)
+
     @staticmethod
     def decode(packet):
         timestamp, seq_no = struct.unpack(">Ih", packet[0:6])
         data = packet[6:]
 
         return (timestamp, seq_no, data)
+
+    @staticmethod
+    def decode_batch(packets):
+        """Decodes a batch of packets.
+
+        Returns a list of (timestamp, seq_no, data) tuples, as
+        decode() would for each packet.
+
+        """
+        unpack_from = UDPPacketizer._header.unpack_from
+        header_size = UDPPacketizer._header.size
+        decoded = []
+        append = decoded.append
+        for packet in packets:
+            timestamp, seq_no = unpack_from(packet)
+            append((timestamp, seq_no, packet[header_size:]))
+        return decoded
+
+    @staticmethod
+    def decode_array(packets):
+        """Decodes a burst of packets into NumPy arrays.
+
+        Returns a tuple (timestamps, seq_nos, payloads,
+        payload_lengths).  timestamps (">u4") and seq_nos (">i2") are
+        one-dimensional arrays; payloads is a two-dimensional uint8
+        array with one row per packet.  Packets shorter than the
+        longest are zero-padded, and payload_lengths gives the true
+        length of each payload.
+
+        All three arrays are read-only views into a single contiguous
+        buffer, which is built with one join of the packets.
+
+        """
+        header_size = UDPPacketizer._header.size
+        lengths = numpy.fromiter(
+            (len(packet) for packet in packets),
+            dtype=numpy.intp,
+            count=len(packets)
+        )
+        stride = int(lengths.max()) if len(lengths) > 0 else header_size
+        if stride < header_size:
+            raise Exception(
+                f"Packet too short ({stride} bytes) to contain a header"
+            )
+
+        dtype = numpy.dtype([
+            ("timestamp", ">u4"),
+            ("seq_no", ">i2"),
+            ("payload", numpy.uint8, (stride - header_size,)),
+        ])
+
+        if numpy.all(lengths == stride):
+            joined = b"".join(packets)
+        else:
+            if lengths.min() < header_size:
+                raise Exception(
+                    f"Packet too short ({lengths.min()} bytes) to "+
+                    f"contain a header"
+                )
+            joined = b"".join(
+                bytes(packet).ljust(stride, b"\0") for packet in packets
+            )
+        records = numpy.frombuffer(joined, dtype=dtype)
+
+        return (
+            records["timestamp"],
+            records["seq_no"],
+            records["payload"],
+            lengths - header_size
+        )
@@ -1,3 +1,5 @@
+from singtcommon import TCPPacketizer
+
 class MockTransport:
     def __init__(self):
         self._buffer = b''
@@ -6,3 +8,49 @@ class MockTransport:
         print(f"Ignoring transport of message: {msg}")
         self._buffer += msg
         print("self._buffer:", self._buffer)
+
+    def writeSequence(self, seq):
+        self.write(b"".join(seq))
+
+
+class ListTransport:
+    """Stream transport that keeps a list of everything written."""
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+    def writeSequence(self, seq):
+        self.writes.append(b"".join(seq))
+
+
+class CopyingTransport:
+    """Datagram transport that keeps a copy of each packet written.
+
+    packets is a list of (packet, address) pairs.
+
+    """
+    def __init__(self):
+        self.packets = []
+
+    def write(self, data, address):
+        self.packets.append((bytes(data), address))
+
+
+class MockClock:
+    """Clock whose time, in seconds, is set by assigning to time."""
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def encode(messages, **kwargs):
+    """Returns the bytes a TCPPacketizer writes for the messages."""
+    t = ListTransport()
+    p = TCPPacketizer(t, **kwargs)
+    for msg in messages:
+        p.write_bytes(msg)
+    return b"".join(t.writes)
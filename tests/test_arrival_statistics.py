@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from singtcommon import ArrivalStatistics
+from singtcommon.arrival_statistics import TIMESTAMP_ROLLOVER
+from singtcommon.sequence_numbers import SEQ_NO_ROLLOVER
+
+packet_duration = 20 # ms
+
+def test_no_packets():
+    stats = ArrivalStatistics()
+    assert stats.jitter == 0
+    assert stats.loss_rate == 0
+    assert stats.reorder_rate == 0
+    assert stats.delay_percentile(50) is None
+
+def test_constant_delay_has_no_jitter():
+    stats = ArrivalStatistics()
+    for i in range(100):
+        timestamp = 5000 + i * packet_duration
+        stats.update(timestamp, i, (timestamp + 37) / 1000)
+
+    assert stats.jitter == pytest.approx(0)
+    assert stats.delay_percentile(50) == 0
+    assert stats.delay_percentile(99) == 0
+    assert stats.loss_rate == 0
+
+def test_alternating_delay():
+    stats = ArrivalStatistics()
+    for i in range(1000):
+        timestamp = i * packet_duration
+        delay = 10 if i % 2 == 0 else 0
+        stats.update(timestamp, i, (timestamp + delay) / 1000)
+
+    # Every transit time differs from the previous by 10ms
+    assert stats.jitter == pytest.approx(10, abs=0.01)
+    assert stats.delay_percentile(25) == pytest.approx(0, abs=1)
+    assert stats.delay_percentile(75) == pytest.approx(10, abs=1)
+
+def test_delay_percentiles():
+    random.seed(1234)
+    stats = ArrivalStatistics()
+    delays = [random.uniform(0, 100) for _ in range(10000)]
+    for i, delay in enumerate(delays):
+        timestamp = i * packet_duration
+        stats.update(timestamp, i % SEQ_NO_ROLLOVER, (timestamp + delay) / 1000)
+
+    minimum = min(delays)
+    for percentile in (50, 95, 99):
+        expected = sorted(delays)[int(len(delays) * percentile / 100)] - minimum
+        assert stats.delay_percentile(percentile) == pytest.approx(expected, abs=2)
+
+def test_loss_and_reordering():
+    stats = ArrivalStatistics()
+    for seq_no in [0, 1, 3, 2, 4, 6, 7, 9]:
+        stats.update(seq_no * packet_duration, seq_no, seq_no * packet_duration / 1000)
+
+    assert stats.expected == 10
+    assert stats.received == 8
+    assert stats.lost == 2
+    assert stats.loss_rate == pytest.approx(0.2)
+    assert stats.reordered == 1
+    assert stats.reorder_rate == pytest.approx(1 / 8)
+
+def test_duplicates():
+    stats = ArrivalStatistics()
+    stats.update(0, 0, 0)
+    stats.update(0, 0, 0)
+    assert stats.duplicates == 1
+    assert stats.received == 1
+
+def test_duplicates_of_older_packets():
+    stats = ArrivalStatistics()
+    for seq_no in [0, 1, 2, 3, 1, 2]:
+        stats.update(seq_no * packet_duration, seq_no, seq_no * packet_duration / 1000)
+
+    assert stats.duplicates == 2
+    assert stats.reordered == 0
+    assert stats.reorder_rate == 0
+    assert stats.received == 4
+    assert stats.lost == 0
+
+def test_duplicate_of_reordered_packet():
+    stats = ArrivalStatistics()
+    for seq_no in [0, 2, 1, 1, 3]:
+        stats.update(seq_no * packet_duration, seq_no, seq_no * packet_duration / 1000)
+
+    # Only the first arrival of packet 1 counts as reordered
+    assert stats.reordered == 1
+    assert stats.duplicates == 1
+    assert stats.lost == 0
+
+def test_rollovers():
+    stats = ArrivalStatistics()
+    start_seq_no = SEQ_NO_ROLLOVER - 50
+    start_timestamp = TIMESTAMP_ROLLOVER - 50 * packet_duration
+    for i in range(100):
+        if i == 60:
+            continue
+        timestamp = (start_timestamp + i * packet_duration) % TIMESTAMP_ROLLOVER
+        seq_no = (start_seq_no + i) % SEQ_NO_ROLLOVER
+        stats.update(timestamp, seq_no, 1000 + i * packet_duration / 1000)
+
+    assert stats.expected == 100
+    assert stats.lost == 1
+    assert stats.jitter == pytest.approx(0, abs=1e-6)
+    assert stats.delay_percentile(99) == pytest.approx(0, abs=1e-6)
+
+def test_snapshot():
+    stats = ArrivalStatistics()
+    stats.update(0, 0, 0)
+    snapshot = stats.snapshot()
+    assert snapshot["received"] == 1
+    assert "jitter" in snapshot
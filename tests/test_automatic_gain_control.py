@@ -0,0 +1,84 @@
+import tracemalloc
+
+import numpy
+import pytest
+
+from singtcommon import AutomaticGainControl
+from singtcommon.automatic_gain_control import next_gain
+
+def _blocks(count, frames=480, channels=2):
+    rng = numpy.random.default_rng(2)
+    levels = [0.05, 0.3, 0.99, 0.1]
+    return [
+        rng.uniform(-1, 1, (frames, channels)).astype(numpy.float32)
+        * levels[i % len(levels)]
+        for i in range(count)
+    ]
+
+def test_allocation_free_matches_default():
+    agc = AutomaticGainControl()
+    allocation_free = AutomaticGainControl(allocation_free=True)
+    for block in _blocks(50):
+        expected = block.copy()
+        agc.apply(expected)
+        allocation_free.apply(block)
+        assert numpy.allclose(block, expected, rtol=1e-5, atol=1e-6)
+        assert allocation_free.gain == pytest.approx(agc.gain, rel=1e-5)
+
+def test_allocation_free_single_frame():
+    agc = AutomaticGainControl(allocation_free=True)
+    block = numpy.full((1, 2), 0.1, dtype=numpy.float32)
+    agc.apply(block)
+    # A one-frame ramp uses the previous gain, as linspace does
+    assert numpy.allclose(block, 0.1)
+
+def _traced_allocations(agc, blocks):
+    """Returns the memory kept and the peak memory used by apply()."""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for block in blocks:
+            agc.apply(block)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return after - before, peak - before
+
+@pytest.mark.parametrize("frames", [480, 4800])
+def test_allocation_free_after_warm_up(frames):
+    agc = AutomaticGainControl(allocation_free=True)
+    blocks = _blocks(20, frames=frames)
+    agc.apply(blocks[0].copy())
+
+    kept, peak = _traced_allocations(agc, blocks)
+
+    # Only scalars are kept, such as the new gain.  The peak is
+    # numpy's iterator state for finding the sample's peak, which
+    # doesn't depend on the block size; no block-sized array (3840
+    # or 38400 bytes) is allocated, even briefly
+    assert kept < 64
+    assert peak < 2048
+
+def test_default_allocates_blocks():
+    agc = AutomaticGainControl()
+    blocks = _blocks(20, frames=4800)
+    agc.apply(blocks[0].copy())
+    _, peak = _traced_allocations(agc, blocks)
+    assert peak > 4800 * 2 * 4
+
+def test_next_gain_same_for_scalars_and_arrays():
+    gains = numpy.array([1.0, 2.0, 29.99, 0.01, 1.0])
+    peaks = numpy.array([0.3, 0.99, 0.01, 0.9, numpy.nan])
+    args = (
+        AutomaticGainControl.mu,
+        AutomaticGainControl.target,
+        30,
+        AutomaticGainControl.loud_peak
+    )
+    expected = [
+        next_gain(gain, peak, *args) for gain, peak in zip(gains, peaks)
+    ]
+    # Normal, loud, clipped at the maximum and at zero, and NaN
+    assert expected == pytest.approx([1.02, 1.0, 30, 0, 1])
+    assert list(next_gain(gains, peaks, *args)) == pytest.approx(expected)
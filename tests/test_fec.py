@@ -0,0 +1,182 @@
+import numpy
+import pytest
+
+from singtcommon import (
+    JitterBuffer, SlotJitterBuffer, JitterBufferPool, UDPPacketizer,
+    ParityEncoder, ParityDecoder, is_parity
+)
+from singtcommon.sequence_numbers import SEQ_NO_ROLLOVER
+from mock_transport import CopyingTransport
+
+def _payload(i):
+    # Payloads of varying length
+    return bytes([i % 256]) * (10 + i % 7)
+
+def _decoded(transport):
+    return [UDPPacketizer.decode(packet) for packet, _ in transport.packets]
+
+def test_parity_packet_every_group():
+    t = CopyingTransport()
+    p = UDPPacketizer(t, "address", fec_group_size=4)
+    for i in range(8):
+        p.write(_payload(i))
+
+    seq_nos = [seq_no for _, seq_no, _ in _decoded(t)]
+    assert seq_nos == [0, 1, 2, 3, -1, 4, 5, 6, 7, -5]
+    assert [is_parity(seq_no) for seq_no in seq_nos].count(True) == 2
+
+def test_write_batch_sends_parity():
+    t1 = CopyingTransport()
+    p1 = UDPPacketizer(t1, "address", fec_group_size=3)
+    t2 = CopyingTransport()
+    p2 = UDPPacketizer(t2, "address", fec_group_size=3)
+    for i in range(7):
+        p1.write(_payload(i))
+    p2.write_batch([_payload(i) for i in range(7)])
+
+    assert len(t1.packets) == len(t2.packets)
+    for (packet1, _), (packet2, _) in zip(t1.packets, t2.packets):
+        assert packet1[4:] == packet2[4:]
+
+def test_write_to_all_sends_parity_to_each_peer():
+    t = CopyingTransport()
+    peers = [
+        UDPPacketizer(t, address, fec_group_size=2)
+        for address in ("one", "two")
+    ]
+    for i in range(4):
+        UDPPacketizer.write_to_all(peers, _payload(i))
+
+    for address in ("one", "two"):
+        seq_nos = [
+            UDPPacketizer.decode(packet)[1]
+            for packet, packet_address in t.packets
+            if packet_address == address
+        ]
+        assert seq_nos == [0, 1, -1, 2, 3, -3]
+
+def test_group_cut_short_at_rollover():
+    encoder = ParityEncoder(4)
+    assert encoder.add(SEQ_NO_ROLLOVER - 2, b"a") is None
+    seq_no, _ = encoder.add(SEQ_NO_ROLLOVER - 1, b"b")
+    assert seq_no == -1 - (SEQ_NO_ROLLOVER - 2)
+
+def test_group_size_bounds():
+    with pytest.raises(Exception):
+        ParityEncoder(1)
+    with pytest.raises(Exception):
+        ParityEncoder(256)
+
+@pytest.mark.parametrize("lost", range(5))
+def test_recover_any_packet_of_group(lost):
+    encoder = ParityEncoder(5)
+    decoder = ParityDecoder()
+    payloads = [_payload(i) for i in range(5)]
+    for seq_no, payload in enumerate(payloads):
+        parity = encoder.add(seq_no, payload)
+
+    recovered = []
+    for seq_no, payload in enumerate(payloads):
+        if seq_no != lost:
+            recovered += decoder.put_packet(seq_no, payload)
+    recovered += decoder.put_parity(*parity)
+    assert recovered == [(lost, payloads[lost])]
+    assert decoder.recovered_packets == 1
+
+def test_recover_when_parity_arrives_first():
+    encoder = ParityEncoder(3)
+    decoder = ParityDecoder()
+    payloads = [b"one", b"three", b""]
+    for seq_no, payload in enumerate(payloads):
+        parity = encoder.add(seq_no, payload)
+
+    assert decoder.put_parity(*parity) == []
+    assert decoder.put_packet(0, payloads[0]) == []
+    assert decoder.put_packet(2, payloads[2]) == [(1, b"three")]
+
+def test_no_recovery_with_two_losses():
+    encoder = ParityEncoder(4)
+    decoder = ParityDecoder()
+    for seq_no in range(4):
+        parity = encoder.add(seq_no, _payload(seq_no))
+    decoder.put_packet(0, _payload(0))
+    decoder.put_packet(3, _payload(3))
+    assert decoder.put_parity(*parity) == []
+
+def test_jitter_buffer_recovers_lost_packet():
+    t = CopyingTransport()
+    p = UDPPacketizer(t, "address", fec_group_size=4)
+    jitter_buffer = JitterBuffer(buffer_length=2, fec=True)
+
+    played = []
+    for i in range(40):
+        p.write(_payload(i))
+        for packet, _ in t.packets:
+            _, seq_no, data = UDPPacketizer.decode(packet)
+            if is_parity(seq_no):
+                jitter_buffer.put_parity(seq_no, data)
+            elif seq_no % 8 != 5:
+                # Lose one packet in every other group
+                jitter_buffer.put_packet(seq_no, data)
+        t.packets.clear()
+        played.append(jitter_buffer.get_packet())
+
+    # Each lost packet is rebuilt before it is due to be played
+    counters = jitter_buffer.snapshot()["counters"]
+    assert counters["recovered_packets"] == 5
+    assert counters["put_packets"] == 35
+    assert played[2:] == [_payload(i) for i in range(38)]
+
+def test_jitter_buffer_late_recovery_not_counted():
+    t = CopyingTransport()
+    p = UDPPacketizer(t, "address", fec_group_size=2)
+    jitter_buffer = JitterBuffer(buffer_length=0, fec=True)
+    p.write(_payload(0))
+    p.write(_payload(1))
+    (packet0, _), _, (parity, _) = t.packets
+
+    jitter_buffer.put_packet(*UDPPacketizer.decode(packet0)[1:])
+    assert jitter_buffer.get_packet() == _payload(0)
+    assert jitter_buffer.get_packet() is None
+
+    # Packet 1 is rebuilt, but too late to be played
+    jitter_buffer.put_parity(*UDPPacketizer.decode(parity)[1:])
+    counters = jitter_buffer.snapshot()["counters"]
+    assert counters["late_packets"] == 1
+    assert counters["recovered_packets"] == 0
+    assert counters["put_packets"] == 1
+
+def test_parity_through_put_packet():
+    encoder = ParityEncoder(4)
+    jitter_buffer = JitterBuffer(buffer_length=0, fec=True)
+    for seq_no in range(10000, 10004):
+        parity = encoder.add(seq_no, _payload(seq_no))
+        if seq_no != 10002:
+            jitter_buffer.put_packet(seq_no, _payload(seq_no))
+
+    # The parity packet is used to rebuild packet 10002, rather than
+    # being stored as data
+    jitter_buffer.put_packet(*parity)
+    assert len(jitter_buffer) == 4
+    assert jitter_buffer.missing_packets() == []
+    counters = jitter_buffer.snapshot()["counters"]
+    assert counters["recovered_packets"] == 1
+    assert counters["put_packets"] == 3
+    assert counters["late_packets"] == 0
+    assert [jitter_buffer.get_packet() for _ in range(4)] == [
+        _payload(seq_no) for seq_no in range(10000, 10004)
+    ]
+
+def test_parity_through_put_packet_requires_fec():
+    with pytest.raises(Exception):
+        JitterBuffer().put_packet(-1, b"\x02\x00\x00")
+    with pytest.raises(Exception):
+        SlotJitterBuffer().put_packet(-1, b"\x02\x00\x00")
+    with pytest.raises(Exception):
+        JitterBufferPool(1, (3,), dtype=numpy.uint8).put(
+            0, -1, numpy.zeros(3, dtype=numpy.uint8)
+        )
+
+def test_put_parity_requires_fec():
+    with pytest.raises(Exception):
+        JitterBuffer().put_parity(-1, b"\x02\x00\x00")
@@ -1,6 +1,7 @@
 import pytest
 
 from singtcommon import JitterBuffer
+from mock_transport import MockClock
 
 def test_create_jitter_buffer():
     jitter_buffer = JitterBuffer()
@@ -138,12 +139,10 @@ def test_get_out_of_order_packets():
     
 
 def test_overly_large_seq_no():
-    jitter_buffer = JitterBuffer()
-
     # Set the roll-over value to a lower number to test the roll-over
     # code
     roll_over = 2
-    jitter_buffer._seq_no_rollover = roll_over
+    jitter_buffer = JitterBuffer(seq_no_rollover=roll_over)
 
     with pytest.raises(Exception):
         jitter_buffer.put_packet(roll_over, None)
@@ -154,12 +153,9 @@ def test_stress_test2():
     random.seed(1234)
     from collections import deque
     
-    # Create jitter buffer
-    jitter_buffer = JitterBuffer()
-    
-    # Set the roll-over value
+    # Create jitter buffer with a lower roll-over value
     roll_over = 1000
-    jitter_buffer._seq_no_rollover = roll_over
+    jitter_buffer = JitterBuffer(seq_no_rollover=roll_over)
     
     # Number of packets to simulate
     number_of_packets = 200000
@@ -218,3 +214,225 @@ def test_stress_test2():
             #print("length:", len(jitter_buffer),"\n")
 
         
+
+def test_sequence_number_rollover_matches_udp_packetizer():
+    from singtcommon.sequence_numbers import SEQ_NO_ROLLOVER
+    jitter_buffer = JitterBuffer(buffer_length=0)
+
+    # Sequence numbers wrap as they would from a UDPPacketizer;
+    # wrapping must not be treated as a gap
+    start = SEQ_NO_ROLLOVER - 10
+    for i in range(start, start + 20):
+        seq_no = i % SEQ_NO_ROLLOVER
+        jitter_buffer.put_packet(seq_no, seq_no)
+        assert jitter_buffer.get_packet() == seq_no
+
+    assert jitter_buffer._missed_packets == 0
+
+def test_out_of_order_across_rollover():
+    from singtcommon.sequence_numbers import SEQ_NO_ROLLOVER
+    jitter_buffer = JitterBuffer(buffer_length=0)
+
+    jitter_buffer.put_packet(SEQ_NO_ROLLOVER - 1, "a")
+    jitter_buffer.put_packet(1, "c")
+    jitter_buffer.put_packet(0, "b")
+
+    assert jitter_buffer.get_packet() == "a"
+    assert jitter_buffer.get_packet() == "b"
+    assert jitter_buffer.get_packet() == "c"
+
+def test_adaptive_shrinks_on_clean_link():
+    clock = MockClock()
+    jitter_buffer = JitterBuffer(
+        buffer_length=5,
+        adaptive=True,
+        min_buffer_length=1,
+        clock=clock
+    )
+
+    received = []
+    for i in range(2000):
+        clock.time = i * 0.02
+        jitter_buffer.put_packet(i, i)
+        out = jitter_buffer.get_packet()
+        if out is not None:
+            received.append(out)
+
+    assert jitter_buffer.jitter == pytest.approx(0, abs=1e-6)
+    assert jitter_buffer.target_length == 1
+    assert len(jitter_buffer) <= 2
+    assert jitter_buffer._missed_packets == 0
+
+    # Frames may be discarded to shrink the buffer, but otherwise
+    # arrive in order
+    assert received == sorted(received)
+    assert len(received) >= 2000 - 5
+
+def test_adaptive_grows_with_jitter():
+    clock = MockClock()
+    jitter_buffer = JitterBuffer(
+        buffer_length=1,
+        adaptive=True,
+        min_buffer_length=1,
+        max_buffer_length=20,
+        clock=clock
+    )
+
+    # Packets arrive on time, then in bursts of five every 100ms
+    received = []
+    for i in range(2000):
+        clock.time = i * 0.02
+        if i < 100:
+            jitter_buffer.put_packet(i, i)
+        elif i % 5 == 4:
+            for j in range(i - 4, i + 1):
+                jitter_buffer.put_packet(j, j)
+        received.append(jitter_buffer.get_packet())
+
+    assert jitter_buffer.jitter > 10
+    assert jitter_buffer.target_length > 3
+    assert len(jitter_buffer._buffer) > 1
+    assert None not in received[1000:]
+
+def test_adaptive_target_bounded():
+    clock = MockClock()
+    jitter_buffer = JitterBuffer(
+        buffer_length=1,
+        adaptive=True,
+        min_buffer_length=2,
+        max_buffer_length=4,
+        clock=clock
+    )
+    assert jitter_buffer.target_length == 2
+
+    # Very late packets
+    for i in range(100):
+        clock.time = i * 0.02 + (i % 2) * 1.0
+        jitter_buffer.put_packet(i, i)
+    assert jitter_buffer.target_length == 4
+
+def test_adaptive_late_packets_raise_target():
+    clock = MockClock()
+    jitter_buffer = JitterBuffer(
+        buffer_length=0,
+        adaptive=True,
+        min_buffer_length=1,
+        clock=clock
+    )
+    jitter_buffer.put_packet(0, 0)
+    jitter_buffer.get_packet()
+    target = jitter_buffer.target_length
+
+    # Getting from an empty buffer doesn't raise the target, as the
+    # packet may have been lost
+    assert jitter_buffer.get_packet() is None
+    assert jitter_buffer.target_length == target
+
+    # but the packet arriving too late to be played does
+    jitter_buffer.put_packet(1, 1)
+    assert jitter_buffer.target_length == target + 1
+
+def test_adaptive_shrinks_only_at_safe_points():
+    clock = MockClock()
+    jitter_buffer = JitterBuffer(
+        buffer_length=0,
+        adaptive=True,
+        min_buffer_length=1,
+        clock=clock
+    )
+
+    # A backlog of packets leaves the buffer deeper than its target,
+    # but on a clean link every packet is still played
+    for i in range(10):
+        jitter_buffer.put_packet(i, i)
+    received = []
+    for i in range(10, 500):
+        clock.time = i * 0.02
+        jitter_buffer.put_packet(i, i)
+        received.append(jitter_buffer.get_packet())
+    assert received == list(range(len(received)))
+    assert jitter_buffer.snapshot()["counters"]["discarded_frames"] == 0
+
+    # A lost packet is skipped rather than concealed, which shrinks
+    # the buffer
+    received = []
+    for i in range(500, 600):
+        clock.time = i * 0.02
+        if i != 500:
+            jitter_buffer.put_packet(i, i)
+        received.append(jitter_buffer.get_packet())
+    assert None not in received
+    assert 500 not in received
+    assert jitter_buffer.snapshot()["counters"]["discarded_frames"] == 1
+
+def test_snapshot_counters():
+    jitter_buffer = JitterBuffer(buffer_length=0)
+
+    jitter_buffer.put_packet(0, 0)
+    jitter_buffer.put_packet(0, 0) # duplicate of a buffered packet
+    jitter_buffer.put_packet(3, 3) # out of order
+    jitter_buffer.put_packet(3, 3) # duplicate of an out-of-order packet
+    assert jitter_buffer.get_packet() == 0
+    assert jitter_buffer.get_packet() is None # missed 1
+    jitter_buffer.put_packet(1, 1) # late
+
+    counters = jitter_buffer.snapshot()["counters"]
+    assert counters["put_packets"] == 5
+    assert counters["got_packets"] == 2
+    assert counters["missed_packets"] == 1
+    assert counters["duplicate_packets"] == 2
+    assert counters["out_of_order_packets"] == 1
+    assert counters["late_packets"] == 1
+    assert counters["resets"] == 0
+
+def test_snapshot_resets():
+    jitter_buffer = JitterBuffer(buffer_length=0)
+    jitter_buffer.put_packet(0, 0)
+    for _ in range(4):
+        jitter_buffer.get_packet()
+    assert jitter_buffer.snapshot()["counters"]["resets"] == 1
+
+def test_snapshot_histograms():
+    jitter_buffer = JitterBuffer(buffer_length=2, metrics=True)
+    jitter_buffer.put_packet(0, 0)
+    jitter_buffer.put_packet(2, 2)
+    jitter_buffer.get_packet()
+
+    histograms = jitter_buffer.snapshot()["histograms"]
+    assert histograms["reorder_distance"]["counts"][1] == 1
+    assert histograms["length_at_get"]["counts"][4] == 1
+
+def test_no_histograms_when_metrics_disabled():
+    jitter_buffer = JitterBuffer()
+    jitter_buffer.put_packet(0, 0)
+    jitter_buffer.get_packet()
+    assert jitter_buffer.snapshot()["histograms"] == {}
+
+def test_no_printing(capsys):
+    jitter_buffer = JitterBuffer(buffer_length=0)
+    jitter_buffer.put_packet(0, 0)
+    jitter_buffer.put_packet(5, 5)
+    for _ in range(5):
+        jitter_buffer.get_packet()
+    jitter_buffer.put_packet(0, 0)
+    del jitter_buffer
+    assert capsys.readouterr().out == ""
+
+def test_missing_packets():
+    jitter_buffer = JitterBuffer(buffer_length=2)
+    assert jitter_buffer.missing_packets() == []
+    jitter_buffer.put_packet(0, "0")
+    jitter_buffer.put_packet(2, "2")
+    jitter_buffer.put_packet(5, "5")
+    # Two None's and packet 0 are played before packet 1
+    assert jitter_buffer.missing_packets() == [(1, 3), (3, 5), (4, 6)]
+
+    jitter_buffer.put_packet(1, "1")
+    assert jitter_buffer.missing_packets() == [(3, 5), (4, 6)]
+
+def test_missing_packets_across_rollover():
+    rollover = 1000
+    jitter_buffer = JitterBuffer(buffer_length=0, seq_no_rollover=rollover)
+    jitter_buffer.put_packet(rollover - 1, "a")
+    jitter_buffer.put_packet(1, "c")
+    assert jitter_buffer.missing_packets() == [(0, 1)]
@@ -0,0 +1,107 @@
+import random
+
+import numpy
+import pytest
+
+from singtcommon import JitterBufferPool, SlotJitterBuffer
+
+def test_get_before_put():
+    pool = JitterBufferPool(4, (2,))
+    packets, missing = pool.get_all()
+    assert packets.shape == (4, 2)
+    assert numpy.all(packets == 0)
+    assert numpy.all(missing)
+
+def test_streams_are_independent():
+    pool = JitterBufferPool(3, (2,), buffer_length=0)
+    pool.put(0, 10, numpy.array([1, 2]))
+    pool.put(2, 500, numpy.array([5, 6]))
+    assert pool.length(0) == 1
+    assert pool.length(1) == 0
+
+    packets, missing = pool.get_all()
+    assert list(missing) == [False, True, False]
+    assert packets.tolist() == [[1, 2], [0, 0], [5, 6]]
+
+def test_initial_padding():
+    pool = JitterBufferPool(1, (1,), buffer_length=2)
+    pool.put(0, 0, numpy.array([7]))
+
+    assert pool.get_all()[1][0]
+    assert pool.get_all()[1][0]
+    packets, missing = pool.get_all()
+    assert not missing[0]
+    assert packets[0, 0] == 7
+
+def test_reset_stream():
+    pool = JitterBufferPool(2, (1,), buffer_length=1)
+    pool.put(1, 0, numpy.array([1]))
+    pool.reset_stream(1)
+    assert pool.length(1) == 1
+    assert pool.statistics(1)["put_packets"] == 0
+
+def test_overly_large_seq_no():
+    pool = JitterBufferPool(1, (1,), seq_no_rollover=2)
+    with pytest.raises(Exception):
+        pool.put(0, 2, numpy.array([0]))
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_slot_jitter_buffers(seed):
+    random.seed(seed)
+    streams = 5
+    rollover = 1000
+    capacity = 64
+
+    pool = JitterBufferPool(
+        streams,
+        (2,),
+        dtype=numpy.int64,
+        capacity=capacity,
+        seq_no_rollover=rollover
+    )
+    jitter_buffers = []
+    for _ in range(streams):
+        jitter_buffer = SlotJitterBuffer(
+            capacity=capacity,
+            seq_no_rollover=rollover
+        )
+        jitter_buffers.append(jitter_buffer)
+
+    # Each stream has its own loss, delays and starting sequence
+    # number
+    events = []
+    for stream_id in range(streams):
+        offset = random.randrange(rollover)
+        sigma = random.uniform(0, 4)
+        for i in range(2000):
+            if random.random() < 0.05:
+                continue
+            seq_no = offset + i
+            events.append((i + random.gauss(0, sigma), stream_id, seq_no))
+    for i in range(2000):
+        events.append((i + 0.5, None, None))
+    events.sort(key=lambda event: event[0])
+
+    for _, stream_id, seq_no in events:
+        if stream_id is not None:
+            packet = numpy.array([stream_id, seq_no])
+            pool.put(stream_id, seq_no % rollover, packet)
+            jitter_buffers[stream_id].put_packet(seq_no % rollover, packet)
+            continue
+
+        packets, missing = pool.get_all()
+        for stream_id, jitter_buffer in enumerate(jitter_buffers):
+            expected = jitter_buffer.get_packet()
+            if expected is None:
+                assert missing[stream_id]
+                assert numpy.all(packets[stream_id] == 0)
+            else:
+                assert not missing[stream_id]
+                assert numpy.all(packets[stream_id] == expected)
+            assert pool.length(stream_id) == len(jitter_buffer)
+
+    for stream_id, jitter_buffer in enumerate(jitter_buffers):
+        statistics = pool.statistics(stream_id)
+        assert statistics["missed_packets"] == jitter_buffer._missed_packets
+        assert statistics["late_packets"] == jitter_buffer._late_packets
+        assert statistics["max_length"] == jitter_buffer._max_length
@@ -0,0 +1,71 @@
+import json
+
+from twisted.web.test.requesthelper import DummyRequest
+
+from singtcommon import JitterBuffer
+from singtcommon.metrics import (
+    Histogram, prometheus_text, MetricsResource
+)
+
+def test_histogram():
+    histogram = Histogram(3)
+    for value in [0, 1, 1, 2, 7]:
+        histogram.observe(value)
+    assert histogram.snapshot() == {"counts": [1, 2, 2], "sum": 11}
+
+def test_prometheus_text():
+    snapshot = {
+        "counters": {"put_packets": 3},
+        "gauges": {"max_length": 2, "average_length_at_get": None},
+        "histograms": {"length_at_get": {"counts": [1, 0, 2], "sum": 5}},
+    }
+    text = prometheus_text("jb", {"alice": snapshot})
+    lines = text.splitlines()
+    assert "# TYPE jb_put_packets_total counter" in lines
+    assert 'jb_put_packets_total{instance="alice"} 3' in lines
+    assert 'jb_max_length{instance="alice"} 2' in lines
+    assert not any("average_length_at_get{" in line for line in lines)
+    assert 'jb_length_at_get_bucket{instance="alice",le="0"} 1' in lines
+    assert 'jb_length_at_get_bucket{instance="alice",le="1"} 1' in lines
+    assert 'jb_length_at_get_bucket{instance="alice",le="+Inf"} 3' in lines
+    assert 'jb_length_at_get_sum{instance="alice"} 5' in lines
+    assert 'jb_length_at_get_count{instance="alice"} 3' in lines
+
+def test_prometheus_text_escapes_labels():
+    snapshot = {"counters": {"put_packets": 1}}
+    text = prometheus_text("jb", {'a "b"\\c\nd': snapshot})
+    assert text.splitlines()[1] == (
+        'jb_put_packets_total{instance="a \\"b\\"\\\\c\\nd"} 1'
+    )
+
+def test_publish_snapshot():
+    class EventSource:
+        def __init__(self):
+            self.published = []
+
+        def publish_to_all(self, event, data):
+            self.published.append((event, data))
+
+    event_source = EventSource()
+    jitter_buffer = JitterBuffer(metrics=True)
+    jitter_buffer.put_packet(0, 0)
+    jitter_buffer.publish(event_source)
+
+    (event, data), = event_source.published
+    assert event == "jitter_buffer"
+    assert json.loads(data)["counters"]["put_packets"] == 1
+
+def test_metrics_resource():
+    jitter_buffer = JitterBuffer(metrics=True)
+    jitter_buffer.put_packet(0, 0)
+    metrics_resource = MetricsResource(
+        "singt_jitter_buffer",
+        lambda: {"bob": jitter_buffer}
+    )
+
+    request = DummyRequest([b""])
+    body = metrics_resource.render_GET(request).decode("utf-8")
+    assert 'singt_jitter_buffer_put_packets_total{instance="bob"} 1' in body
+    assert request.responseHeaders.getRawHeaders(b"content-type")[0].startswith(
+        b"text/plain"
+    )
@@ -0,0 +1,100 @@
+import gc
+import os
+
+import numpy
+import pytest
+
+from singtcommon import MirroredRingBuffer
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "memfd_create"),
+    reason="MirroredRingBuffer requires Linux"
+)
+
+def test_capacity_rounded_to_pages():
+    ring_buffer = MirroredRingBuffer((1000, 2), dtype=numpy.int16)
+    assert ring_buffer.capacity >= 1000
+    assert (ring_buffer.capacity * 4) % 4096 == 0
+
+def test_storage_is_mirrored():
+    ring_buffer = MirroredRingBuffer((10,), dtype=numpy.uint8)
+    capacity = ring_buffer.capacity
+    ring_buffer._buffer[0] = 42
+    assert ring_buffer._buffer[capacity] == 42
+
+def test_store_and_retrieve():
+    ring_buffer = MirroredRingBuffer((100, 2), dtype=numpy.int16)
+    array = numpy.arange(20, dtype=numpy.int16).reshape((10, 2))
+    ring_buffer.put(array)
+    assert len(ring_buffer) == 10
+    out = numpy.zeros((10, 2), dtype=numpy.int16)
+    ring_buffer.get(out)
+    assert numpy.all(out == array)
+    assert len(ring_buffer) == 0
+
+def test_fills_to_capacity():
+    ring_buffer = MirroredRingBuffer((10,), dtype=numpy.int32)
+    capacity = ring_buffer.capacity
+    ring_buffer.put(numpy.arange(capacity, dtype=numpy.int32))
+    with pytest.raises(Exception):
+        ring_buffer.put(numpy.zeros(1, dtype=numpy.int32))
+
+def test_window_across_end_is_contiguous():
+    ring_buffer = MirroredRingBuffer((10,), dtype=numpy.int32)
+    capacity = ring_buffer.capacity
+    ring_buffer.put(numpy.zeros(capacity - 3, dtype=numpy.int32))
+    ring_buffer.advance(capacity - 3)
+
+    ring_buffer.put(numpy.arange(10, dtype=numpy.int32))
+    views = ring_buffer.peek(10)
+    assert len(views) == 1
+    assert views[0].flags["C_CONTIGUOUS"]
+    assert list(views[0]) == list(range(10))
+
+def test_reserve_and_commit():
+    ring_buffer = MirroredRingBuffer((10,), dtype=numpy.int32)
+    capacity = ring_buffer.capacity
+    ring_buffer.commit(capacity - 2)
+    ring_buffer.advance(capacity - 2)
+
+    (view,) = ring_buffer.reserve(5)
+    view[:] = numpy.arange(5)
+    ring_buffer.commit(5)
+    out = numpy.zeros(5, dtype=numpy.int32)
+    ring_buffer.get(out)
+    assert list(out) == [0, 1, 2, 3, 4]
+
+def test_underrun_and_type_mismatch():
+    ring_buffer = MirroredRingBuffer((10,), dtype=numpy.int32)
+    with pytest.raises(Exception):
+        ring_buffer.get(numpy.zeros(1, dtype=numpy.int32))
+    with pytest.raises(Exception):
+        ring_buffer.put(numpy.zeros(1, dtype=numpy.int16))
+
+def test_views_outlive_buffer():
+    ring_buffer = MirroredRingBuffer((10,), dtype=numpy.int32)
+    ring_buffer.put(numpy.arange(3, dtype=numpy.int32))
+    (view,) = ring_buffer.peek(3)
+    del ring_buffer
+    gc.collect()
+    assert list(view) == [0, 1, 2]
+
+def test_random_matches_ring_buffer():
+    import random
+    random.seed(5)
+    ring_buffer = MirroredRingBuffer((10, 3), dtype=numpy.int64)
+    capacity = ring_buffer.capacity
+    producer_value = 0
+    consumer_value = 0
+    for _ in range(2000):
+        n = random.randint(0, capacity - len(ring_buffer))
+        values = numpy.arange(producer_value, producer_value + 3*n)
+        ring_buffer.put(values.reshape((n, 3)))
+        producer_value += 3*n
+
+        n = random.randint(0, len(ring_buffer))
+        out = numpy.zeros((n, 3), dtype=numpy.int64)
+        ring_buffer.get(out)
+        expected = numpy.arange(consumer_value, consumer_value + 3*n)
+        assert numpy.all(out.ravel() == expected)
+        consumer_value += 3*n
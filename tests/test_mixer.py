@@ -0,0 +1,98 @@
+import numpy
+import pytest
+
+from singtcommon import Mixer, AutomaticGainControl
+
+def _constant(value, frames, channels=1):
+    return numpy.full((frames, channels), value, dtype=numpy.float32)
+
+def test_total_and_minus_one():
+    mixer = Mixer(3, 16)
+    for stream_id, value in enumerate([0.1, 0.2, 0.4]):
+        mixer.put(stream_id, _constant(value, 4))
+
+    total, minus_one = mixer.mix(4)
+    assert total.shape == (4, 1)
+    assert minus_one.shape == (3, 4, 1)
+    assert numpy.allclose(total, 0.7)
+    assert numpy.allclose(minus_one[0], 0.6)
+    assert numpy.allclose(minus_one[1], 0.5)
+    assert numpy.allclose(minus_one[2], 0.3)
+
+def test_gains_and_mute():
+    mixer = Mixer(3, 16, channels=2)
+    for stream_id in range(3):
+        mixer.put(stream_id, _constant(0.25, 4, channels=2))
+    mixer.gains[0] = 2
+    mixer.muted[2] = True
+
+    total, minus_one = mixer.mix(4)
+    assert numpy.allclose(total, 0.75)
+    assert numpy.allclose(minus_one[0], 0.25)
+    # A muted singer still hears everyone else
+    assert numpy.allclose(minus_one[2], 0.75)
+
+def test_underrun_padded_with_silence():
+    mixer = Mixer(2, 16)
+    mixer.put(0, _constant(0.5, 4))
+    mixer.put(1, _constant(0.25, 2))
+
+    total, _ = mixer.mix(4)
+    assert list(total[:, 0]) == [0.75, 0.75, 0.5, 0.5]
+    assert list(mixer.underruns) == [0, 1]
+    assert mixer.length(1) == 0
+
+def test_overrun_drops_newest():
+    mixer = Mixer(1, 4)
+    assert mixer.put(0, _constant(0.5, 3)) == 3
+    assert mixer.put(0, _constant(0.25, 3)) == 1
+    assert mixer.overruns[0] == 1
+    total, _ = mixer.mix(4)
+    assert list(total[:, 0]) == [0.5, 0.5, 0.5, 0.25]
+
+def test_streams_wrap_independently():
+    mixer = Mixer(2, 5)
+    mixer.put(0, _constant(0, 3))
+    mixer.mix(3)
+
+    values = numpy.arange(5, dtype=numpy.float32)[:, None]
+    mixer.put(0, values)
+    mixer.put(1, values * 10)
+    total, minus_one = mixer.mix(5)
+    assert list(total[:, 0]) == list(values[:, 0] * 11)
+    assert list(minus_one[1, :, 0]) == list(values[:, 0])
+
+def test_agc_matches_automatic_gain_control():
+    rng = numpy.random.default_rng(1)
+    mixer = Mixer(2, 64, channels=2, agc=True)
+    agcs = [AutomaticGainControl(), AutomaticGainControl()]
+    for _ in range(20):
+        blocks = [
+            rng.uniform(-0.3, 0.3, (16, 2)).astype(numpy.float32),
+            rng.uniform(-1, 1, (16, 2)).astype(numpy.float32),
+        ]
+        for stream_id, block in enumerate(blocks):
+            mixer.put(stream_id, block)
+        _, minus_one = mixer.mix(16)
+
+        expected = []
+        for agc, block in zip(agcs, blocks):
+            block = block.copy()
+            agc.apply(block)
+            expected.append(block)
+        # Each minus-one mix is the other stream, after its AGC
+        assert numpy.allclose(minus_one[0], expected[1], atol=1e-5)
+        assert numpy.allclose(minus_one[1], expected[0], atol=1e-5)
+
+def test_reset_stream():
+    mixer = Mixer(2, 8)
+    mixer.put(1, _constant(0.5, 4))
+    mixer.reset_stream(1)
+    assert mixer.length(1) == 0
+    total, _ = mixer.mix(2)
+    assert numpy.all(total == 0)
+
+def test_block_larger_than_capacity():
+    mixer = Mixer(2, 8)
+    with pytest.raises(Exception):
+        mixer.mix(9)
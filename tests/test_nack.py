@@ -0,0 +1,114 @@
+import pytest
+
+from singtcommon import (
+    JitterBuffer, UDPPacketizer, NackGenerator, RetransmitCache,
+    encode_nack, decode_nack
+)
+from singtcommon.sequence_numbers import SEQ_NO_ROLLOVER
+from mock_transport import CopyingTransport, MockClock
+
+def test_encode_decode_nack():
+    seq_nos = [3, 5, 19, 20, 40]
+    report = encode_nack(seq_nos)
+    # 3 to 19 share an entry
+    assert len(report) == 12
+    assert decode_nack(report) == seq_nos
+
+def test_encode_nack_across_rollover():
+    seq_nos = [SEQ_NO_ROLLOVER - 2, SEQ_NO_ROLLOVER - 1, 0, 3]
+    report = encode_nack(seq_nos)
+    assert len(report) == 4
+    assert decode_nack(report) == seq_nos
+
+def test_encode_empty_nack():
+    assert encode_nack([]) == b""
+    assert decode_nack(b"") == []
+
+def test_decode_nack_bad_length():
+    with pytest.raises(Exception):
+        decode_nack(b"abc")
+
+def test_nack_generator_respects_deadline():
+    generator = NackGenerator(packet_duration=20, round_trip_time=50,
+                              clock=MockClock())
+    # Packets due in 40ms can't be retransmitted in time
+    assert generator.update([(1, 2), (2, 3)]) == [2]
+
+def test_nack_generator_retries():
+    clock = MockClock()
+    generator = NackGenerator(packet_duration=20, round_trip_time=50,
+                              max_requests=2, clock=clock)
+    assert generator.update([(1, 10)]) == [1]
+    clock.time += 0.01
+    assert generator.update([(1, 10)]) == []
+    clock.time += 0.05
+    assert generator.update([(1, 10)]) == [1]
+    clock.time += 0.1
+    assert generator.update([(1, 10)]) == []
+    assert generator.requested_packets == 2
+
+def test_nack_generator_forgets_arrived_packets():
+    clock = MockClock()
+    generator = NackGenerator(clock=clock)
+    assert generator.update([(1, 10)]) == [1]
+    assert generator.update([]) == []
+    # A reused sequence number is requested afresh
+    assert generator.update([(1, 10)]) == [1]
+
+def test_retransmit_cache_evicts_by_time():
+    clock = MockClock()
+    cache = RetransmitCache(duration=0.1, packet_duration=20, clock=clock)
+    cache.put(0, b"a")
+    clock.time = 0.06
+    cache.put(1, b"b")
+    clock.time = 0.12
+    assert cache.get(0) is None
+    assert cache.get(1) == b"b"
+
+def test_retransmit_cache_bounded():
+    cache = RetransmitCache(duration=0.1, packet_duration=20, clock=MockClock())
+    for seq_no in range(10):
+        cache.put(seq_no, bytes([seq_no]))
+    assert len(cache) == 5
+    assert cache.get(4) is None
+    assert cache.get(5) == b"\x05"
+
+def test_retransmit_requires_cache():
+    p = UDPPacketizer(CopyingTransport(), "address")
+    with pytest.raises(Exception):
+        p.retransmit([0])
+
+def test_single_loss_repaired_within_buffer_depth():
+    clock = MockClock()
+    transport = CopyingTransport()
+    sender = UDPPacketizer(
+        transport,
+        "address",
+        retransmit_cache=RetransmitCache(clock=clock)
+    )
+    receiver = JitterBuffer(buffer_length=3)
+    generator = NackGenerator(round_trip_time=30, clock=clock)
+
+    played = []
+    for i in range(20):
+        sender.write(bytes([i]))
+        packet, _ = transport.packets.pop()
+        _, seq_no, data = UDPPacketizer.decode(packet)
+        if seq_no != 7:
+            receiver.put_packet(seq_no, data)
+
+        # The NACK reaches the sender, and the retransmission the
+        # receiver, within one packet duration
+        nack = generator.update(receiver.missing_packets())
+        if len(nack) > 0:
+            assert sender.retransmit(decode_nack(encode_nack(nack))) == 1
+            packet, _ = transport.packets.pop()
+            _, seq_no, data = UDPPacketizer.decode(packet)
+            receiver.put_packet(seq_no, data)
+
+        played.append(receiver.get_packet())
+        clock.time += 0.02
+
+    assert played[:3] == [None] * 3
+    assert played[3:] == [bytes([i]) for i in range(17)]
+    assert receiver.snapshot()["counters"]["missed_packets"] == 0
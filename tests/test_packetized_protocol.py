@@ -0,0 +1,160 @@
+import pytest
+from twisted.internet.testing import StringTransport
+
+from singtcommon import PacketizedProtocol, Framing
+from mock_transport import encode
+
+def _connect(**kwargs):
+    received = []
+    protocol = PacketizedProtocol(handler=received.append, **kwargs)
+    transport = StringTransport()
+    protocol.makeConnection(transport)
+    return protocol, transport, received
+
+def test_registers_as_streaming_producer():
+    protocol, transport, _ = _connect()
+    assert transport.producer is protocol
+    assert transport.streaming
+
+def test_dispatches_received_frames():
+    protocol, _, received = _connect()
+    encoded = encode([b"one", b"two", b"three"])
+
+    protocol.dataReceived(encoded[:5])
+    assert received == [b"one"]
+    protocol.dataReceived(encoded[5:])
+    assert received == [b"one", b"two", b"three"]
+
+def test_large_frames_received_as_memoryviews():
+    protocol, _, received = _connect(
+        framing=Framing.UINT32,
+        large_message_threshold=100
+    )
+    protocol.dataReceived(
+        encode([b"small", b"x" * 100], framing=Framing.UINT32)
+    )
+    assert received[0] == b"small"
+    assert isinstance(received[1], memoryview)
+    assert bytes(received[1]) == b"x" * 100
+
+def test_frame_received_can_be_overridden():
+    class Protocol(PacketizedProtocol):
+        def __init__(self):
+            super().__init__()
+            self.frames = []
+
+        def frameReceived(self, frame):
+            self.frames.append(frame)
+
+    protocol = Protocol()
+    protocol.makeConnection(StringTransport())
+    protocol.dataReceived(encode([b"abc"]))
+    assert protocol.frames == [b"abc"]
+
+def test_send_writes_framed_messages():
+    protocol, transport, _ = _connect()
+    protocol.send("hello")
+    protocol.send_many_bytes([b"a", b"b"])
+    assert transport.value() == encode([b"hello", b"a", b"b"])
+
+def test_queues_while_paused():
+    protocol, transport, _ = _connect()
+
+    protocol.pauseProducing()
+    protocol.send_bytes(b"queued")
+    assert transport.value() == b""
+    assert protocol.queued_bytes == len(encode([b"queued"]))
+
+    protocol.resumeProducing()
+    assert transport.value() == encode([b"queued"])
+    assert protocol.queued_bytes == 0
+
+def test_watermarks():
+    events = []
+
+    class Protocol(PacketizedProtocol):
+        def sendingPaused(self):
+            events.append("paused")
+
+        def sendingResumed(self):
+            events.append("resumed")
+
+    protocol = Protocol(high_watermark=100, low_watermark=50)
+    transport = StringTransport()
+    protocol.makeConnection(transport)
+
+    # Each message is 12 bytes once framed
+    protocol.pauseProducing()
+    for _ in range(8):
+        protocol.send_bytes(b"x" * 10)
+    assert protocol.writable
+    assert transport.producerState == "producing"
+
+    # Crossing the high watermark stops reading from the peer
+    protocol.send_bytes(b"x" * 10)
+    assert not protocol.writable
+    assert transport.producerState == "paused"
+    assert events == ["paused"]
+
+    protocol.resumeProducing()
+    assert protocol.writable
+    assert transport.producerState == "producing"
+    assert events == ["paused", "resumed"]
+    assert transport.value() == encode([b"x" * 10] * 9)
+
+def test_stays_throttled_until_low_watermark():
+    protocol, transport, _ = _connect(high_watermark=100, low_watermark=20)
+    chunks_written = []
+
+    # Pause again after each chunk is written
+    original_write = transport.write
+    def write(data):
+        original_write(data)
+        chunks_written.append(data)
+        protocol.pauseProducing()
+    transport.write = write
+
+    protocol.pauseProducing()
+    for _ in range(10):
+        protocol.send_bytes(b"x" * 10)
+    assert not protocol.writable
+
+    while protocol.queued_bytes > 20:
+        assert not protocol.writable
+        protocol.resumeProducing()
+    assert protocol.writable
+
+def test_aborts_when_queue_exceeds_maximum():
+    protocol, transport, _ = _connect(
+        high_watermark=10,
+        low_watermark=5,
+        max_queued_bytes=50
+    )
+    protocol.pauseProducing()
+    for _ in range(10):
+        protocol.send_bytes(b"x" * 10)
+
+    assert transport.disconnecting
+    assert protocol.queued_bytes == 0
+
+def test_invalid_watermarks():
+    with pytest.raises(Exception):
+        PacketizedProtocol(high_watermark=10, low_watermark=20)
+
+def test_queue_is_bounded_by_default():
+    protocol, transport, _ = _connect(high_watermark=100, low_watermark=50)
+    protocol.pauseProducing()
+
+    # Each message is 12 bytes once framed; the default maximum is
+    # four times the high watermark
+    for _ in range(33):
+        protocol.send_bytes(b"x" * 10)
+    assert not transport.disconnecting
+
+    protocol.send_bytes(b"x" * 10)
+    assert transport.disconnecting
+    assert protocol.queued_bytes == 0
+
+def test_invalid_max_queued_bytes():
+    with pytest.raises(Exception):
+        PacketizedProtocol(high_watermark=100, max_queued_bytes=50)
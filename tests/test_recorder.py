@@ -0,0 +1,161 @@
+import struct
+import threading
+import wave
+
+import numpy
+import pytest
+
+from singtcommon import Recorder
+
+def _blocks(count, frames=100, channels=2):
+    rng = numpy.random.default_rng(count)
+    return [
+        rng.integers(-32768, 32767, (frames, channels), dtype=numpy.int16)
+        for _ in range(count)
+    ]
+
+def _read_wav(path):
+    with wave.open(str(path), "rb") as f:
+        frames = f.readframes(f.getnframes())
+        return f.getnchannels(), f.getframerate(), numpy.frombuffer(
+            frames, dtype=numpy.int16
+        ).reshape((-1, f.getnchannels()))
+
+def test_records_wav(tmp_path):
+    path = tmp_path / "session.wav"
+    blocks = _blocks(10)
+    with Recorder(path, channels=2, samplerate=8000) as recorder:
+        for block in blocks:
+            recorder.write(block)
+        assert recorder.frames_written == 1000
+
+    channels, samplerate, audio = _read_wav(path)
+    assert (channels, samplerate) == (2, 8000)
+    assert numpy.all(audio == numpy.concatenate(blocks))
+    assert path.stat().st_size == 44 + 1000 * 4
+
+def test_grows_across_chunks(tmp_path):
+    path = tmp_path / "session.wav"
+    blocks = _blocks(10, frames=70)
+    # Chunks of 160 frames, which blocks straddle
+    with Recorder(path, channels=2, samplerate=8000,
+                  chunk_seconds=0.02) as recorder:
+        for block in blocks:
+            recorder.write(block)
+
+    _, _, audio = _read_wav(path)
+    assert numpy.all(audio == numpy.concatenate(blocks))
+
+def test_readable_while_recording(tmp_path):
+    path = tmp_path / "session.wav"
+    blocks = _blocks(4)
+    recorder = Recorder(path, channels=2, samplerate=8000)
+    try:
+        for block in blocks[:3]:
+            recorder.write(block)
+        recorder.flush()
+        _, _, audio = _read_wav(path)
+        assert numpy.all(audio == numpy.concatenate(blocks[:3]))
+        recorder.write(blocks[3])
+    finally:
+        recorder.close()
+
+    _, _, audio = _read_wav(path)
+    assert len(audio) == 400
+
+def test_background_flush(tmp_path):
+    path = tmp_path / "session.wav"
+    recorder = Recorder(path, channels=2, flush_interval=0.01)
+    try:
+        recorder.write(_blocks(1)[0])
+        recorder._stop.wait(0.2)
+        _, _, audio = _read_wav(path)
+        assert len(audio) == 100
+    finally:
+        recorder.close()
+
+def test_write_not_blocked_by_flush(tmp_path, monkeypatch):
+    path = tmp_path / "session.wav"
+    recorder = Recorder(path, channels=2, samplerate=8000,
+                        chunk_seconds=0.02, flush_interval=60)
+    recorder.write(_blocks(1)[0])
+
+    # Hold up every flush until released, as a slow disk would
+    flushing = threading.Event()
+    release = threading.Event()
+    flushed_by = []
+    original_flush = numpy.memmap.flush
+    def flush(self):
+        flushed_by.append(threading.current_thread())
+        flushing.set()
+        release.wait()
+        original_flush(self)
+    monkeypatch.setattr(numpy.memmap, "flush", flush)
+
+    flush_thread = threading.Thread(target=recorder.flush)
+    flush_thread.start()
+    try:
+        assert flushing.wait(5)
+        # Writing continues, across chunks, while the flush is held up
+        blocks = _blocks(5)
+        def write():
+            for block in blocks:
+                recorder.write(block)
+        write_thread = threading.Thread(target=write, daemon=True)
+        write_thread.start()
+        write_thread.join(5)
+        assert not write_thread.is_alive()
+        assert flushed_by == [flush_thread]
+    finally:
+        release.set()
+        flush_thread.join()
+        recorder.close()
+
+    _, _, audio = _read_wav(path)
+    assert numpy.all(audio == numpy.concatenate(_blocks(1) + blocks))
+
+def test_raw_float(tmp_path):
+    path = tmp_path / "session.raw"
+    block = numpy.linspace(-1, 1, 20, dtype=numpy.float32).reshape((10, 2))
+    with Recorder(path, channels=2, dtype=numpy.float32,
+                  file_format="raw") as recorder:
+        recorder.write(block)
+    assert numpy.all(numpy.fromfile(path, dtype=numpy.float32) == block.ravel())
+
+def test_float_wav_header(tmp_path):
+    path = tmp_path / "session.wav"
+    with Recorder(path, channels=1, dtype=numpy.float32) as recorder:
+        recorder.write(numpy.zeros((5, 1), dtype=numpy.float32))
+    header = path.read_bytes()[:44]
+    format_tag, channels = struct.unpack_from("<HH", header, 20)
+    assert (format_tag, channels) == (3, 1)
+    assert struct.unpack_from("<I", header, 40)[0] == 20
+
+def test_wav_integer_types(tmp_path):
+    path = tmp_path / "session.wav"
+    for dtype in (numpy.int8, numpy.uint16):
+        with pytest.raises(Exception):
+            Recorder(path, channels=1, dtype=dtype)
+
+    # 8-bit WAV audio is unsigned
+    block = numpy.array([[0], [128], [255]], dtype=numpy.uint8)
+    with Recorder(path, channels=1, dtype=numpy.uint8) as recorder:
+        recorder.write(block)
+    with wave.open(str(path), "rb") as f:
+        assert f.getsampwidth() == 1
+        assert f.readframes(3) == block.tobytes()
+
+    # Any integer type may be recorded raw
+    with Recorder(tmp_path / "session.raw", channels=1, dtype=numpy.int8,
+                  file_format="raw") as recorder:
+        recorder.write(numpy.zeros((1, 1), dtype=numpy.int8))
+
+def test_type_mismatch_and_closed(tmp_path):
+    recorder = Recorder(tmp_path / "session.wav", channels=2)
+    with pytest.raises(Exception):
+        recorder.write(numpy.zeros((1, 2), dtype=numpy.float32))
+    recorder.close()
+    with pytest.raises(Exception):
+        recorder.write(numpy.zeros((1, 2), dtype=numpy.int16))
+    # Closing twice is harmless
+    recorder.close()
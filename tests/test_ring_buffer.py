@@ -1,7 +1,7 @@
 import numpy
 import pytest
 
-from singtcommon import RingBuffer
+from singtcommon import RingBuffer, BlockingRingBuffer, Overrun, Underrun
 
 def test_create_ring_buffer():
     shape = (1000,2)
@@ -268,3 +268,325 @@ def test_stress_test():
         producer_value = produce(producer_value)
         consumer_value = consume(consumer_value)
 
+
+def test_peek_and_advance():
+    ring_buffer = RingBuffer((5,), dtype=numpy.int32)
+    ring_buffer.put(numpy.arange(4, dtype=numpy.int32))
+    ring_buffer.advance(3)
+    ring_buffer.put(numpy.arange(4, 8, dtype=numpy.int32))
+
+    # The data wraps around the end of the buffer
+    views = ring_buffer.peek(5)
+    assert len(views) == 2
+    assert list(numpy.concatenate(views)) == [3, 4, 5, 6, 7]
+    assert len(ring_buffer) == 5
+
+    # Views can be modified in place
+    views[1][:] *= 10
+    ring_buffer.advance(2)
+    out = numpy.zeros(3, dtype=numpy.int32)
+    ring_buffer.get(out)
+    assert list(out) == [5, 60, 70]
+
+def test_peek_without_wrap_is_single_view():
+    ring_buffer = RingBuffer((5,), dtype=numpy.int32)
+    ring_buffer.put(numpy.arange(3, dtype=numpy.int32))
+    views = ring_buffer.peek(2)
+    assert len(views) == 1
+    assert views[0].base is not None
+    assert list(views[0]) == [0, 1]
+
+def test_peek_underrun():
+    ring_buffer = RingBuffer((5,), dtype=numpy.int32)
+    ring_buffer.put(numpy.arange(3, dtype=numpy.int32))
+    with pytest.raises(Exception):
+        ring_buffer.peek(4)
+    with pytest.raises(Exception):
+        ring_buffer.advance(4)
+
+def test_reserve_and_commit():
+    ring_buffer = RingBuffer((5, 2), dtype=numpy.int16)
+    ring_buffer.put(numpy.zeros((4, 2), dtype=numpy.int16))
+    ring_buffer.advance(4)
+
+    views = ring_buffer.reserve(5)
+    assert [len(view) for view in views] == [2, 3]
+    start = 0
+    for view in views:
+        view[:] = numpy.arange(start, start + len(view))[:, None]
+        start += len(view)
+    ring_buffer.commit(5)
+
+    out = numpy.zeros((5, 2), dtype=numpy.int16)
+    ring_buffer.get(out)
+    assert list(out[:, 1]) == [0, 1, 2, 3, 4]
+
+def test_reserve_overrun():
+    ring_buffer = RingBuffer((5,), dtype=numpy.int32)
+    ring_buffer.put(numpy.arange(3, dtype=numpy.int32))
+    with pytest.raises(Exception):
+        ring_buffer.reserve(3)
+    with pytest.raises(Exception):
+        ring_buffer.commit(3)
+
+def test_random_reserve_commit_peek_advance():
+    import random
+    random.seed(3)
+    ring_buffer = RingBuffer((23,), dtype=numpy.int64)
+    producer_value = 0
+    consumer_value = 0
+    for _ in range(1000):
+        space = 23 - len(ring_buffer)
+        n = random.randint(0, space)
+        views = ring_buffer.reserve(n)
+        for view in views:
+            view[:] = numpy.arange(producer_value, producer_value + len(view))
+            producer_value += len(view)
+        ring_buffer.commit(n)
+
+        n = random.randint(0, len(ring_buffer))
+        values = numpy.concatenate(ring_buffer.peek(n))
+        assert list(values) == list(range(consumer_value, consumer_value + n))
+        ring_buffer.advance(n)
+        consumer_value += n
+
+def test_put_partial_drop_newest():
+    ring_buffer = RingBuffer((5,), dtype=numpy.int32)
+    assert ring_buffer.put_partial(numpy.arange(3, dtype=numpy.int32)) == 3
+    assert ring_buffer.put_partial(numpy.arange(3, 6, dtype=numpy.int32)) == 2
+    assert ring_buffer.overruns == 1
+
+    out = numpy.zeros(5, dtype=numpy.int32)
+    ring_buffer.get(out)
+    assert list(out) == [0, 1, 2, 3, 4]
+
+def test_put_partial_rejects_mismatched_type():
+    ring_buffer = RingBuffer((5,), dtype=numpy.int16)
+    array = numpy.array([0.5, 0.9, 1.7], dtype=numpy.float32)
+    assert ring_buffer.put_partial(array) == 0
+    assert ring_buffer.type_mismatches == 1
+    assert ring_buffer.overruns == 0
+    assert len(ring_buffer) == 0
+
+    # With a scale, floating point items are converted
+    assert ring_buffer.put_partial(array, scale=10) == 3
+    assert ring_buffer.type_mismatches == 1
+
+def test_put_partial_drop_oldest():
+    ring_buffer = RingBuffer(
+        (5,),
+        dtype=numpy.int32,
+        overrun=Overrun.DROP_OLDEST
+    )
+    ring_buffer.put_partial(numpy.arange(4, dtype=numpy.int32))
+    assert ring_buffer.put_partial(numpy.arange(4, 7, dtype=numpy.int32)) == 3
+    assert ring_buffer.overruns == 1
+    assert len(ring_buffer) == 5
+
+    out = numpy.zeros(5, dtype=numpy.int32)
+    ring_buffer.get(out)
+    assert list(out) == [2, 3, 4, 5, 6]
+
+def test_put_partial_drop_oldest_longer_than_buffer():
+    ring_buffer = RingBuffer(
+        (5,),
+        dtype=numpy.int32,
+        overrun=Overrun.DROP_OLDEST
+    )
+    ring_buffer.put_partial(numpy.arange(2, dtype=numpy.int32))
+    assert ring_buffer.put_partial(numpy.arange(10, dtype=numpy.int32)) == 5
+
+    out = numpy.zeros(5, dtype=numpy.int32)
+    ring_buffer.get(out)
+    assert list(out) == [5, 6, 7, 8, 9]
+
+def test_get_partial_leave():
+    ring_buffer = RingBuffer((5,), dtype=numpy.int32)
+    ring_buffer.put(numpy.arange(1, 3, dtype=numpy.int32))
+    out = numpy.full(4, -1, dtype=numpy.int32)
+    assert ring_buffer.get_partial(out) == 2
+    assert list(out) == [1, 2, -1, -1]
+    assert ring_buffer.underruns == 1
+    assert len(ring_buffer) == 0
+
+def test_get_partial_zero_fill():
+    ring_buffer = RingBuffer(
+        (5,),
+        dtype=numpy.int32,
+        underrun=Underrun.ZERO_FILL
+    )
+    ring_buffer.put(numpy.arange(1, 3, dtype=numpy.int32))
+    out = numpy.full(4, -1, dtype=numpy.int32)
+    assert ring_buffer.get_partial(out) == 2
+    assert list(out) == [1, 2, 0, 0]
+
+    # No underrun if the request can be met
+    ring_buffer.put(numpy.arange(3, dtype=numpy.int32))
+    assert ring_buffer.get_partial(out[:3]) == 3
+    assert ring_buffer.underruns == 1
+
+def test_random_partial_put_get():
+    import random
+    random.seed(7)
+    ring_buffer = RingBuffer((11,), dtype=numpy.int64)
+    producer_value = 0
+    consumer_value = 0
+    for _ in range(1000):
+        n = random.randint(0, 15)
+        stored = ring_buffer.put_partial(
+            numpy.arange(producer_value, producer_value + n)
+        )
+        producer_value += stored
+
+        out = numpy.zeros(random.randint(0, 15), dtype=numpy.int64)
+        got = ring_buffer.get_partial(out)
+        assert list(out[:got]) == list(range(consumer_value, consumer_value + got))
+        consumer_value += got
+
+def test_get_with_scale():
+    ring_buffer = RingBuffer((10, 2), dtype=numpy.int16)
+    ring_buffer.put(numpy.array([[-32768, 16384]] * 3, dtype=numpy.int16))
+    out = numpy.zeros((3, 2), dtype=numpy.float32)
+    ring_buffer.get(out, scale=1/32768)
+    assert numpy.all(out == [[-1.0, 0.5]] * 3)
+
+def test_put_with_scale_clips():
+    ring_buffer = RingBuffer((10,), dtype=numpy.int16)
+    array = numpy.array([0.5, -1.5, 2.0, 0.25], dtype=numpy.float32)
+    ring_buffer.put(array, scale=32767)
+    out = numpy.zeros(4, dtype=numpy.int16)
+    ring_buffer.get(out)
+    assert list(out) == [16384, -32768, 32767, 8192]
+
+def test_scaled_transfer_across_wrap():
+    ring_buffer = RingBuffer((5,), dtype=numpy.int16)
+    ring_buffer.put(numpy.zeros(4, dtype=numpy.int16))
+    ring_buffer.get(numpy.zeros(4, dtype=numpy.int16))
+
+    array = numpy.linspace(-1, 1, 5, dtype=numpy.float32)
+    ring_buffer.put(array, scale=32767)
+    out = numpy.zeros(5, dtype=numpy.float32)
+    ring_buffer.get(out, scale=1/32767)
+    assert numpy.allclose(out, array, atol=1/32767)
+
+def test_partial_transfers_with_scale():
+    ring_buffer = RingBuffer(
+        (5,),
+        dtype=numpy.int16,
+        underrun=Underrun.ZERO_FILL
+    )
+    array = numpy.full(7, 0.5, dtype=numpy.float32)
+    assert ring_buffer.put_partial(array, scale=2) == 5
+    out = numpy.full(6, -1, dtype=numpy.float32)
+    assert ring_buffer.get_partial(out, scale=0.5) == 5
+    assert list(out) == [0.5] * 5 + [0.0]
+
+def test_scale_requires_floating_point():
+    ring_buffer = RingBuffer((5,), dtype=numpy.int16)
+    with pytest.raises(Exception):
+        ring_buffer.put(numpy.arange(3, dtype=numpy.int16), scale=2)
+    assert ring_buffer.put_partial(
+        numpy.arange(3, dtype=numpy.int32),
+        scale=2
+    ) == 0
+    assert ring_buffer.type_mismatches == 1
+    assert len(ring_buffer) == 0
+
+    ring_buffer = RingBuffer((5,), dtype=numpy.float32)
+    ring_buffer.put(numpy.ones(3, dtype=numpy.float32))
+    out = numpy.full(3, 7, dtype=numpy.int16)
+    with pytest.raises(Exception):
+        ring_buffer.get(out, scale=2)
+    assert ring_buffer.get_partial(out, scale=2) == 0
+    assert ring_buffer.type_mismatches == 1
+    assert list(out) == [7, 7, 7]
+    assert len(ring_buffer) == 3
+
+def test_scaled_put_into_float_buffer():
+    ring_buffer = RingBuffer((5,), dtype=numpy.float32)
+    ring_buffer.put(numpy.array([1.0, 2.0]), scale=0.5)
+    out = numpy.zeros(2, dtype=numpy.float32)
+    ring_buffer.get(out)
+    assert list(out) == [0.5, 1.0]
+
+def test_blocking_without_waiting():
+    ring_buffer = BlockingRingBuffer((5,), dtype=numpy.int32)
+    ring_buffer.put(numpy.arange(3, dtype=numpy.int32), timeout=0)
+    out = numpy.zeros(3, dtype=numpy.int32)
+    ring_buffer.get(out, timeout=0)
+    assert list(out) == [0, 1, 2]
+
+def test_blocking_get_times_out():
+    ring_buffer = BlockingRingBuffer((5,), dtype=numpy.int32)
+    ring_buffer.put(numpy.arange(2, dtype=numpy.int32))
+    with pytest.raises(TimeoutError):
+        ring_buffer.get(numpy.zeros(3, dtype=numpy.int32), timeout=0.01)
+    assert len(ring_buffer) == 2
+    assert not ring_buffer._consumer_waiting
+
+def test_blocking_put_times_out():
+    ring_buffer = BlockingRingBuffer((5,), dtype=numpy.int32)
+    ring_buffer.put(numpy.arange(4, dtype=numpy.int32))
+    with pytest.raises(TimeoutError):
+        ring_buffer.put(numpy.arange(2, dtype=numpy.int32), timeout=0.01)
+
+def test_blocking_request_larger_than_buffer_raises():
+    ring_buffer = BlockingRingBuffer((5,), dtype=numpy.int32)
+    with pytest.raises(Exception):
+        ring_buffer.put(numpy.arange(6, dtype=numpy.int32))
+    with pytest.raises(Exception):
+        ring_buffer.get(numpy.zeros(6, dtype=numpy.int32))
+
+def test_blocking_get_woken_by_put():
+    import threading
+    ring_buffer = BlockingRingBuffer((5,), dtype=numpy.int32)
+    out = numpy.zeros(3, dtype=numpy.int32)
+    consumer = threading.Thread(
+        target=ring_buffer.get,
+        args=(out,),
+        kwargs={"timeout": 5}
+    )
+    consumer.start()
+    while not ring_buffer._consumer_waiting:
+        pass
+    ring_buffer.put(numpy.arange(1, 4, dtype=numpy.int32))
+    consumer.join()
+    assert list(out) == [1, 2, 3]
+
+def test_blocking_producer_consumer_threads():
+    import random
+    import threading
+    rng = random.Random(11)
+    # Large enough that a waiting put and a waiting get can't both be
+    # stuck at once
+    ring_buffer = BlockingRingBuffer((32, 2), dtype=numpy.int64)
+    sizes = [rng.randint(1, 16) for _ in range(2000)]
+
+    def produce():
+        value = 0
+        for size in sizes:
+            values = numpy.arange(value, value + 2*size).reshape((size, 2))
+            ring_buffer.put(values, timeout=5)
+            value += 2*size
+
+    received = []
+    def consume():
+        remaining = sum(sizes)
+        while remaining > 0:
+            n = min(rng.randint(1, 16), remaining)
+            out = numpy.zeros((n, 2), dtype=numpy.int64)
+            ring_buffer.get(out, timeout=5)
+            received.append(out)
+            remaining -= n
+
+    threads = [
+        threading.Thread(target=produce),
+        threading.Thread(target=consume)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    values = numpy.concatenate(received).ravel()
+    assert numpy.all(values == numpy.arange(len(values)))
+    assert len(values) == 2 * sum(sizes)
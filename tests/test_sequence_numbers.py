@@ -0,0 +1,57 @@
+import numpy
+
+from singtcommon import sequence_numbers
+from singtcommon.sequence_numbers import (
+    SEQ_NO_ROLLOVER, distance, is_newer, add, distances, are_newer
+)
+
+def test_distance_without_rollover():
+    assert distance(5, 3) == 2
+    assert distance(3, 5) == -2
+    assert distance(7, 7) == 0
+
+def test_distance_across_rollover():
+    assert distance(0, SEQ_NO_ROLLOVER - 1) == 1
+    assert distance(SEQ_NO_ROLLOVER - 1, 0) == -1
+    assert distance(2, SEQ_NO_ROLLOVER - 3) == 5
+
+def test_distance_range():
+    rollover = 16
+    for new in range(rollover):
+        for current in range(rollover):
+            d = distance(new, current, rollover)
+            assert -rollover//2 <= d < rollover//2
+            assert (current + d) % rollover == new
+
+def test_non_power_of_two_rollover():
+    assert distance(1, 998, 1000) == 3
+    assert distance(998, 1, 1000) == -3
+
+def test_is_newer():
+    assert is_newer(1, 0)
+    assert not is_newer(0, 1)
+    assert not is_newer(0, 0)
+    assert is_newer(0, SEQ_NO_ROLLOVER - 1)
+
+def test_add():
+    assert add(SEQ_NO_ROLLOVER - 1, 1) == 0
+    assert add(5, 3, 7) == 1
+
+def test_vectorized_matches_scalar():
+    rollover = 1000
+    new = numpy.arange(rollover)
+    for current in (0, 1, 499, 500, 999):
+        expected = [distance(n, current, rollover) for n in range(rollover)]
+        assert list(distances(new, current, rollover)) == expected
+        assert list(are_newer(new, current, rollover)) == [
+            d > 0 for d in expected
+        ]
+
+def test_vectorized_narrow_types():
+    new = numpy.array([0, 1, SEQ_NO_ROLLOVER - 1], dtype=">i2")
+    assert list(distances(new, SEQ_NO_ROLLOVER - 1)) == [1, 2, 0]
+
+def test_matches_udp_packetizer():
+    from singtcommon import UDPPacketizer
+    p = UDPPacketizer(None, None)
+    assert p._seq_no_max == sequence_numbers.SEQ_NO_ROLLOVER
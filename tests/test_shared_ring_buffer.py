@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import numpy
+import pytest
+
+from singtcommon import SharedRingBuffer
+
+@pytest.fixture
+def ring_buffer():
+    ring_buffer = SharedRingBuffer((10, 2), dtype=numpy.int16)
+    yield ring_buffer
+    ring_buffer.close()
+    ring_buffer.unlink()
+
+def test_store_and_retrieve(ring_buffer):
+    array = numpy.arange(8, dtype=numpy.int16).reshape((4, 2))
+    ring_buffer.put(array)
+    assert len(ring_buffer) == 4
+    out = numpy.zeros((4, 2), dtype=numpy.int16)
+    ring_buffer.get(out)
+    assert numpy.all(out == array)
+    assert len(ring_buffer) == 0
+
+def test_fills_to_capacity_and_wraps(ring_buffer):
+    ring_buffer.put(numpy.zeros((7, 2), dtype=numpy.int16))
+    ring_buffer.get(numpy.zeros((7, 2), dtype=numpy.int16))
+
+    array = numpy.arange(20, dtype=numpy.int16).reshape((10, 2))
+    ring_buffer.put(array)
+    with pytest.raises(Exception):
+        ring_buffer.put(numpy.zeros((1, 2), dtype=numpy.int16))
+    out = numpy.zeros((10, 2), dtype=numpy.int16)
+    ring_buffer.get(out)
+    assert numpy.all(out == array)
+
+def test_underrun_and_type_mismatch(ring_buffer):
+    with pytest.raises(Exception):
+        ring_buffer.get(numpy.zeros((1, 2), dtype=numpy.int16))
+    with pytest.raises(Exception):
+        ring_buffer.put(numpy.zeros((1, 2), dtype=numpy.int32))
+
+def test_attach_by_name(ring_buffer):
+    other = SharedRingBuffer.attach(
+        ring_buffer.name, (10, 2), dtype=numpy.int16
+    )
+    ring_buffer.put(numpy.ones((3, 2), dtype=numpy.int16))
+    assert len(other) == 3
+    out = numpy.zeros((3, 2), dtype=numpy.int16)
+    other.get(out)
+    assert numpy.all(out == 1)
+    assert len(ring_buffer) == 0
+    other.close()
+
+def test_attach_with_wrong_shape(ring_buffer):
+    with pytest.raises(Exception):
+        SharedRingBuffer.attach(ring_buffer.name, (20, 2), dtype=numpy.int16)
+
+def test_attach_from_separate_interpreter(ring_buffer):
+    ring_buffer.put(numpy.ones((3, 2), dtype=numpy.int16))
+    script = (
+        "import numpy\n"
+        "from singtcommon import SharedRingBuffer\n"
+        f"ring_buffer = SharedRingBuffer.attach({ring_buffer.name!r}, "
+        "(10, 2), dtype=numpy.int16)\n"
+        "out = numpy.zeros((3, 2), dtype=numpy.int16)\n"
+        "ring_buffer.get(out)\n"
+        "ring_buffer.put(out * 2)\n"
+        "ring_buffer.close()\n"
+    )
+    env = dict(os.environ)
+    paths = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+    if "PYTHONPATH" in env:
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert "leaked" not in result.stderr
+
+    # The block outlives the other interpreter
+    other = SharedRingBuffer.attach(
+        ring_buffer.name, (10, 2), dtype=numpy.int16
+    )
+    other.close()
+    out = numpy.zeros((3, 2), dtype=numpy.int16)
+    ring_buffer.get(out)
+    assert numpy.all(out == 2)
+
+def _produce(name, blocks, block_size):
+    ring_buffer = SharedRingBuffer.attach(name, (64,), dtype=numpy.int64)
+    value = 0
+    while value < blocks * block_size:
+        if ring_buffer.capacity - len(ring_buffer) >= block_size:
+            ring_buffer.put(
+                numpy.arange(value, value + block_size, dtype=numpy.int64)
+            )
+            value += block_size
+    ring_buffer.close()
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="requires the fork start method"
+)
+def test_producer_in_another_process():
+    blocks = 2000
+    block_size = 7
+    ring_buffer = SharedRingBuffer((64,), dtype=numpy.int64)
+    try:
+        context = multiprocessing.get_context("fork")
+        producer = context.Process(
+            target=_produce,
+            args=(ring_buffer.name, blocks, block_size)
+        )
+        producer.start()
+
+        out = numpy.zeros(5, dtype=numpy.int64)
+        value = 0
+        while value < blocks * block_size // 5 * 5:
+            if len(ring_buffer) >= len(out):
+                ring_buffer.get(out)
+                assert list(out) == list(range(value, value + len(out)))
+                value += len(out)
+        producer.join(timeout=10)
+        assert producer.exitcode == 0
+    finally:
+        ring_buffer.close()
+        ring_buffer.unlink()
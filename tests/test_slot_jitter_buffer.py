@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from singtcommon import JitterBuffer, SlotJitterBuffer
+
+def test_len_zero_items():
+    assert len(SlotJitterBuffer(buffer_length=0)) == 0
+    assert len(SlotJitterBuffer(buffer_length=2)) == 2
+
+def test_repeated_alternating_put_get_with_buffer():
+    buffer_length = 3
+    jitter_buffer = SlotJitterBuffer(buffer_length=buffer_length)
+
+    for i in range(1000):
+        jitter_buffer.put_packet(i, i)
+        out = jitter_buffer.get_packet()
+        if i < buffer_length:
+            assert out is None
+        else:
+            assert out == i - buffer_length
+        assert len(jitter_buffer) == buffer_length
+
+def test_out_of_order_packets():
+    jitter_buffer = SlotJitterBuffer(buffer_length=0)
+    jitter_buffer.put_packet(0, "a")
+    jitter_buffer.put_packet(2, "c")
+    assert len(jitter_buffer) == 2
+
+    assert jitter_buffer.get_packet() == "a"
+    assert jitter_buffer.get_packet() is None
+    assert jitter_buffer.get_packet() == "c"
+    assert len(jitter_buffer) == 0
+
+def test_late_packet_discarded():
+    jitter_buffer = SlotJitterBuffer(buffer_length=0)
+    jitter_buffer.put_packet(0, 0)
+    jitter_buffer.get_packet()
+    jitter_buffer.put_packet(0, 0)
+    assert len(jitter_buffer) == 0
+    assert jitter_buffer._late_packets == 1
+
+def test_packet_beyond_capacity_discarded():
+    jitter_buffer = SlotJitterBuffer(buffer_length=0, capacity=4)
+    jitter_buffer.put_packet(0, 0)
+    jitter_buffer.put_packet(4, 4)
+    assert len(jitter_buffer) == 1
+    assert jitter_buffer._overflowed_packets == 1
+
+def test_reset_after_missed_packets():
+    jitter_buffer = SlotJitterBuffer(buffer_length=2)
+    jitter_buffer.put_packet(0, 0)
+    for _ in range(2 + 1 + 3):
+        jitter_buffer.get_packet()
+
+    # Buffer has been reset, so gets are ignored until the next put
+    assert not jitter_buffer._started
+    assert len(jitter_buffer) == 2
+
+def test_overly_large_seq_no():
+    jitter_buffer = SlotJitterBuffer(seq_no_rollover=2)
+    with pytest.raises(Exception):
+        jitter_buffer.put_packet(2, None)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_jitter_buffer(seed):
+    random.seed(seed)
+    rollover = 1000
+
+    jitter_buffer = JitterBuffer(seq_no_rollover=rollover)
+    # Large enough to hold anything JitterBuffer would
+    slot_jitter_buffer = SlotJitterBuffer(
+        capacity=rollover//2,
+        seq_no_rollover=rollover
+    )
+
+    # Packets are lost, duplicated, and delayed by random amounts
+    events = []
+    for i in range(5000):
+        if random.random() < 0.05:
+            continue
+        copies = 2 if random.random() < 0.02 else 1
+        for _ in range(copies):
+            events.append((i + random.gauss(0, 3), "put", i))
+        events.append((i + 0.5, "get", None))
+    events.sort(key=lambda event: event[0])
+
+    for _, action, i in events:
+        if action == "put":
+            jitter_buffer.put_packet(i % rollover, i)
+            slot_jitter_buffer.put_packet(i % rollover, i)
+        else:
+            assert slot_jitter_buffer.get_packet() == jitter_buffer.get_packet()
+        assert len(slot_jitter_buffer) == len(jitter_buffer)
+
+    assert slot_jitter_buffer._missed_packets == jitter_buffer._missed_packets
+
+def test_resets_counted():
+    jitter_buffer = SlotJitterBuffer(buffer_length=0)
+    jitter_buffer.put_packet(0, 0)
+    for _ in range(4):
+        jitter_buffer.get_packet()
+    assert jitter_buffer._resets == 1
@@ -1,5 +1,7 @@
-from singtcommon import TCPPacketizer
-from mock_transport import MockTransport
+import pytest
+
+from singtcommon import TCPPacketizer, Framing
+from mock_transport import MockTransport, ListTransport, encode
 
 def test_init():
     t = MockTransport()
@@ -33,3 +35,227 @@ def test_send_recv_two_packets():
     
     assert result == [msg1, msg2]
     
+
+def _decode_in_chunks(encoded, split_points, **kwargs):
+    p = TCPPacketizer(MockTransport(), **kwargs)
+    result = []
+    start = 0
+    for end in split_points + [len(encoded)]:
+        result += p.decode_bytes(encoded[start:end])
+        start = end
+    return result, p
+
+def test_empty_message():
+    messages = [b"", b"a", b""]
+    result, _ = _decode_in_chunks(encode(messages), [])
+    assert result == messages
+
+def test_length_prefix_split_across_reads():
+    messages = [b"first", b"second"]
+    encoded = encode(messages)
+
+    # Split within the second message's length prefix
+    split = 2 + len(messages[0]) + 1
+    result, p = _decode_in_chunks(encoded, [split])
+
+    assert result == messages
+    assert len(p._buffer) == 0
+
+def test_every_single_split_point():
+    messages = [b"abc", b"", b"x" * 300, b"defgh"]
+    encoded = encode(messages)
+
+    for split in range(len(encoded) + 1):
+        result, p = _decode_in_chunks(encoded, [split])
+        assert result == messages
+        assert len(p._buffer) == 0
+
+def test_one_byte_reads():
+    messages = [bytes([i]) * i for i in range(50)]
+    encoded = encode(messages)
+
+    result, p = _decode_in_chunks(encoded, list(range(1, len(encoded))))
+    assert result == messages
+    assert len(p._buffer) == 0
+
+def test_random_chunk_splits():
+    import random
+    random.seed(1234)
+
+    for _ in range(200):
+        messages = [
+            bytes(random.getrandbits(8) for _ in range(random.randint(0, 40)))
+            for _ in range(random.randint(0, 30))
+        ]
+        encoded = encode(messages)
+        split_points = sorted(
+            random.sample(
+                range(len(encoded) + 1),
+                random.randint(0, min(20, len(encoded)))
+            )
+        )
+        result, p = _decode_in_chunks(encoded, split_points)
+        assert result == messages
+        assert len(p._buffer) == 0
+
+def test_many_small_messages_in_one_read():
+    messages = [b"%d" % i for i in range(20000)]
+    result, _ = _decode_in_chunks(encode(messages), [])
+    assert result == messages
+
+def test_buffer_is_compacted():
+    message = b"m" * 1000
+    encoded = encode([message] * 200)
+    p = TCPPacketizer(MockTransport())
+
+    # Always leave half a message outstanding so that data is
+    # retained in the buffer between reads
+    chunk = 1500
+    received = []
+    for start in range(0, len(encoded), chunk):
+        received += p.decode_bytes(encoded[start:start+chunk])
+        assert len(p._buffer) <= 2 * p._compaction_threshold + chunk
+
+    assert received == [message] * 200
+    assert len(p._buffer) == 0
+
+def test_write_many_matches_individual_writes():
+    messages = ["one", "two", "", "three"]
+
+    t1 = ListTransport()
+    p1 = TCPPacketizer(t1)
+    for msg in messages:
+        p1.write(msg)
+
+    t2 = ListTransport()
+    p2 = TCPPacketizer(t2)
+    p2.write_many(messages)
+
+    assert len(t2.writes) == 1
+    assert t2.writes[0] == b"".join(t1.writes)
+    assert p2.decode(t2.writes[0]) == messages
+    assert p2.last_flush_frames == len(messages)
+    assert p2.last_flush_bytes == len(t2.writes[0])
+
+def test_write_many_nothing():
+    t = ListTransport()
+    p = TCPPacketizer(t)
+    p.write_many([])
+    assert t.writes == []
+    assert p.flush_count == 0
+
+def test_coalesced_writes_flush_on_next_iteration():
+    from twisted.internet.task import Clock
+    clock = Clock()
+    t = ListTransport()
+    p = TCPPacketizer(t, coalesce=True, reactor=clock)
+
+    p.write("a")
+    p.write_bytes(b"bc")
+    p.write_many(["def", "ghij"])
+    assert t.writes == []
+
+    clock.advance(0)
+    assert len(t.writes) == 1
+    assert p.decode(t.writes[0]) == ["a", "bc", "def", "ghij"]
+    assert p.flush_count == 1
+    assert p.last_flush_frames == 4
+    assert p.last_flush_bytes == len(t.writes[0])
+
+    # Nothing further is written until more messages are queued
+    clock.advance(1)
+    assert len(t.writes) == 1
+
+    p.write("k")
+    clock.advance(0)
+    assert len(t.writes) == 2
+    assert p.frames_flushed == 5
+    assert p.bytes_flushed == len(t.writes[0]) + len(t.writes[1])
+
+def test_explicit_flush():
+    from twisted.internet.task import Clock
+    clock = Clock()
+    t = ListTransport()
+    p = TCPPacketizer(t, coalesce=True, reactor=clock)
+
+    p.write("a")
+    p.flush()
+    assert len(t.writes) == 1
+    assert clock.getDelayedCalls() == []
+
+    clock.advance(0)
+    assert len(t.writes) == 1
+
+@pytest.mark.parametrize("framing", list(Framing))
+def test_random_chunk_splits_all_framings(framing):
+    import random
+    random.seed(4321)
+
+    for _ in range(50):
+        messages = [
+            bytes(random.getrandbits(8) for _ in range(random.randint(0, 300)))
+            for _ in range(random.randint(0, 10))
+        ]
+        encoded = encode(messages, framing=framing)
+        split_points = sorted(
+            random.sample(
+                range(len(encoded) + 1),
+                random.randint(0, min(20, len(encoded)))
+            )
+        )
+        result, p = _decode_in_chunks(
+            encoded,
+            split_points,
+            framing=framing,
+            large_message_threshold=200
+        )
+        assert [bytes(packet) for packet in result] == messages
+        assert len(p._buffer) == 0
+
+def test_uint32_framing_is_big_endian():
+    encoded = encode([b"abc"], framing=Framing.UINT32)
+    assert encoded == b"\x00\x00\x00\x03abc"
+
+def test_varint_framing():
+    encoded = encode([b"a" * 300], framing=Framing.VARINT)
+    assert encoded[:2] == b"\xac\x02"
+    assert len(encoded) == 302
+
+def test_short_framing_rejects_large_message():
+    p = TCPPacketizer(ListTransport())
+    with pytest.raises(Exception):
+        p.write_bytes(b"x" * 2**16)
+
+def test_large_message_returned_as_memoryview():
+    message = b"0123456789" * 20000
+    encoded = encode([b"small", message], framing=Framing.UINT32)
+
+    chunk = 4096
+    p = TCPPacketizer(ListTransport(), framing=Framing.UINT32)
+    received = []
+    for start in range(0, len(encoded), chunk):
+        received += p.decode_bytes(encoded[start:start+chunk])
+
+    assert received[0] == b"small"
+    assert isinstance(received[1], memoryview)
+    assert received[1] == message
+
+    # The buffer for large messages isn't retained
+    assert p._large is None
+    assert len(p._buffer) == 0
+
+def test_received_message_too_large():
+    encoded = encode([b"x" * 100], framing=Framing.VARINT)
+    p = TCPPacketizer(
+        ListTransport(),
+        framing=Framing.VARINT,
+        max_length=99
+    )
+    with pytest.raises(Exception):
+        p.decode_bytes(encoded)
+
+def test_decode_large_string():
+    message = "é" * 50000
+    encoded = encode([message.encode("utf-8")], framing=Framing.VARINT)
+    p = TCPPacketizer(ListTransport(), framing=Framing.VARINT)
+    assert p.decode(encoded) == [message]
@@ -0,0 +1,133 @@
+import pytest
+
+from singtcommon import UDPPacketizer
+from mock_transport import CopyingTransport
+
+def test_write_and_decode():
+    t = CopyingTransport()
+    p = UDPPacketizer(t, "address")
+    p.write(b"abc")
+    p.write(b"def")
+
+    (packet0, address), (packet1, _) = t.packets
+    assert address == "address"
+
+    timestamp, seq_no, data = UDPPacketizer.decode(packet0)
+    assert (seq_no, data) == (0, b"abc")
+    timestamp, seq_no, data = UDPPacketizer.decode(packet1)
+    assert (seq_no, data) == (1, b"def")
+
+def test_write_batch_matches_write():
+    t1 = CopyingTransport()
+    p1 = UDPPacketizer(t1, "address")
+    t2 = CopyingTransport()
+    p2 = UDPPacketizer(t2, "address")
+
+    payloads = [b"a" * 10, b"", b"b" * 200, b"c"]
+    for payload in payloads:
+        p1.write(payload)
+    p2.write_batch(payloads)
+
+    assert len(t2.packets) == len(payloads)
+    for (packet1, address1), (packet2, address2) in zip(t1.packets, t2.packets):
+        # Timestamps may differ
+        assert packet1[4:] == packet2[4:]
+        assert address1 == address2
+
+    # Sequence numbers continue after the batch
+    p2.write(b"next")
+    assert UDPPacketizer.decode(t2.packets[-1][0])[1] == len(payloads)
+
+def test_write_to_all():
+    t = CopyingTransport()
+    peers = [UDPPacketizer(t, address) for address in ("one", "two")]
+    for data in (b"x", b"y", b"z"):
+        UDPPacketizer.write_to_all(peers, data)
+
+    # Each peer sees its own contiguous sequence numbers
+    for address in ("one", "two"):
+        decoded = [
+            UDPPacketizer.decode(packet)
+            for packet, packet_address in t.packets
+            if packet_address == address
+        ]
+        assert [(seq_no, data) for _, seq_no, data in decoded] == [
+            (0, b"x"), (1, b"y"), (2, b"z")
+        ]
+
+def test_write_batch_sequence_number_rollover():
+    t = CopyingTransport()
+    p = UDPPacketizer(t, "address")
+    p._seq_no = p._seq_no_max - 1
+    p.write_batch([b"x"] * 2)
+    seq_nos = [UDPPacketizer.decode(packet)[1] for packet, _ in t.packets]
+    assert seq_nos == [p._seq_no_max - 1, 0]
+
+def test_seq_no_rollover():
+    t = CopyingTransport()
+    p = UDPPacketizer(t, "address", seq_no_rollover=3)
+    p.write_batch([b"x"] * 4)
+    seq_nos = [UDPPacketizer.decode(packet)[1] for packet, _ in t.packets]
+    assert seq_nos == [0, 1, 2, 0]
+
+def test_seq_no_rollover_must_fit_header():
+    with pytest.raises(Exception):
+        UDPPacketizer(None, None, seq_no_rollover=2**16)
+
+def test_decode_batch():
+    t = CopyingTransport()
+    p = UDPPacketizer(t, "address")
+    payloads = [b"abc", b"", b"defg"]
+    for payload in payloads:
+        p.write(payload)
+    packets = [packet for packet, _ in t.packets]
+
+    decoded = UDPPacketizer.decode_batch(packets)
+    assert decoded == [UDPPacketizer.decode(packet) for packet in packets]
+
+def test_decode_array_equal_sizes():
+    import numpy
+    t = CopyingTransport()
+    p = UDPPacketizer(t, "address")
+    payloads = [bytes([i]) * 8 for i in range(5)]
+    for payload in payloads:
+        p.write(payload)
+    packets = [packet for packet, _ in t.packets]
+
+    timestamps, seq_nos, data, lengths = UDPPacketizer.decode_array(packets)
+    assert timestamps.dtype == numpy.dtype(">u4")
+    assert seq_nos.dtype == numpy.dtype(">i2")
+    assert list(seq_nos) == list(range(5))
+    assert list(timestamps) == [
+        UDPPacketizer.decode(packet)[0] for packet in packets
+    ]
+    assert data.shape == (5, 8)
+    assert [bytes(row) for row in data] == payloads
+    assert list(lengths) == [8] * 5
+
+def test_decode_array_bounded_sizes():
+    t = CopyingTransport()
+    p = UDPPacketizer(t, "address")
+    payloads = [b"abc", b"", b"defgh"]
+    for payload in payloads:
+        p.write(payload)
+    packets = [packet for packet, _ in t.packets]
+
+    _, seq_nos, data, lengths = UDPPacketizer.decode_array(packets)
+    assert list(seq_nos) == [0, 1, 2]
+    assert data.shape == (3, 5)
+    assert [
+        bytes(row[:length]) for row, length in zip(data, lengths)
+    ] == payloads
+    assert bytes(data[0]) == b"abc\x00\x00"
+
+def test_decode_array_no_packets():
+    _, seq_nos, data, lengths = UDPPacketizer.decode_array([])
+    assert len(seq_nos) == 0
+    assert data.shape == (0, 0)
+    assert len(lengths) == 0
+
+def test_decode_array_short_packet():
+    import pytest
+    with pytest.raises(Exception):
+        UDPPacketizer.decode_array([b"\x00" * 10, b"\x00"])